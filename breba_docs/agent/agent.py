@@ -41,6 +41,16 @@ class Agent(ABC):
         """
         pass
 
+    def analyze_outputs(self, command_outputs: list[tuple[str, str]]) -> list[CommandReport]:
+        """ Analyze the output of every command of a goal
+        Args:
+            command_outputs: pairs of command and its output, in the order the commands were run
+
+        Returns:
+            list[CommandReport]: a report for every command, in the same order
+        """
+        return [self.analyze_output(output) for _, output in command_outputs]
+
     @abstractmethod
     def provide_input(self, text: str) -> str:
         """ Ask agent for input
@@ -51,6 +61,15 @@ class Agent(ABC):
         """
         pass
 
+    def answer_prompt(self, text: str) -> str:
+        """ Ask agent for the answer to a prompt that is known to be waiting for input
+        Args
+            text: string ending with the prompt
+        return:
+            str: input for the prompt
+        """
+        return self.provide_input(text)
+
     @abstractmethod
     def fetch_modify_file_commands(self, filepath: Path, command_report: CommandReport) -> list[str]:
         """
@@ -65,3 +84,7 @@ class Agent(ABC):
             list[str]: A list of terminal commands to modify the file at the given filepath.
         """
         pass
+
+    def close(self):
+        """Release resources held by the agent"""
+        pass
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from openai import OpenAI
+
+ASSISTANT_NAME = "Breba Docs"
+
+
+def assistant_key(model: str, instructions: str) -> str:
+    return f"{model}-{hashlib.sha256(instructions.encode('utf-8')).hexdigest()[:16]}"
+
+
+class AssistantRegistry:
+    """
+    Assistants shared by every agent with the same model and instructions, across runs and processes.
+
+    Ids of the assistants are kept in a file in the project directory, so that starting an agent does not create
+    a new assistant, and assistants are not left behind when an agent is not closed.
+    """
+
+    def __init__(self, path: Path | str = ".breba/assistants.json"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load assistants from {self.path}: {e}")
+            return {}
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Other processes may be reading the file, so it is replaced as a whole
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def assistant_id(self, client: OpenAI, model: str, instructions: str) -> str:
+        key = assistant_key(model, instructions)
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if not entry:
+                assistant = client.beta.assistants.create(
+                    name=ASSISTANT_NAME,
+                    instructions=instructions,
+                    model=model,
+                    metadata={"breba_key": key},
+                )
+                entry = {"id": assistant.id, "model": model}
+                entries[key] = entry
+            entry["last_used"] = time.time()
+            self._save(entries)
+            return entry["id"]
+
+    def forget(self, assistant_id: str) -> None:
+        """Drop an assistant that no longer exists, so that the next agent creates a new one"""
+        with self._lock:
+            entries = self._load()
+            self._save({key: entry for key, entry in entries.items() if entry["id"] != assistant_id})
+
+    def collect_garbage(self, client: OpenAI, max_age_days=30.0) -> list[str]:
+        """
+        Delete assistants of this registry that were not used in max_age_days, and legacy Breba Docs assistants
+        older than that, which were created per agent before the registry and left behind when not closed.
+
+        Assistants registered by other projects are tagged with their key and are never deleted, since they may
+        still be in use.
+
+        Returns:
+            list[str]: ids of the deleted assistants
+        """
+        oldest = time.time() - max_age_days * 24 * 60 * 60
+        with self._lock:
+            entries = self._load()
+            active = {key: entry for key, entry in entries.items() if entry.get("last_used", 0) >= oldest}
+            active_ids = {entry["id"] for entry in active.values()}
+            stale_ids = {entry["id"] for entry in entries.values()} - active_ids
+
+            deleted = []
+            for assistant in client.beta.assistants.list(limit=100):
+                if assistant.name != ASSISTANT_NAME or assistant.id in active_ids:
+                    continue
+                legacy = not (assistant.metadata or {}).get("breba_key")
+                if assistant.id in stale_ids or (legacy and assistant.created_at < oldest):
+                    try:
+                        client.beta.assistants.delete(assistant.id)
+                        deleted.append(assistant.id)
+                    except Exception as e:
+                        print(f"Failed to delete assistant {assistant.id}: {e}")
+
+            self._save(active)
+        return deleted
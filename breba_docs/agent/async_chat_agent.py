@@ -0,0 +1,91 @@
+import contextlib
+import threading
+
+from openai import AsyncOpenAI
+
+from breba_docs.agent.chat_agent import ChatCompletionsAgent
+from breba_docs.agent.openai_agent import CHARACTERS_PER_TOKEN
+from breba_docs.agent.scheduler import Priority, RateLimitScheduler, shared_scheduler
+from breba_docs.services.reports import CommandReport
+from breba_docs.services.response_cache import ResponseCache
+
+
+class AsyncChatAgent(ChatCompletionsAgent):
+    """
+    Chat completions agent that sends its requests with AsyncOpenAI, through a scheduler shared by the process.
+
+    Methods of the agent stay synchronous for the graph, while the requests of every agent are awaited together on
+    the loop of the scheduler, within the rate limits of the API key. Answers to prompts go ahead of planning,
+    and planning goes ahead of output analysis.
+    """
+
+    # Tokens of the response are not known up front, so this many are counted against the budget
+    RESPONSE_TOKENS = 1024
+
+    def __init__(self, model="gpt-4o-mini", stream=False, response_cache: ResponseCache | None = None,
+                 scheduler: RateLimitScheduler | None = None):
+        # Retries are left to the scheduler, which also holds back other requests when rate limited
+        self.client = AsyncOpenAI(max_retries=0)
+        self.model = model
+        self.stream = stream
+        self.response_cache = response_cache
+        self.scheduler = scheduler or shared_scheduler()
+        self._local = threading.local()
+
+    @property
+    def priority(self) -> Priority:
+        return getattr(self._local, "priority", Priority.PLANNING)
+
+    @contextlib.contextmanager
+    def _priority(self, priority: Priority):
+        previous = self.priority
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _complete(self, messages: list[dict]) -> str:
+        tokens = sum(len(message["content"]) for message in messages) // CHARACTERS_PER_TOKEN + self.RESPONSE_TOKENS
+        return self.scheduler.run(lambda: self._complete_async(messages), tokens, self.priority)
+
+    async def _complete_async(self, messages: list[dict]) -> str:
+        if not self.stream:
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.0,
+                top_p=1.0,
+            )
+            return completion.choices[0].message.content
+
+        chunks = []
+        print("Agent Response: ", end="", flush=True)
+        async for chunk in await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.0,
+                top_p=1.0,
+                stream=True,
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+                print(chunk.choices[0].delta.content, end="", flush=True)
+        print()
+        return "".join(chunks)
+
+    def provide_input(self, text: str) -> str:
+        with self._priority(Priority.INPUT):
+            return super().provide_input(text)
+
+    def answer_prompt(self, text: str) -> str:
+        with self._priority(Priority.INPUT):
+            return super().answer_prompt(text)
+
+    def analyze_output(self, text: str) -> CommandReport:
+        with self._priority(Priority.ANALYSIS):
+            return super().analyze_output(text)
+
+    def analyze_outputs(self, command_outputs: list[tuple[str, str]], max_batch_tokens=50000) -> list[CommandReport]:
+        with self._priority(Priority.ANALYSIS):
+            return super().analyze_outputs(command_outputs, max_batch_tokens)
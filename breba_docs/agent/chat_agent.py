@@ -0,0 +1,89 @@
+import threading
+
+from openai import OpenAI
+
+from breba_docs.agent.openai_agent import OpenAIAgent
+from breba_docs.services.response_cache import ResponseCache
+
+
+class ChatCompletionsAgent(OpenAIAgent):
+    """
+    Same agent as OpenAIAgent, but every run is a single chat completions request instead of an assistant run.
+
+    The conversation is kept locally, per calling thread, so that follow-up runs see the earlier messages. When
+    streaming, the response is printed as it arrives.
+    """
+
+    def __init__(self, model="gpt-4o-mini", stream=False, response_cache: ResponseCache | None = None):
+        self.client = OpenAI()
+        self.model = model
+        self.stream = stream
+        self.response_cache = response_cache
+        self._local = threading.local()
+
+    @property
+    def messages(self) -> list[dict]:
+        if not hasattr(self._local, "messages"):
+            self._local.messages = []
+        return self._local.messages
+
+    def _complete(self, messages: list[dict]) -> str:
+        if not self.stream:
+            completion = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.0,
+                top_p=1.0,
+            )
+            return completion.choices[0].message.content
+
+        chunks = []
+        print("Agent Response: ", end="", flush=True)
+        for chunk in self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.0,
+                top_p=1.0,
+                stream=True,
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+                print(chunk.choices[0].delta.content, end="", flush=True)
+        print()
+        return "".join(chunks)
+
+    def do_run(self, message, instructions, new_thread=True):
+        print("--------------------------------------------------------------------------------")
+        print(f"Instructions:\n {instructions}")
+        print("--------------------------------------------------------------------------------")
+        print(f"Message: {message}")
+        print("--------------------------------------------------------------------------------")
+
+        # Same limit as the assistant runs, the first part of the message is truncated
+        max_length = 250000
+        truncated_message = message[-max_length:]
+
+        if new_thread:
+            self.messages.clear()
+        self.messages.append({"role": "user", "content": truncated_message})
+
+        # Instructions apply to this run only, like the instructions of an assistant run
+        system_message = {"role": "system", "content": OpenAIAgent.INSTRUCTIONS_GENERAL + "\n" + instructions}
+        cache_key = ResponseCache.key(self.model, 0.0, system_message["content"], self.messages) \
+            if self.response_cache is not None else None
+        agent_response = self.response_cache.get(cache_key) if self.response_cache is not None else None
+        if agent_response is not None:
+            print(f"Agent Response (cached): {agent_response}")
+        else:
+            agent_response = self._complete([system_message] + self.messages)
+            if self.response_cache is not None:
+                self.response_cache.put(cache_key, agent_response)
+            if not self.stream:
+                print(f"Agent Response: {agent_response}")
+
+        self.messages.append({"role": "assistant", "content": agent_response})
+        return agent_response
+
+    def close(self):
+        # No assistant to delete
+        pass
@@ -5,9 +5,10 @@ from langgraph.prebuilt import create_react_agent
 
 from breba_docs.agent.instruction_reader import get_instructions
 from breba_docs.agent.openai_agent import OpenAIAgent
-from breba_docs.container import new_container
+from breba_docs.container import new_container, pty_server_uri
 from breba_docs.services.command_executor import ContainerCommandExecutor
 from breba_docs.services.input_provider import AgentInputProvider
+from breba_docs.services.output_compaction import compact_output
 from breba_docs.services.reports import CommandReport
 
 
@@ -21,7 +22,7 @@ class CommandAgent:
         @tool
         def execute_command(command: str) -> str:
             """Use this to run any command in the terminal"""
-            return self.executor.execute_command(command)
+            return compact_output(self.executor.execute_command(command))
 
         return execute_command
 
@@ -51,7 +52,7 @@ if __name__ == "__main__":
                     'source bin/activote']
     input_provider = AgentInputProvider(OpenAIAgent())
     with new_container() as container:
-        with ContainerCommandExecutor(input_provider).session() as session:
+        with ContainerCommandExecutor(input_provider, uri=pty_server_uri(container)).session() as session:
             agent = CommandAgent(session)
             for command in commands:
                 messages = agent.invoke(command)["messages"]
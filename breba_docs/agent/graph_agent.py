@@ -1,20 +1,38 @@
+import contextlib
+import copy
 import json
+import operator
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import asdict
-from typing import TypedDict, Literal
+from typing import TypedDict, Literal, Annotated
 
-from langchain_core.messages import AnyMessage, SystemMessage
+from docker.models.containers import Container
+from langchain_core.messages import AIMessage, AnyMessage, SystemMessage
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 
 from breba_docs.agent.agent import Agent
+from breba_docs.agent.assistant_registry import AssistantRegistry
+from breba_docs.agent.async_chat_agent import AsyncChatAgent
+from breba_docs.agent.chat_agent import ChatCompletionsAgent
 from breba_docs.agent.instruction_reader import get_instructions
 from breba_docs.agent.openai_agent import OpenAIAgent
-from breba_docs.container import new_container
-from breba_docs.services.command_executor import ContainerCommandExecutor, LocalCommandExecutor
+from breba_docs.checkpoints import CheckpointStore, Checkpoint, environment_key
+from breba_docs.container import new_container, ContainerPool, pty_server_uri, container_log_tail
+from breba_docs.services.command_executor import ContainerCommandExecutor, LocalCommandExecutor, CommandExecutor
 from breba_docs.services.document import Document
 from breba_docs.services.input_provider import AgentInputProvider
-from breba_docs.services.reports import GoalReport, CommandReport, Goal
+from breba_docs.services.output_compaction import compact_output
+from breba_docs.services.output_store import OutputStore, OutputRef
+from breba_docs.services.prompt_cache import PromptAnswerCache
+from breba_docs.services.reports import GoalReport, CommandReport, Goal, ResourceUsage
+from breba_docs.services.response_cache import ResponseCache
+from breba_docs.services.success_policy import succeeded_report
+from breba_docs.services.transcript import Transcript, RecordingCommandExecutor, ReplayCommandExecutor, \
+    MissingRecordingError
+from breba_docs.workspace import WorkspaceSync
 
 
 class AgentState(TypedDict):
@@ -23,27 +41,95 @@ class AgentState(TypedDict):
     goal_reports: list[GoalReport]
     current_goal: Goal | None
     goal_evaluation_count: int | None
+    # Goal reports produced by parallel goal workers, tagged with the position of the goal
+    indexed_goal_reports: Annotated[list[tuple[int, list[GoalReport]]], operator.add]
+
+
+class GoalTask(TypedDict):
+    goal: Goal
+    goal_index: int
 
 
 # TODO: test this class by testing individual functions on input state and output state
 # TODO: maybe unit test entire graph somehow
 class GraphAgent:
 
-    def __init__(self, doc: Document):
-        self.agent: Agent = OpenAIAgent()
+    def __init__(self, doc: Document, container_pool: ContainerPool | None = None,
+                 checkpoints: CheckpointStore | None = None, max_parallel_goals: int = 1,
+                 workspace: WorkspaceSync | None = None, prompt_answers: PromptAnswerCache | None = None,
+                 pipeline_analysis: bool = False, cancel_after_failure: bool = False, batch_analysis: bool = False,
+                 output_store: OutputStore | None = None, skip_successful_analysis: bool = True,
+                 record_transcript: Transcript | None = None, replay_transcript: Transcript | None = None,
+                 replay_time_scale: float = 0.0, agent_backend: str = "assistants", agent_streaming: bool = False,
+                 assistant_registry: AssistantRegistry | None = None, response_cache: ResponseCache | None = None):
+        # When provided, responses of the model are reused for identical requests, also across runs
+        self.response_cache = response_cache
+        # When provided, assistants are reused across agents and runs instead of being created for every agent
+        self.assistant_registry = assistant_registry
+        # Backend of the agent, "assistants" for assistant runs, "chat" for single chat completions requests, "async"
+        # for chat completions requests that are scheduled within the rate limits shared by the process
+        self.agent_backend = agent_backend
+        self.agent_streaming = agent_streaming
+        self.agent: Agent = self._create_agent()
         self.model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
         self.doc = doc
+        # When a pool is provided, goals are executed in warm containers instead of starting a new one each time
+        self.container_pool = container_pool
+        # When provided, goal re-evaluation resumes from a snapshot of the commands that already succeeded
+        self.checkpoints = checkpoints
+        # When more than one, goals are fanned out to workers that each have their own agent and container
+        self.max_parallel_goals = max_parallel_goals
+        # When provided, the project directory is synced into the container before executing commands
+        self.workspace = workspace
+        # When provided, answers to prompts are shared between goals and runs
+        self.prompt_answers = prompt_answers
+        # When set, output of a command is analyzed while the next command is executing
+        self.pipeline_analysis = pipeline_analysis
+        # When pipelining, stop executing the remaining commands of a goal once a command is known to have failed
+        self.cancel_after_failure = cancel_after_failure
+        # When set, outputs of all commands of a goal are analyzed together after the commands executed
+        self.batch_analysis = batch_analysis
+        # When provided, raw output of every command is kept on disk and referenced from its report
+        self.output_store = output_store
+        # When set, commands that exit with status 0 and print no errors are reported as successful without the agent
+        self.skip_successful_analysis = skip_successful_analysis
+        # When provided, container executions are recorded to the transcript
+        self.record_transcript = record_transcript
+        # When provided, executions are served from the transcript instead of a container, time scaled for replay
+        self.replay_transcript = replay_transcript
+        self.replay_time_scale = replay_time_scale
 
         self.system_instructions = None
         graph = StateGraph(AgentState)
         graph.add_node("identify_goals", self.identify_goals)
+        graph.set_entry_point("identify_goals")
+        if max_parallel_goals > 1:
+            graph.add_node("process_goal", self.process_goal)
+            graph.add_node("merge_goal_reports", self.merge_goal_reports)
+            graph.add_conditional_edges("identify_goals", self.fan_out_goals, ["process_goal"])
+            graph.add_edge("process_goal", "merge_goal_reports")
+            graph.add_edge("merge_goal_reports", END)
+        else:
+            self._add_goal_nodes(graph)
+            graph.add_edge("identify_goals", "start_next_goal")
+
+        self.graph = graph.compile()
+
+        # Processes already identified goals one at a time, used by parallel goal workers
+        self.goal_graph = self._compile_goal_graph()
+
+    def _compile_goal_graph(self):
+        goal_graph = StateGraph(AgentState)
+        self._add_goal_nodes(goal_graph)
+        goal_graph.set_entry_point("start_next_goal")
+        return goal_graph.compile()
+
+    def _add_goal_nodes(self, graph: StateGraph):
         graph.add_node("start_next_goal", self.start_next_goal)
         graph.add_node("identify_commands", self.identify_commands)
         graph.add_node("execute_commands", self.execute_commands)
         graph.add_node("execute_mutator_commands", self.execute_mutator_commands)
 
-        graph.set_entry_point("identify_goals")
-        graph.add_edge("identify_goals", "start_next_goal")
         graph.add_conditional_edges("start_next_goal",
                                     self.process_more_goals,
                                     {True: "identify_commands", False: END})
@@ -60,10 +146,62 @@ class GraphAgent:
             {True: "identify_commands", False: "start_next_goal"}
         )
 
-        self.graph = graph.compile()
+    def _create_agent(self) -> Agent:
+        if self.agent_backend == "chat":
+            return ChatCompletionsAgent(stream=self.agent_streaming, response_cache=self.response_cache)
+        if self.agent_backend == "async":
+            return AsyncChatAgent(stream=self.agent_streaming, response_cache=self.response_cache)
+        if self.agent_backend == "assistants":
+            return OpenAIAgent(self.assistant_registry, response_cache=self.response_cache)
+        raise ValueError(f"Unknown agent backend: {self.agent_backend}")
+
+    def _invoke_model(self, messages: list[AnyMessage]) -> AnyMessage:
+        if self.response_cache is None:
+            return self.model.invoke(messages)
+        # System message carries the instructions, so they are part of the messages
+        cache_key = ResponseCache.key(self.model.model_name, self.model.temperature, "",
+                                      [{"role": message.type, "content": message.content} for message in messages])
+        content = self.response_cache.get(cache_key)
+        if content is not None:
+            return AIMessage(content=content)
+        response_message = self.model.invoke(messages)
+        self.response_cache.put(cache_key, response_message.content)
+        return response_message
 
     def invoke(self):
-        return self.graph.invoke({"messages": [], "goals": [], "goal_reports": []})
+        return self.graph.invoke({"messages": [], "goals": [], "goal_reports": [], "indexed_goal_reports": []},
+                                 {"max_concurrency": self.max_parallel_goals})
+
+    def run_goals(self, goals: list[Goal]) -> list[GoalReport]:
+        """Process the given goals in order, skipping goal identification"""
+        return self.goal_graph.invoke({"messages": [], "goals": list(goals), "goal_reports": []})['goal_reports']
+
+    def close(self):
+        self.agent.close()
+
+    def fan_out_goals(self, state: AgentState) -> list[Send]:
+        return [Send("process_goal", GoalTask(goal=goal, goal_index=index)) for index, goal in enumerate(state['goals'])]
+
+    def _worker(self) -> "GraphAgent":
+        """Graph agent with every option of this one, for processing a goal in parallel with other goals"""
+        worker = copy.copy(self)
+        # Agents keep conversation state, so every worker needs its own agent, and nodes bound to the worker to use it
+        worker.agent = worker._create_agent()
+        worker.goal_graph = worker._compile_goal_graph()
+        return worker
+
+    def process_goal(self, task: GoalTask):
+        worker = self._worker()
+        try:
+            goal_reports = worker.run_goals([task['goal']])
+        finally:
+            worker.close()
+        return {'indexed_goal_reports': [(task['goal_index'], goal_reports)]}
+
+    def merge_goal_reports(self, state: AgentState):
+        # Workers finish in any order, report goals in the order they were identified
+        indexed_goal_reports = sorted(state['indexed_goal_reports'], key=lambda indexed: indexed[0])
+        return {'goal_reports': [report for _, goal_reports in indexed_goal_reports for report in goal_reports]}
 
     def should_reevaluate_goal(self, state: AgentState):
         # TODO: log every step of the graph
@@ -85,12 +223,14 @@ class GraphAgent:
 
     def _get_command_reports(self, commands: list[str]) -> list[CommandReport]:
         modify_commands_reports = []
-        input_provider = AgentInputProvider(self.agent)
-        with LocalCommandExecutor(input_provider).session() as session:
+        input_provider = AgentInputProvider(self.agent, answer_cache=self.prompt_answers)
+        with self._output_stream() as output_stream, \
+                LocalCommandExecutor(input_provider, output_stream=output_stream).session() as session:
+            if self.batch_analysis:
+                return self._execute_batched(session, commands)
             for command in commands:
                 command_output = session.execute_command(command)
-                command_report = self.agent.analyze_output(command_output)
-                modify_commands_reports.append(command_report)
+                modify_commands_reports.append(self._analyze(command, command_output, *self._measurements(session)))
         return modify_commands_reports
 
     # Use cases:
@@ -100,25 +240,164 @@ class GraphAgent:
     def execute_mutator_commands(self, state: AgentState):
         current_goal = state['goal_reports'].pop()
         for command_report in current_goal.command_reports:
-            if not command_report.success:
-                modify_commands = self.agent.fetch_modify_file_commands(self.doc.filepath, command_report)
-                command_reports = self._get_command_reports(modify_commands)
+            # Commands that were not executed have no success, they are not the ones to fix
+            if command_report.success is False:
+                # Parallel goal workers share the document, so only one of them may modify it at a time
+                with self.doc.lock:
+                    modify_commands = self.agent.fetch_modify_file_commands(self.doc.filepath, command_report)
+                    command_reports = self._get_command_reports(modify_commands)
                 current_goal.modify_command_reports += command_reports
         return {'goal_reports': state['goal_reports'] + [current_goal]}
 
+    def _execution_container(self, checkpoint: Checkpoint | None = None):
+        if checkpoint:
+            return new_container(image=checkpoint.image)
+        if self.container_pool:
+            return self.container_pool.lease()
+        return new_container()
+
+    def _output_stream(self):
+        return self.output_store.open_stream() if self.output_store else contextlib.nullcontext()
+
+    @staticmethod
+    def _measurements(session: CommandExecutor) -> tuple[ResourceUsage | None, OutputRef | None, int | None]:
+        """What the session recorded about the last executed command, read before the next command starts"""
+        return session.resource_usage, session.output_ref, session.exit_code
+
+    def _succeeded_report(self, command: str, response: str, exit_code: int | None) -> CommandReport | None:
+        if not self.skip_successful_analysis:
+            return None
+        return succeeded_report(command, response, exit_code)
+
+    def _analyze(self, command: str, response: str, resource_usage: ResourceUsage | None, output: OutputRef | None,
+                 exit_code: int | None) -> CommandReport:
+        command_report = (self._succeeded_report(command, response, exit_code)
+                          or self.agent.analyze_output(compact_output(response)))
+        command_report.resource_usage = resource_usage
+        command_report.output = output
+        command_report.exit_code = exit_code
+        return command_report
+
+    def _execute_pipelined(self, session: ContainerCommandExecutor, commands: list[str]) -> list[CommandReport]:
+        """Execute the commands in order, analyzing the output of each command while the next one executes"""
+        analyses: list[Future[CommandReport]] = []
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="breba-analysis") as analysis_pool:
+            for command in commands:
+                if self.cancel_after_failure and any(
+                        analysis.done() and analysis.result().success is False for analysis in analyses):
+                    print("Earlier command failed, not executing the remaining commands")
+                    break
+                response = session.execute_command(command)
+                analyses.append(analysis_pool.submit(self._analyze, command, response, *self._measurements(session)))
+            command_reports = [analysis.result() for analysis in analyses]
+
+        not_executed = commands[len(command_reports):]
+        return command_reports + [CommandReport(command, None, None, "Not executed because an earlier command failed")
+                                  for command in not_executed]
+
+    def _execute_batched(self, session: CommandExecutor, commands: list[str]) -> list[CommandReport]:
+        """Execute the commands in order, then analyze all of their outputs together"""
+        command_reports: list[CommandReport | None] = []
+        measurements = []
+        # Outputs that need to be analyzed by the agent, along with the position of their command
+        command_outputs = []
+        for command in commands:
+            response = session.execute_command(command)
+            resource_usage, output, exit_code = self._measurements(session)
+            measurements.append((resource_usage, output, exit_code))
+            command_reports.append(self._succeeded_report(command, response, exit_code))
+            if not command_reports[-1]:
+                command_outputs.append((len(command_reports) - 1, (command, compact_output(response))))
+
+        if command_outputs:
+            analyzed_reports = self.agent.analyze_outputs([command_output for _, command_output in command_outputs])
+            for (index, _), command_report in zip(command_outputs, analyzed_reports):
+                command_reports[index] = command_report
+
+        for command_report, (resource_usage, output, exit_code) in zip(command_reports, measurements):
+            command_report.resource_usage = resource_usage
+            command_report.output = output
+            command_report.exit_code = exit_code
+        return command_reports
+
+    def _checkpoint_environment(self) -> str:
+        """What commands start from, project files may have been modified since the last run of the goal"""
+        files = self.workspace.manifest() if self.workspace else {}
+        # Goals are re-evaluated after the document was fixed, so a change of the document must not invalidate the
+        # checkpoints. The fixed document is synced into the restored container.
+        document = self.doc.filepath.resolve()
+        files = {path: digest for path, digest in files.items() if (self.workspace.root / path).resolve() != document}
+        return environment_key(self.checkpoints.base_image(), files)
+
+    def _run_commands(self, session: CommandExecutor, commands: list[str], command_reports: list[CommandReport],
+                      container: Container | None = None, environment: str = "") -> list[CommandReport]:
+        """Execute the commands that don't have a report yet, checkpointing the container when one is given"""
+        checkpoints = self.checkpoints if container else None
+        if self.pipeline_analysis or self.batch_analysis:
+            remaining_commands = commands[len(command_reports):]
+            if self.pipeline_analysis:
+                command_reports += self._execute_pipelined(session, remaining_commands)
+            else:
+                command_reports += self._execute_batched(session, remaining_commands)
+            # Container has moved past the intermediate commands, so only the full run can be checkpointed
+            if checkpoints and all(report.success for report in command_reports):
+                checkpoints.save(container, commands, command_reports, environment)
+        else:
+            for index in range(len(command_reports), len(commands)):
+                response = session.execute_command(commands[index])
+                command_reports.append(self._analyze(commands[index], response, *self._measurements(session)))
+                if checkpoints and all(report.success for report in command_reports):
+                    checkpoints.save(container, commands[:index + 1], command_reports, environment)
+        return command_reports
+
     def execute_commands(self, state: AgentState):
         # Grab the commands from the last goal report
         current_goal = state["goal_reports"].pop()
         commands: list[str] = [command_report.command for command_report in current_goal.command_reports]
-
-        command_reports = []
-        input_provider = AgentInputProvider(self.agent)
-        with new_container():
-            with ContainerCommandExecutor(input_provider).session() as session:
-                for command in commands:
-                    response = session.execute_command(command)
-                    command_report = self.agent.analyze_output(response)
-                    command_reports.append(command_report)
+        input_provider = AgentInputProvider(self.agent, answer_cache=self.prompt_answers)
+
+        if self.replay_transcript:
+            # Recorded executions stand in for the container
+            with self._output_stream() as output_stream:
+                executor = ReplayCommandExecutor(self.replay_transcript, input_provider, self.replay_time_scale,
+                                                 output_stream)
+                command_reports = []
+                try:
+                    with executor.session() as session:
+                        command_reports = self._run_commands(session, commands, command_reports)
+                except MissingRecordingError as e:
+                    # Transcript is of other commands, for example of an earlier version of the document
+                    print(e)
+                    command_reports += [CommandReport(command, None, None, f"Not replayed. {e}")
+                                        for command in commands[len(command_reports):]]
+                current_goal.command_reports = command_reports
+            return { 'goal_reports': state['goal_reports'] + [current_goal] }
+
+        environment = self._checkpoint_environment() if self.checkpoints else ""
+        checkpoint = self.checkpoints.restore_point(commands, environment) if self.checkpoints else None
+        # Commands up to the checkpoint already ran, so their reports are reused
+        command_reports = list(checkpoint.reports) if checkpoint else []
+        with self._execution_container(checkpoint) as container, self._output_stream() as output_stream:
+            if self.workspace:
+                # Documents may have been modified since the container was warmed up
+                self.workspace.sync(container)
+            executor = ContainerCommandExecutor(input_provider, uri=pty_server_uri(container), container=container,
+                                                output_stream=output_stream)
+            if self.record_transcript:
+                executor = RecordingCommandExecutor(executor, self.record_transcript)
+            with executor.session() as session:
+                if checkpoint:
+                    for command in checkpoint.replay_commands():
+                        session.execute_command(command)
+
+                command_reports = self._run_commands(session, commands, command_reports, container, environment)
+
+            container.reload()
+            if container.status != 'running':
+                current_goal.container_logs = container_log_tail(container)
+
+            if self.workspace:
+                self.workspace.forget(container)
 
         current_goal.command_reports = command_reports
 
@@ -140,7 +419,7 @@ class GraphAgent:
 
         message = HumanMessage(content=f"Give me commands for this goal: {json.dumps(asdict(current_goal))}")
         messages += [message]
-        model_response = self.model.invoke(messages)
+        model_response = self._invoke_model(messages)
         messages.append(model_response)
         commands = [cmd.strip() for cmd in model_response.content.split(",")]
 
@@ -162,7 +441,7 @@ class GraphAgent:
         new_messages.append(HumanMessage(content="What are my goals for this document?"))
 
         # Invoke the model
-        response_message = self.model.invoke(new_messages)
+        response_message = self._invoke_model(new_messages)
         new_messages.append(response_message)
 
         # Parse goals from the response
@@ -1,13 +1,34 @@
 import json
 import os
 import platform
+import threading
 from pathlib import Path
 
-from openai import OpenAI
+from openai import NotFoundError, OpenAI
 
 from breba_docs.agent.agent import Agent
+from breba_docs.agent.assistant_registry import ASSISTANT_NAME, AssistantRegistry
 from breba_docs.agent.instruction_reader import get_instructions
 from breba_docs.services.reports import CommandReport
+from breba_docs.services.response_cache import ResponseCache
+
+
+# Rough number of characters per token, used to keep batches of outputs within a token budget
+CHARACTERS_PER_TOKEN = 4
+
+
+def batch_command_outputs(command_outputs: list[tuple[str, str]], max_characters: int) -> list[list[tuple[str, str]]]:
+    """Split command outputs into batches that fit in max_characters, keeping only the end of outputs that don't fit"""
+    batches = [[]]
+    batch_size = 0
+    for command, output in command_outputs:
+        output = output[-max_characters:]
+        if batches[-1] and batch_size + len(output) > max_characters:
+            batches.append([])
+            batch_size = 0
+        batches[-1].append((command, output))
+        batch_size += len(output)
+    return [batch for batch in batches if batch]
 
 
 class OpenAIAgent(Agent):
@@ -27,14 +48,44 @@ You are assisting a software program to validate contents of a document.
     INPUT_FOLLOW_UP_MESSAGE = """What should the response in the terminal be? Provide the exact answer to put into the
     terminal in order to answer the prompt."""
 
-    def __init__(self):
+    def __init__(self, registry: AssistantRegistry | None = None, model="gpt-4o-mini",
+                 response_cache: ResponseCache | None = None):
         self.client = OpenAI()
-        self.assistant = self.client.beta.assistants.create(
-            name="Breba Docs",
-            instructions=OpenAIAgent.INSTRUCTIONS_GENERAL,
-            model="gpt-4o-mini"
-        )
-        self.thread = None
+        self.model = model
+        # When provided, identical runs are answered from the cache
+        self.response_cache = response_cache
+        # With a registry the assistant outlives the agent and is shared with other agents, otherwise it is
+        # created for this agent and deleted on close
+        self.registry = registry
+        if registry:
+            self.assistant_id = registry.assistant_id(self.client, model, OpenAIAgent.INSTRUCTIONS_GENERAL)
+        else:
+            self.assistant_id = self.client.beta.assistants.create(
+                name=ASSISTANT_NAME,
+                instructions=OpenAIAgent.INSTRUCTIONS_GENERAL,
+                model=model
+            ).id
+        # Every calling thread has its own conversation thread, so that output analysis can run next to prompts
+        self._local = threading.local()
+
+    @property
+    def thread(self):
+        return getattr(self._local, "thread", None)
+
+    @thread.setter
+    def thread(self, thread):
+        self._local.thread = thread
+
+    @property
+    def history(self) -> list[dict]:
+        """Messages of the current conversation, which includes runs that were answered from the cache"""
+        if not hasattr(self._local, "history"):
+            self._local.history = []
+        return self._local.history
+
+    def _cache_key(self, instructions: str, message: str) -> str:
+        return ResponseCache.key(self.model, 0.0, OpenAIAgent.INSTRUCTIONS_GENERAL + "\n" + instructions,
+                                 self.history + [{"role": "user", "content": message}])
 
     def __enter__(self):
         return self
@@ -49,6 +100,15 @@ You are assisting a software program to validate contents of a document.
 
         return messages.data[0].content[0].text.value
 
+    def _create_run(self, instructions):
+        return self.client.beta.threads.runs.create_and_poll(
+            thread_id=self.thread.id,
+            assistant_id=self.assistant_id,
+            instructions=instructions,
+            temperature=0.0,
+            top_p=1.0,
+        )
+
     def do_run(self, message, instructions, new_thread=True):
         print("--------------------------------------------------------------------------------")
         print(f"Instructions:\n {instructions}")
@@ -62,7 +122,28 @@ You are assisting a software program to validate contents of a document.
         truncated_message = message[-max_length:]
 
         if new_thread:
-            self.thread = self.client.beta.threads.create()
+            # Thread is created when the first run is not answered from the cache
+            self.thread = None
+            self.history.clear()
+
+        cache_key = self._cache_key(instructions, truncated_message) if self.response_cache is not None else None
+        agent_response = self.response_cache.get(cache_key) if self.response_cache is not None else None
+        if agent_response is not None:
+            print(f"Agent Response (cached): {agent_response}")
+        else:
+            agent_response = self._run(truncated_message, instructions)
+            if self.response_cache is not None:
+                self.response_cache.put(cache_key, agent_response)
+
+        if agent_response is not None:
+            self.history.append({"role": "user", "content": truncated_message})
+            self.history.append({"role": "assistant", "content": agent_response})
+        return agent_response
+
+    def _run(self, truncated_message, instructions):
+        if self.thread is None:
+            # Earlier runs of the conversation may have been answered from the cache, the thread needs them
+            self.thread = self.client.beta.threads.create(messages=list(self.history))
 
         self.client.beta.threads.messages.create(
             thread_id=self.thread.id,
@@ -70,13 +151,16 @@ You are assisting a software program to validate contents of a document.
             content=truncated_message
         )
 
-        run = self.client.beta.threads.runs.create_and_poll(
-            thread_id=self.thread.id,
-            assistant_id=self.assistant.id,
-            instructions=instructions,
-            temperature=0.0,
-            top_p=1.0,
-        )
+        try:
+            run = self._create_run(instructions)
+        except NotFoundError:
+            if not self.registry:
+                raise
+            # Registered assistant was deleted, for example from the OpenAI dashboard
+            print(f"Assistant {self.assistant_id} no longer exists, creating a new one")
+            self.registry.forget(self.assistant_id)
+            self.assistant_id = self.registry.assistant_id(self.client, self.model, OpenAIAgent.INSTRUCTIONS_GENERAL)
+            run = self._create_run(instructions)
 
         if run.status == 'completed':
             agent_response = self.get_last_message()
@@ -111,6 +195,28 @@ You are assisting a software program to validate contents of a document.
         analysis = self.do_run(message, instructions)
         return CommandReport.from_string(analysis)
 
+    def analyze_outputs(self, command_outputs: list[tuple[str, str]], max_batch_tokens=50000) -> list[CommandReport]:
+        command_reports = []
+        for batch in batch_command_outputs(command_outputs, max_batch_tokens * CHARACTERS_PER_TOKEN):
+            command_reports += self._analyze_batch(batch)
+        return command_reports
+
+    def _analyze_batch(self, batch: list[tuple[str, str]]) -> list[CommandReport]:
+        instructions = get_instructions("analyze_outputs", example_report=CommandReport.example_str())
+        message = "Here are the commands that were run, each followed by its output. What is your conclusion for each command? \n"
+        for number, (command, output) in enumerate(batch, 1):
+            message += f"\nCommand {number}: {command}\nOutput of command {number}:\n{output}\n"
+        analysis = self.do_run(message, instructions)
+        try:
+            command_reports = [CommandReport.from_dict(data) for data in json.loads(analysis)["reports"]]
+        except (TypeError, ValueError, KeyError) as e:
+            print(f"Could not parse batched analysis: {e}")
+            command_reports = []
+        if len(command_reports) != len(batch):
+            print("Batched analysis does not match the commands, analyzing them one at a time")
+            return [self.analyze_output(output) for _, output in batch]
+        return command_reports
+
     def provide_input(self, text: str) -> str:
         message = OpenAIAgent.INPUT_FIRST_MESSAGE + "\n" + text
         first_instruction = get_instructions("provide_input_1")
@@ -127,6 +233,10 @@ You are assisting a software program to validate contents of a document.
                 return prompt_answer
         return "breba-noop"
 
+    def answer_prompt(self, text: str) -> str:
+        message = text + "\n" + OpenAIAgent.INPUT_FOLLOW_UP_MESSAGE
+        return self.do_run(message, get_instructions("provide_input_2"))
+
     def fetch_modify_file_commands(self, filepath: Path, command_report: CommandReport) -> list[str]:
         message = get_instructions(
             "fetch_modify_file_commands_message_1",
@@ -144,4 +254,5 @@ You are assisting a software program to validate contents of a document.
         return commands
 
     def close(self):
-        self.client.beta.assistants.delete(self.assistant.id)
+        if not self.registry:
+            self.client.beta.assistants.delete(self.assistant_id)
@@ -0,0 +1,252 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+import openai
+
+
+class Priority(IntEnum):
+    # Command execution is blocked on a prompt until it is answered
+    INPUT = 0
+    # Identifying goals and commands, and fixing the document
+    PLANNING = 1
+    # Analysis of outputs, which nothing else is waiting on
+    ANALYSIS = 2
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    sequence: int
+    tokens: int = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempt: int = field(default=0, compare=False)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds to wait before retrying, as asked by the retry-after headers of the response, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(headers["retry-after"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+
+class RateLimitScheduler:
+    """
+    Runs model requests within the requests per minute and tokens per minute budgets of an API key.
+
+    Requests wait in a queue ordered by priority and are started when the budgets of the last minute allow it, with
+    at most max_concurrency requests in flight. Failed requests that can be retried are put back in the queue after
+    a jittered exponential backoff, or after the delay asked by retry-after. A rate limited request also holds back
+    every other request for that delay, so that a burst of requests does not turn into a burst of retries.
+
+    Requests are awaited on an event loop that the scheduler runs in a background thread, so that they can be
+    submitted from any thread, like the threads of parallel goal workers.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=200_000, max_concurrency=8, max_retries=5,
+                 base_delay=1.0, max_delay=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window_seconds = 60.0
+        # Everything below is only used on the loop of the scheduler
+        self._queue: list[_Request] = []
+        self._sequence = itertools.count()
+        # Start time and tokens of the requests that count against the budgets
+        self._window: deque[tuple[float, int]] = deque()
+        self._running: set[asyncio.Task] = set()
+        self._paused_until = 0.0
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def set_limits(self, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._wakeup = asyncio.Event()
+                    self._dispatcher = loop.create_task(self._dispatch())
+                    started.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="model-request-scheduler", daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def run(self, call: Callable[[], Awaitable[Any]], tokens: int, priority=Priority.PLANNING) -> Any:
+        """Schedule the call and wait for its result, from a thread that is not running an event loop"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._enqueue(call, tokens, priority), loop).result()
+
+    async def submit(self, call: Callable[[], Awaitable[Any]], tokens: int, priority=Priority.PLANNING) -> Any:
+        """Schedule the call and await its result, from any event loop"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._enqueue(call, tokens, priority)
+        future: Future = asyncio.run_coroutine_threadsafe(self._enqueue(call, tokens, priority), loop)
+        return await asyncio.wrap_future(future)
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+    async def _shutdown(self) -> None:
+        tasks = [self._dispatcher, *self._running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _enqueue(self, call: Callable[[], Awaitable[Any]], tokens: int, priority: int) -> Any:
+        request = _Request(priority, next(self._sequence), tokens, call, asyncio.get_running_loop().create_future())
+        self._push(request)
+        return await request.future
+
+    def _push(self, request: _Request) -> None:
+        heapq.heappush(self._queue, request)
+        self._wakeup.set()
+
+    def _next_wait(self) -> float | None:
+        """Seconds until the next request can start, or None when it has to wait for a request to finish or arrive"""
+        if not self._queue or len(self._running) >= self.max_concurrency:
+            return None
+        now = time.monotonic()
+        while self._window and self._window[0][0] <= now - self.window_seconds:
+            self._window.popleft()
+
+        waits = [self._paused_until - now]
+        if len(self._window) >= self.requests_per_minute:
+            waits.append(self._window[0][0] + self.window_seconds - now)
+        # A request larger than the whole budget is let through once nothing else counts against it
+        excess = sum(tokens for _, tokens in self._window) + self._queue[0].tokens - self.tokens_per_minute
+        if self._window and excess > 0:
+            released = 0
+            for started, tokens in self._window:
+                released += tokens
+                if released >= excess:
+                    waits.append(started + self.window_seconds - now)
+                    break
+            else:
+                waits.append(self._window[-1][0] + self.window_seconds - now)
+        return max(0.0, *waits)
+
+    async def _dispatch(self) -> None:
+        while True:
+            wait = self._next_wait()
+            if wait is None:
+                await self._wakeup.wait()
+            elif wait > 0:
+                # Arriving requests may have a higher priority, so the wait is cut short by them
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                request = heapq.heappop(self._queue)
+                if request.future.done():
+                    continue
+                self._window.append((time.monotonic(), request.tokens))
+                task = asyncio.create_task(self._execute(request))
+                self._running.add(task)
+                task.add_done_callback(self._finished)
+                continue
+            self._wakeup.clear()
+
+    async def _execute(self, request: _Request) -> None:
+        try:
+            result = await request.call()
+        except Exception as e:
+            delay = self._retry_delay(e, request.attempt)
+            if delay is None:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                print(f"Model request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                request.attempt += 1
+                asyncio.get_running_loop().call_later(delay, self._push, request)
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        # A slot is free for the next request
+        self._running.discard(task)
+        self._wakeup.set()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            # Full jitter, so that requests that failed together are not retried together
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        else:
+            delay += random.uniform(0, self.base_delay)
+        if isinstance(error, openai.RateLimitError):
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+
+_shared_scheduler: RateLimitScheduler | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> RateLimitScheduler:
+    """Scheduler of the process, budgets of an API key hold for every agent and document that uses it"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RateLimitScheduler()
+        return _shared_scheduler
@@ -1,12 +1,65 @@
+import contextlib
+
+from breba_docs import config
+from breba_docs.agent.assistant_registry import AssistantRegistry
 from breba_docs.agent.graph_agent import GraphAgent
+from breba_docs.agent.scheduler import shared_scheduler
 from breba_docs.analyzer.reporter import Reporter
+from breba_docs.checkpoints import CheckpointStore
+from breba_docs.container import ContainerPool
 from breba_docs.services.document import Document
+from breba_docs.services.output_store import OutputStore
+from breba_docs.services.prompt_cache import PromptAnswerCache
 from breba_docs.services.reports import DocumentReport
+from breba_docs.services.response_cache import ResponseCache
+from breba_docs.services.transcript import Transcript
+from breba_docs.workspace import WorkspaceSync
 
 
 def create_document_report(doc: Document):
-    graph = GraphAgent(doc)  # agent(doc)
-    goal_reports = graph.invoke()['goal_reports']
+    # Pool starts warming up containers while goals are being identified
+    # Files next to the document, for example a cloned repository, are made available in the container
+    workspace = WorkspaceSync(doc.filepath.parent)
+    # Every parallel goal worker needs a container
+    pool_size = max(config.container_pool_size, config.max_parallel_goals)
+    prompt_answers = PromptAnswerCache(config.prompt_cache_path, config.prompt_cache_size)
+    output_store = OutputStore(config.output_store_dir, use_mmap=config.output_store_mmap,
+                               keep_runs=config.output_store_keep_runs) if config.output_store_dir else None
+    record_transcript = Transcript(config.record_transcript) if config.record_transcript else None
+    replay_transcript = Transcript(config.replay_transcript) if config.replay_transcript else None
+    assistant_registry = AssistantRegistry(config.assistant_registry_path) if config.assistant_registry_path else None
+    response_cache = ResponseCache(config.response_cache_path, config.response_cache_max_bytes,
+                                   config.response_cache_ttl) if config.response_cache_path else None
+    if replay_transcript and response_cache is None:
+        print("Replaying commands without a response cache, the agent will still make requests to the model")
+    # Limits apply to every document analyzed by the process
+    shared_scheduler().set_limits(config.requests_per_minute, config.tokens_per_minute, config.max_concurrent_requests)
+    # Replayed runs don't need docker
+    pool = contextlib.nullcontext() if replay_transcript else ContainerPool(size=pool_size, workspace=workspace)
+    # Every checkpoint is a docker commit, which only pays off when goals are re-evaluated often
+    checkpoint_store = CheckpointStore() if config.checkpoint_commands else contextlib.nullcontext()
+    with pool as container_pool, checkpoint_store as checkpoints:
+        graph = GraphAgent(doc, container_pool, checkpoints, max_parallel_goals=config.max_parallel_goals,
+                           workspace=workspace, prompt_answers=prompt_answers,
+                           pipeline_analysis=config.pipeline_analysis,
+                           cancel_after_failure=config.cancel_after_failure,
+                           batch_analysis=config.batch_analysis, output_store=output_store,
+                           skip_successful_analysis=config.skip_successful_analysis,
+                           record_transcript=record_transcript, replay_transcript=replay_transcript,
+                           replay_time_scale=config.replay_time_scale, agent_backend=config.agent_backend,
+                           agent_streaming=config.agent_streaming,
+                           assistant_registry=assistant_registry,
+                           response_cache=response_cache)  # agent(doc)
+        try:
+            goal_reports = graph.invoke()['goal_reports']
+        finally:
+            graph.close()
+    print(f"Prompt answers: {prompt_answers.stats()}")
+    if response_cache is not None:
+        print(f"Model responses: {response_cache.stats()}")
+        response_cache.close()
+    if output_store:
+        print(f"Command outputs are stored in {output_store.path}")
     #     TODO: give document name other than Some Document
     document_report: DocumentReport = DocumentReport("Some Document", goal_reports)
     Reporter(document_report).print_report()
@@ -1,3 +1,16 @@
+from breba_docs.services.reports import ResourceUsage
+
+
+def format_resource_usage(usage: ResourceUsage) -> str:
+    parts = [f"{usage.wall_time:.1f}s wall"]
+    if usage.cpu_seconds is not None:
+        parts.append(f"{usage.cpu_seconds:.1f}s CPU")
+    if usage.peak_memory_bytes is not None:
+        parts.append(f"{usage.peak_memory_bytes / 2 ** 20:.0f} MiB peak memory")
+    parts.append(f"{usage.output_bytes} bytes of output")
+    return ", ".join(parts)
+
+
 class Reporter:
     def __init__(self, document_report):
         self.document_report = document_report
@@ -16,5 +29,19 @@ class Reporter:
             for command_report in goal_report.command_reports:
                 print(f"  Command: {command_report.command}")
                 print(f"  Success: {'Yes' if command_report.success else 'No'}")
+                if command_report.exit_code is not None:
+                    print(f"  Exit status: {command_report.exit_code}")
+                if command_report.resource_usage:
+                    print(f"  Resources: {format_resource_usage(command_report.resource_usage)}")
+                if command_report.output:
+                    output = command_report.output
+                    print(f"  Output: {output.path} ({output.length} bytes at offset {output.offset})")
                 print(f"  Insights: {command_report.insights}\n")
 
+            print(f"  Goal resources: {format_resource_usage(goal_report.resource_usage())}\n")
+
+            if goal_report.container_logs:
+                print(f"  Container stopped unexpectedly, last logs:\n{goal_report.container_logs}\n")
+
+        print(f"Document resources: {format_resource_usage(self.document_report.resource_usage())}\n")
+
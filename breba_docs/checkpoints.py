@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import shlex
+from dataclasses import dataclass, field
+
+import docker
+from docker.models.containers import Container
+
+from breba_docs.services.reports import CommandReport
+
+# Shell builtins that only change the state of the shell session. This state is not part of a container snapshot,
+# so these commands are replayed when resuming from a checkpoint.
+SHELL_STATE_COMMANDS = {"cd", "pushd", "popd", "export", "unset", "source", ".", "alias", "unalias", "set", "shopt",
+                        "umask", "ulimit"}
+
+# Separators that chain multiple commands on a single line
+COMMAND_SEPARATORS = {"&&", "||", ";", "|", "&"}
+
+
+def prefix_key(commands: list[str], environment: str = "") -> str:
+    """Key that identifies the state of a container after running the commands in order, in the given environment"""
+    return hashlib.sha256(json.dumps([environment, commands]).encode("utf-8")).hexdigest()
+
+
+def environment_key(image: str, files: dict[str, str]) -> str:
+    """Key that identifies what the commands start from: the base image and the content hash of every project file"""
+    return hashlib.sha256(json.dumps([image, sorted(files.items())]).encode("utf-8")).hexdigest()
+
+
+def _command_words(command: str) -> list[list[str]]:
+    """Split a command line into the words of each chained command"""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        # Unbalanced quotes, treat as a single opaque command
+        return [command.split()]
+
+    words = [[]]
+    for token in tokens:
+        if token in COMMAND_SEPARATORS:
+            words.append([])
+        else:
+            words[-1].append(token)
+    return [command_words for command_words in words if command_words]
+
+
+def changes_shell_state(command: str) -> bool:
+    return any(words[0] in SHELL_STATE_COMMANDS for words in _command_words(command))
+
+
+def is_shell_state_only(command: str) -> bool:
+    """True when the command only changes the shell session, and so can be replayed cheaply"""
+    chained_commands = _command_words(command)
+    return bool(chained_commands) and all(words[0] in SHELL_STATE_COMMANDS for words in chained_commands)
+
+
+@dataclass
+class Checkpoint:
+    image: str
+    commands: list[str]
+    # Results of the commands that were run to get to this checkpoint, so that they don't have to be re-analyzed
+    reports: list[CommandReport] = field(default_factory=list)
+
+    def replay_commands(self) -> list[str]:
+        """Commands that need to run in a container started from this checkpoint to restore the shell session"""
+        return [command for command in self.commands if is_shell_state_only(command)]
+
+
+class CheckpointStore:
+    """
+    Snapshots of execution containers keyed by the commands that were run in them, and by the environment the
+    commands started from, so that a snapshot is not resumed after the base image or the project files, other than
+    the document under validation, changed.
+
+    A snapshot is a docker image committed from the container after a command succeeded. When a goal is
+    re-evaluated with the same leading commands, execution can start from the snapshot and run only the
+    commands that changed.
+
+    Snapshots don't contain the shell session, so commands like cd and export are replayed on resume. A command
+    that mixes shell state changes with other work (cd app && npm install) can't be replayed on its own, so no
+    checkpoint is taken after it.
+    """
+    REPOSITORY = "breba-checkpoint"
+
+    def __init__(self, client: docker.DockerClient | None = None):
+        self.client = client
+        self.checkpoints: dict[str, Checkpoint] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _docker(self) -> docker.DockerClient:
+        if not self.client:
+            self.client = docker.from_env()
+        return self.client
+
+    @staticmethod
+    def can_checkpoint(commands: list[str]) -> bool:
+        """A prefix can be resumed only if its shell state can be restored by replaying commands"""
+        return all(is_shell_state_only(command) or not changes_shell_state(command) for command in commands)
+
+    def base_image(self) -> str:
+        """Id of the image that execution containers start from, the image name when docker can't resolve it"""
+        image = os.environ.get("BREBA_IMAGE", "breba-image")
+        try:
+            return self._docker().images.get(image).id
+        except docker.errors.DockerException as e:
+            print(f"Could not resolve image {image}: {e}")
+            return image
+
+    def save(self, container: Container, commands: list[str], reports: list[CommandReport],
+             environment: str = "") -> Checkpoint | None:
+        if not self.can_checkpoint(commands):
+            return None
+
+        key = prefix_key(commands, environment)
+        if key in self.checkpoints:
+            return self.checkpoints[key]
+
+        if commands and is_shell_state_only(commands[-1]) and len(commands) > 1:
+            # Filesystem did not change since the previous checkpoint, so share its image
+            previous = self.checkpoints.get(prefix_key(commands[:-1], environment))
+            if previous:
+                checkpoint = Checkpoint(previous.image, list(commands), list(reports))
+                self.checkpoints[key] = checkpoint
+                return checkpoint
+
+        try:
+            image = container.commit(repository=CheckpointStore.REPOSITORY, tag=key[:32])
+        except docker.errors.APIError as e:
+            # Checkpoints are only an optimization, execution carries on without them
+            print(f"Could not checkpoint container: {e}")
+            return None
+        checkpoint = Checkpoint(image.id, list(commands), list(reports))
+        self.checkpoints[key] = checkpoint
+        return checkpoint
+
+    def restore_point(self, commands: list[str], environment: str = "") -> Checkpoint | None:
+        """Checkpoint for the longest prefix of the commands that was saved before in the same environment"""
+        for prefix_length in range(len(commands), 0, -1):
+            checkpoint = self.checkpoints.get(prefix_key(commands[:prefix_length], environment))
+            if checkpoint:
+                return checkpoint
+        return None
+
+    def close(self):
+        images = {checkpoint.image for checkpoint in self.checkpoints.values()}
+        self.checkpoints = {}
+        for image in images:
+            try:
+                self._docker().images.remove(image, force=True)
+            except docker.errors.APIError as e:
+                print(f"Could not remove checkpoint image {image}: {e}")
@@ -2,6 +2,7 @@ import logging
 import sys
 
 from cleo.application import Application
+from breba_docs.cli.commands.gc_command import GcCommand
 from breba_docs.cli.commands.new_command import NewCommand
 from breba_docs.cli.commands.run_command import RunCommand
 from breba_docs.cli import __version__
@@ -29,6 +30,7 @@ def run():
     # Optionally, you can register a --version option here if Cleo doesn't provide it by default.
     app.add(NewCommand())
     app.add(RunCommand())
+    app.add(GcCommand())
 
     try:
         app.run()
@@ -0,0 +1,69 @@
+import os
+from pathlib import Path
+
+import yaml
+from cleo.commands.command import Command
+from cleo.helpers import argument, option
+from openai import OpenAI
+
+from breba_docs import config as app_config
+from breba_docs.agent.assistant_registry import AssistantRegistry
+
+
+class GcCommand(Command):
+    """
+    Delete assistants that are no longer used.
+
+    gc
+        {project_path? : path to the project. Defaults to the current directory.}
+        {--max-age-days=30 : Days since an assistant was last used before it is deleted}
+    """
+    name = "gc"
+    description = "Delete assistants of the breba-docs project that are no longer used."
+
+    arguments = [
+        argument(
+            "project_path",
+            description="path to the project. Defaults to the current directory.",
+            optional=True
+        )
+    ]
+
+    options = [
+        option(
+            "max-age-days",
+            description="Days since an assistant was last used before it is deleted",
+            flag=False,
+            default="30"
+        )
+    ]
+
+    def handle(self):
+        project_path = self.argument("project_path")
+        project_root = Path(os.getcwd()) / project_path if project_path else Path(os.getcwd())
+        config_path = project_root / "config.yaml"
+
+        if not config_path.exists():
+            self.line(
+                "<error>No configuration file found. Are you sure you are in a breba-docs project directory?</error>")
+            return
+
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except Exception as e:
+            self.line(f"<error>Error reading configuration file: {e}</error>")
+            return
+
+        first_model = next(iter(config["models"].values()))
+        os.environ["OPENAI_API_KEY"] = first_model["api_key"]
+        registry_path = config.get("assistant_registry_path", app_config.assistant_registry_path)
+        if not registry_path:
+            self.line("<comment>Assistant registry is disabled, nothing to collect.</comment>")
+            return
+
+        registry = AssistantRegistry(project_root / registry_path)
+        deleted = registry.collect_garbage(OpenAI(), float(self.option("max-age-days")))
+        for assistant_id in deleted:
+            self.line(f"Deleted assistant: {assistant_id}")
+        self.line(f"<info>Deleted {len(deleted)} assistants.</info>")
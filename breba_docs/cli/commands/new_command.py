@@ -1,12 +1,12 @@
 import os
 from pathlib import Path
 
-import docker
 import yaml
 
 from cleo.commands.command import Command
 from cleo.helpers import argument
-from docker.models.images import Image
+
+from breba_docs.image_builder import ImageSpec, build_image
 
 
 def create_project_structure(project_root):
@@ -16,38 +16,9 @@ def create_project_structure(project_root):
     prompts_dir.mkdir(parents=False, exist_ok=False)
 
 
-def create_docker_image(name, command):
+def create_docker_image(name, command, extra_packages: tuple[str, ...] = ()):
     command.line("Creating docker image...")
-    client = docker.from_env()
-
-    # Step 1: Run a container from the python:3 image to perform the setup.
-    setup_command = (
-        "bash -c '"
-        "python -m venv /usr/src/.venv "
-        "&& . /usr/src/.venv/bin/activate "
-        "&& pip install pty-server'"
-    )
-
-    command.line("Starting a sample container...")
-    setup_container = client.containers.run(
-        image="python:3",
-        command=setup_command,
-        working_dir="/usr/src",
-        detach=True,
-        tty=True
-    )
-
-    setup_container.wait()
-    command.line("Creating a new image...")
-
-    cmd_instruction = (
-        'CMD ["/bin/bash", "-c", "VIRTUAL_ENV_DISABLE_PROMPT=1 . .venv/bin/activate && pty-server"]'
-    )
-    new_image: Image = setup_container.commit(
-        repository=name,
-        tag="latest",
-        changes=[cmd_instruction]
-    )
+    new_image = build_image(name, ImageSpec(extra_packages=extra_packages), log=command.line)
     command.line(f"Docker image created.{new_image.tags}")
 
 
@@ -91,7 +62,8 @@ class NewCommand(Command):
 
             if create_docker:
                 container_image = self.ask("How would you like to name the new docker image:")
-                create_docker_image(container_image, self)
+                extra_packages = self.ask("Extra python packages to install in the image (space separated):", "")
+                create_docker_image(container_image, self, tuple(extra_packages.split()))
             else:
                 container_image = self.ask("What container image would you like to use for executing commands:")
 
@@ -9,6 +9,7 @@ from cleo.commands.command import Command
 from cleo.helpers import argument
 from git import Repo
 
+from breba_docs import config as app_config
 from breba_docs.analyzer.document_analyzer import create_document_report
 from breba_docs.analyzer.reporter import Reporter
 from breba_docs.services.document import Document
@@ -139,5 +140,33 @@ class RunCommand(Command):
         # TODO: create a config singleton module
         os.environ["OPENAI_API_KEY"] = first_model["api_key"]
         os.environ["BREBA_IMAGE"] = config["container_image"]
+        app_config.container_pool_size = config.get("container_pool_size", app_config.container_pool_size)
+        app_config.container_log_dir = config.get("container_log_dir", app_config.container_log_dir)
+        app_config.container_ready_marker = config.get("container_ready_marker", app_config.container_ready_marker)
+        app_config.max_parallel_goals = config.get("max_parallel_goals", app_config.max_parallel_goals)
+        app_config.prompt_cache_path = config.get("prompt_cache_path", app_config.prompt_cache_path)
+        app_config.prompt_cache_size = config.get("prompt_cache_size", app_config.prompt_cache_size)
+        app_config.checkpoint_commands = config.get("checkpoint_commands", app_config.checkpoint_commands)
+        app_config.pipeline_analysis = config.get("pipeline_analysis", app_config.pipeline_analysis)
+        app_config.cancel_after_failure = config.get("cancel_after_failure", app_config.cancel_after_failure)
+        app_config.batch_analysis = config.get("batch_analysis", app_config.batch_analysis)
+        app_config.output_store_dir = config.get("output_store_dir", app_config.output_store_dir)
+        app_config.output_store_mmap = config.get("output_store_mmap", app_config.output_store_mmap)
+        app_config.output_store_keep_runs = config.get("output_store_keep_runs", app_config.output_store_keep_runs)
+        app_config.skip_successful_analysis = config.get("skip_successful_analysis",
+                                                         app_config.skip_successful_analysis)
+        app_config.record_transcript = config.get("record_transcript", app_config.record_transcript)
+        app_config.replay_transcript = config.get("replay_transcript", app_config.replay_transcript)
+        app_config.replay_time_scale = config.get("replay_time_scale", app_config.replay_time_scale)
+        app_config.agent_backend = config.get("agent_backend", app_config.agent_backend)
+        app_config.agent_streaming = config.get("agent_streaming", app_config.agent_streaming)
+        app_config.requests_per_minute = config.get("requests_per_minute", app_config.requests_per_minute)
+        app_config.tokens_per_minute = config.get("tokens_per_minute", app_config.tokens_per_minute)
+        app_config.max_concurrent_requests = config.get("max_concurrent_requests", app_config.max_concurrent_requests)
+        app_config.assistant_registry_path = config.get("assistant_registry_path", app_config.assistant_registry_path)
+        app_config.response_cache_path = config.get("response_cache_path", app_config.response_cache_path)
+        app_config.response_cache_max_bytes = config.get("response_cache_max_bytes",
+                                                         app_config.response_cache_max_bytes)
+        app_config.response_cache_ttl = config.get("response_cache_ttl", app_config.response_cache_ttl)
         document = get_document(project_root)
         run_analyzer(document)
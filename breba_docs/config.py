@@ -1,6 +1,60 @@
 # Default configuration values
 debug_server = False
 project_path = "."
+# Number of warm containers kept ready for executing goals
+container_pool_size = 2
+# When set, containers are snapshotted after every successful command, so that re-evaluating a goal resumes from
+# the last snapshot of its unchanged leading commands
+checkpoint_commands = False
+# Number of goals that are validated at the same time, each goal in its own container
+max_parallel_goals = 1
+# When set, output of a command is analyzed while the next command of the goal executes
+pipeline_analysis = False
+# When pipelining, remaining commands of a goal are not executed once an earlier command is known to have failed
+cancel_after_failure = False
+# When set, outputs of all commands of a goal are analyzed together, pipeline_analysis takes precedence
+batch_analysis = False
+# When set, raw output of every command is kept in a directory per run under this directory
+output_store_dir: str | None = None
+# Number of most recent runs whose outputs are kept
+output_store_keep_runs = 10
+# Read stored outputs through memory maps instead of reading them into memory
+output_store_mmap = False
+# When set, commands that exit with status 0 and print nothing that looks like an error are not analyzed by the agent
+skip_successful_analysis = True
+# When set, command executions in containers are recorded to this transcript file
+record_transcript: str | None = None
+# When set, command executions are replayed from this transcript file instead of running in containers. The agent
+# still makes requests to the model, a replayed run is offline only with the response cache of the recorded run
+replay_transcript: str | None = None
+# Multiplier of recorded time between outputs when replaying, 0 replays as fast as possible
+replay_time_scale = 0.0
+# Agent backend, "assistants" for assistant runs, "chat" for single chat completions requests, or "async" for chat
+# completions requests scheduled within the rate limits below
+agent_backend = "assistants"
+# Rate limits of the API key, shared by every agent of the process when the backend is "async"
+requests_per_minute = 500
+tokens_per_minute = 200_000
+max_concurrent_requests = 8
+# When set, assistants are kept in this file, relative to the project directory, and reused by later runs
+assistant_registry_path: str | None = ".breba/assistants.json"
+# When set, responses of the model are cached in this SQLite file and reused for identical requests
+response_cache_path: str | None = ".breba/responses.sqlite"
+# Size of cached responses, least recently used are evicted first
+response_cache_max_bytes = 64 * 2 ** 20
+# Seconds a cached response is reused, None to reuse it until evicted
+response_cache_ttl: float | None = 7 * 24 * 60 * 60
+# When set, the chat backend prints responses as they arrive
+agent_streaming = False
+# Container log output that tells pty-server is accepting connections. None waits for the published port to accept
+# connections instead, for images that log something else
+container_ready_marker: str | None = "Server started"
+# When set, container logs are written to a file per container in this directory
+container_log_dir: str | None = None
+# Answers given to prompts are kept in this file, relative to the project directory, to be reused in later runs
+prompt_cache_path = ".breba/prompt_answers.json"
+# Number of prompt answers kept, least recently used are dropped first
+prompt_cache_size = 256
 
 def initialize(args):
     global debug_server, project_path
@@ -1,7 +1,13 @@
+import codecs
 import contextlib
 import os
+import queue
+import socket
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
 from io import BytesIO
 import tarfile
 from pathlib import Path
@@ -10,41 +16,159 @@ import docker
 from docker.models.containers import Container
 
 from breba_docs import config
+from breba_docs.workspace import WorkspaceSync
 
+# Port that pty-server listens on inside the container
+PTY_SERVER_PORT = 44440
+# Host interface that pty-server port is published on
+PTY_SERVER_HOST = "127.0.0.1"
+# Seconds to keep probing the pty-server port of a container that did not log the ready marker
+PORT_PROBE_TIMEOUT = 2.0
 
-def get_container_logs(container):
-    log_buffer = b""
 
-    logs = container.logs(stream=True)
-    for log in logs:
-        # Append new log data to the buffer
-        log_buffer += log
+# Log pumps of running containers by container id
+_container_logs: dict[str, "ContainerLogs"] = {}
 
+
+class ContainerLogs:
+    """
+    Streams container logs into a bounded buffer that keeps only the most recent output.
+
+    Optionally echoes the logs to stdout and writes them to a log file that is rotated when it grows
+    above max_file_size. When ready_marker is given, the ready future resolves with the time the marker
+    showed up in the logs, or fails if the container stops before that.
+    """
+
+    def __init__(self, container: Container, max_buffer_size=64 * 1024, echo=False,
+                 log_file: Path | None = None, max_file_size=10 * 1024 * 1024, ready_marker: str | None = None):
+        self.container = container
+        self.max_buffer_size = max_buffer_size
+        self.echo = echo
+        self.log_file = log_file
+        self.max_file_size = max_file_size
+        self.ready_marker = ready_marker
+        self.ready: Future[float] = Future()
+        # End of the output seen so far, because the marker can be split across chunks
+        self._ready_window = ""
+
+        self._chunks: deque[bytes] = deque()
+        self._buffer_size = 0
+        self._lock = threading.Lock()
+        # Multibyte characters can be split across chunks, the decoder holds on to incomplete characters
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._file = None
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> "ContainerLogs":
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+        self.thread.start()
+        return self
+
+    def pump(self):
+        if self.log_file:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.log_file, "ab")
         try:
-            # Try decoding the buffer
-            decoded_log = log_buffer.decode('utf-8')
-            print(decoded_log, end="")
+            for chunk in self.container.logs(stream=True, follow=True):
+                self.write(chunk)
+        finally:
+            if self._file:
+                self._file.close()
+                self._file = None
+            # Log stream ends when the container stops
+            if self.ready_marker and not self.ready.done():
+                self.ready.set_exception(Exception("Container stopped before pty-server was ready"))
+
+    def write(self, chunk: bytes):
+        with self._lock:
+            self._chunks.append(chunk)
+            self._buffer_size += len(chunk)
+            # Drop the oldest chunks, but always keep the latest one even if it's larger than the buffer
+            while self._buffer_size > self.max_buffer_size and len(self._chunks) > 1:
+                self._buffer_size -= len(self._chunks.popleft())
+
+        watching = self.ready_marker and not self.ready.done()
+        if self.echo or watching:
+            text = self._decoder.decode(chunk)
+            if self.echo:
+                print(text, end="")
+            if watching:
+                self._watch_ready(text)
+
+        if self._file:
+            self._write_to_file(chunk)
+
+    def _watch_ready(self, text: str):
+        window = self._ready_window + text
+        if self.ready_marker in window:
+            self.ready.set_result(time.monotonic())
+        else:
+            self._ready_window = window[-len(self.ready_marker):]
+
+    def _write_to_file(self, chunk: bytes):
+        if self._file.tell() + len(chunk) > self.max_file_size:
+            self._file.close()
+            os.replace(self.log_file, self.log_file.with_name(self.log_file.name + ".1"))
+            self._file = open(self.log_file, "ab")
+        self._file.write(chunk)
+        self._file.flush()
+
+    def tail(self, max_bytes=16 * 1024) -> str:
+        """Most recent log output, up to max_bytes"""
+        with self._lock:
+            data = b"".join(self._chunks)
+        # Cutting the buffer can split a character, ignore the partial character at the start
+        return data[-max_bytes:].decode("utf-8", errors="ignore")
+
+
+def start_logs_thread(container, echo=True, log_file: Path | None = None,
+                      ready_marker: str | None = None) -> ContainerLogs:
+    # Create and start a thread to collect logs
+    container_logs = ContainerLogs(container, echo=echo, log_file=log_file, ready_marker=ready_marker).start()
+    _container_logs[container.id] = container_logs
+    return container_logs
+
 
-            # If successful, clear the buffer
-            log_buffer = b""
+@dataclass
+class StartupTimings:
+    # Seconds it took docker to create and start the container
+    start: float
+    # Seconds from starting the container until pty-server was accepting connections
+    ready: float | None = None
 
-        except UnicodeDecodeError:
-            # If decoding fails, accumulate more log data and retry
-            pass
 
+# Startup timings of running containers by container id
+_startup_timings: dict[str, StartupTimings] = {}
 
-def start_logs_thread(container):
-    # Create and start a thread to print logs
-    logs_thread = threading.Thread(target=get_container_logs, args=(container,))
-    logs_thread.start()
-    return logs_thread
 
+def container_startup_timings(container: Container) -> StartupTimings | None:
+    return _startup_timings.get(container.id)
 
-def container_setup(debug=False, dev=False) -> Container:
+
+def container_log_tail(container: Container, max_bytes=16 * 1024) -> str:
+    """Most recent log output of the container, for reporting why a container failed"""
+    container_logs = _container_logs.get(container.id)
+    if container_logs:
+        return container_logs.tail(max_bytes)
+    return container.logs(tail=200)[-max_bytes:].decode("utf-8", errors="ignore")
+
+
+def container_setup(debug=False, dev=False, port: int | None = None, image: str | None = None,
+                    ready_timeout=15) -> Container:
+    """
+    Start a container of the BREBA_IMAGE running pty-server, and wait until pty-server is accepting connections.
+
+    Args:
+        port: host port to publish pty-server on. By default, docker picks a free host port, so that many
+            containers can run side by side. Use pty_server_uri to find out which port was picked.
+        image: image to use instead of BREBA_IMAGE, for example a checkpoint of a previous container
+        ready_timeout: seconds to wait for pty-server to report that it is listening, or for its port to accept
+            connections when the image does not log a ready marker
+    """
     debug = debug or config.debug_server
 
     client = docker.from_env()
-    breba_image = os.environ.get("BREBA_IMAGE", "breba-image")
+    breba_image = image or os.environ.get("BREBA_IMAGE", "breba-image")
     print(f"Setting up the container with image: {breba_image}")
     kwargs = {}
     if dev:
@@ -65,35 +189,83 @@ def container_setup(debug=False, dev=False) -> Container:
             """
         ]
 
-    # TODO: make the port configurable
-    port = 44440
+    run_started = time.monotonic()
     container = client.containers.run(
         breba_image,
         stdin_open=True,
         tty=True,
         detach=True,
         working_dir="/usr/src",
-        ports={f'{port}/tcp': port},
+        # Only publish on loopback, pty-server gives shell access to anyone who can connect
+        ports={f'{PTY_SERVER_PORT}/tcp': (PTY_SERVER_HOST, port)},
         **kwargs
     )
 
-    # Block until the container is running, or exited
-    while container.status == 'created':
-        time.sleep(0.1)
-        container.reload()
+    started = time.monotonic()
+    timings = StartupTimings(start=started - run_started)
+    _startup_timings[container.id] = timings
+
+    log_file = Path(config.container_log_dir) / f"{container.short_id}.log" if config.container_log_dir else None
+    ready_marker = config.container_ready_marker
+    # no need to join because it should just run until the container stops
+    container_logs = start_logs_thread(container, echo=debug, log_file=log_file, ready_marker=ready_marker)
 
-    if container.status != 'running':
+    try:
+        if ready_marker:
+            ready_at = container_logs.ready.result(timeout=ready_timeout)
+        else:
+            ready_at = wait_for_port(container, ready_timeout)
+    except FutureTimeoutError:
+        print(f"pty-server did not report that it is ready in {ready_timeout} seconds, probing its port")
+        ready_at = wait_for_port(container, PORT_PROBE_TIMEOUT)
+    except Exception:
+        ready_at = None
+    if ready_at is None:
+        container.reload()
         print(f"Container status: {container.status}")
-        print(container.logs().decode('utf-8'))
+        print(container_log_tail(container))
         raise Exception("Container failed to start")
+    timings.ready = ready_at - started
 
     if debug:
-        start_logs_thread(container)  # no need to join because it should just run to the end of the process
-        time.sleep(0.5)
+        print(f"Container startup timings: {timings}")
 
     return container
 
 
+def destroy_container(container: Container) -> None:
+    container.stop()
+    container.remove()
+    _container_logs.pop(container.id, None)
+    _startup_timings.pop(container.id, None)
+
+
+def wait_for_port(container: Container, timeout: float) -> float | None:
+    """Time the published pty-server port accepted a connection, None when it did not within timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            host_port = int(pty_server_uri(container).rsplit(":", 1)[1])
+            with socket.create_connection((PTY_SERVER_HOST, host_port), timeout=1):
+                return time.monotonic()
+        except Exception:
+            if time.monotonic() >= deadline:
+                return None
+        time.sleep(0.1)
+
+
+def pty_server_uri(container: Container) -> str:
+    """Websocket uri of the pty-server that the container publishes on the host"""
+    bindings = container.ports.get(f"{PTY_SERVER_PORT}/tcp")
+    if not bindings:
+        # Port bindings are only known once docker has started the container
+        container.reload()
+        bindings = container.ports.get(f"{PTY_SERVER_PORT}/tcp")
+    if not bindings:
+        raise Exception(f"Container {container.short_id} does not publish pty-server port {PTY_SERVER_PORT}")
+    return f"ws://{PTY_SERVER_HOST}:{bindings[0]['HostPort']}"
+
+
 @contextlib.contextmanager
 def new_container(**kwargs):
     execution_container = None
@@ -102,8 +274,124 @@ def new_container(**kwargs):
         yield execution_container
     finally:
         if execution_container:
-            execution_container.stop()
-            execution_container.remove()
+            destroy_container(execution_container)
+
+
+class ContainerPool:
+    """
+    Keeps a number of started containers with a pty-server that is accepting connections, so that
+    leasing a container does not have to wait for docker run and pty-server startup.
+
+    Usage:
+        with ContainerPool(size=2) as pool:
+            with pool.lease() as container:
+                ...
+
+    Leased containers are destroyed when the lease ends, unless recycle=True is passed. Every lease starts a
+    replacement container in the background, so the pool stays warm. Closing the pool drops replacements that
+    did not start, and does not wait for the ones that are starting.
+
+    When a workspace is provided, it is copied into containers while they warm up, so that leasing only has
+    to send the files that changed since.
+    """
+
+    def __init__(self, size: int = 2, workspace: WorkspaceSync | None = None, **container_kwargs):
+        if size < 1:
+            raise ValueError("Container pool size must be at least 1")
+        self.size = size
+        self.workspace = workspace
+        # Each pooled container needs its own host port, so that containers don't fight over the pty-server port
+        self.container_kwargs = {**container_kwargs, "port": None}
+
+        # Holds ready containers, or the exception that prevented a container from starting
+        self._ready: queue.Queue[Container | Exception] = queue.Queue()
+        self._refill_executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="container-pool")
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        for _ in range(self.size):
+            self._refill()
+
+    def _refill(self):
+        self._refill_executor.submit(self._start_container)
+
+    def _start_container(self):
+        try:
+            # Returns once pty-server is accepting connections
+            container = container_setup(**self.container_kwargs)
+        except Exception as e:
+            self._ready.put(e)
+            return
+
+        if self.workspace:
+            try:
+                self.workspace.sync(container)
+            except Exception as e:
+                destroy_container(container)
+                self._ready.put(e)
+                return
+
+        with self._lock:
+            if not self._closed:
+                self._ready.put(container)
+                return
+        # Pool was closed while this container was starting up
+        destroy_container(container)
+
+    def acquire(self, timeout: float | None = None) -> Container:
+        """Take a ready container out of the pool and start a replacement in the background"""
+        if self._closed:
+            raise Exception("Container pool is closed")
+
+        try:
+            container = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No container became ready in {timeout} seconds")
+
+        self._refill()
+
+        if isinstance(container, Exception):
+            raise Exception("Pooled container failed to start") from container
+
+        return container
+
+    def release(self, container: Container, recycle=False) -> None:
+        """Return the container to the pool when recycle is True and there is room for it, otherwise destroy it"""
+        with self._lock:
+            if recycle and not self._closed and self._ready.qsize() < self.size:
+                self._ready.put(container)
+                return
+        destroy_container(container)
+
+    @contextlib.contextmanager
+    def lease(self, recycle=False, timeout: float | None = None):
+        container = self.acquire(timeout)
+        try:
+            yield container
+        finally:
+            self.release(container, recycle)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        # Refills that did not start are dropped. Containers that are still starting are not waited for, nothing
+        # would use them, and they destroy themselves once started because the pool is closed.
+        self._refill_executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                container = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(container, Exception):
+                destroy_container(container)
 
 
 def write_document_to_container(container: Container, document: str) -> None:
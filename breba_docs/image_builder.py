@@ -0,0 +1,71 @@
+import hashlib
+import json
+from dataclasses import dataclass, asdict, field
+from io import BytesIO
+
+import docker
+from docker.models.images import Image
+
+BASE_IMAGE = "python:3"
+# Same range as the pty-server dependency of breba-docs, so that the client and the server speak the same protocol
+PTY_SERVER_REQUIREMENT = "pty-server>=0.3.0,<0.4.0"
+# Label holding the digest of the ImageSpec that an image was built from
+DIGEST_LABEL = "breba.image-digest"
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    base_image: str = BASE_IMAGE
+    pty_server_requirement: str = PTY_SERVER_REQUIREMENT
+    extra_packages: tuple[str, ...] = field(default_factory=tuple)
+
+    def digest(self) -> str:
+        spec = asdict(self)
+        spec["extra_packages"] = sorted(self.extra_packages)
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def dockerfile(self) -> str:
+        # Every install is its own layer, so that changing extra packages reuses the pty-server layer from cache
+        lines = [
+            f"FROM {self.base_image}",
+            "WORKDIR /usr/src",
+            f"RUN python -m venv .venv && . .venv/bin/activate && pip install --no-cache-dir '{self.pty_server_requirement}'",
+        ]
+        if self.extra_packages:
+            packages = " ".join(f"'{package}'" for package in sorted(self.extra_packages))
+            lines.append(f"RUN . .venv/bin/activate && pip install --no-cache-dir {packages}")
+        lines.append('CMD ["/bin/bash", "-c", "VIRTUAL_ENV_DISABLE_PROMPT=1 . .venv/bin/activate && pty-server"]')
+        return "\n".join(lines) + "\n"
+
+
+def find_image(client: docker.DockerClient, spec: ImageSpec) -> Image | None:
+    images = client.images.list(filters={"label": f"{DIGEST_LABEL}={spec.digest()}"})
+    return images[0] if images else None
+
+
+def build_image(name: str, spec: ImageSpec, client: docker.DockerClient | None = None, log=print) -> Image:
+    """
+    Provide an image for executing commands, tagged as name:latest.
+
+    An image that was already built from the same spec is reused, otherwise the image is built with the docker
+    layer cache.
+    """
+    client = client or docker.from_env()
+
+    image = find_image(client, spec)
+    if image:
+        log(f"Reusing docker image {image.short_id} built from the same configuration")
+        image.tag(name, "latest")
+        return image
+
+    log("Building docker image...")
+    image, build_logs = client.images.build(
+        fileobj=BytesIO(spec.dockerfile().encode("utf-8")),
+        tag=f"{name}:latest",
+        labels={DIGEST_LABEL: spec.digest()},
+        rm=True,
+    )
+    for entry in build_logs:
+        if "stream" in entry and entry["stream"].strip():
+            log(entry["stream"].rstrip())
+    return image
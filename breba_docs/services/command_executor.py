@@ -1,16 +1,62 @@
 import abc
 import asyncio
 import contextlib
+import re
+import shlex
+import time
 import uuid
 from collections.abc import Coroutine
 
+from docker.models.containers import Container
 from interactive_process import InteractiveProcess, TerminatedProcessError, ReadWriteError
 
+from breba_docs.services.command_output import CommandOutput
+from breba_docs.services.container_stats import ContainerStats, StatsSample
 from breba_docs.services.input_provider import InputProvider
-from breba_docs.services.reports import CommandReport
+from breba_docs.services.output_store import OutputStream, OutputRef
+from breba_docs.services.reports import CommandReport, ResourceUsage
+from breba_docs.services.timeout_policy import IdleTimeoutPolicy, default_timeout_policy, \
+    default_local_timeout_policy
 from pty_server import AsyncPtyClient
 from pty_server.async_client import PtyServerResponse
 
+# Share of a CPU core that a quiet container has to use to be considered busy rather than waiting for input
+BUSY_CPU_SHARE = 0.1
+
+
+def exit_status_pattern(status_marker: str) -> re.Pattern:
+    """Matches the line with the exit status printed after a command"""
+    return re.compile(re.escape(status_marker) + r" (\d+)\r?\n")
+
+
+def with_exit_status(command: str, status_marker: str) -> str | None:
+    """
+    Command that prints its exit status after the status marker when it is done.
+
+    Returns None when printing the status could change how the command runs: the status is printed by a command
+    appended on the same line, which a comment would swallow and which can't follow a background command or a
+    command that is continued by a pipe or a list operator.
+    """
+    if "\n" in command or command.rstrip().endswith("&"):
+        return None
+    try:
+        with_comments = list(shlex.shlex(command, posix=True, punctuation_chars=True))
+        without_comments = shlex.shlex(command, posix=True, punctuation_chars=True)
+        without_comments.commenters = ""
+        if with_comments != list(without_comments):
+            return None
+    except ValueError:
+        return None
+    if with_comments and with_comments[-1] in ("|", "&&", "||"):
+        return None
+    # Another separator would be a syntax error, unless the semicolon is escaped, like the one of find -exec
+    command = command.rstrip()
+    if command.endswith(";") and not command.endswith("\\;"):
+        command = command[:-1].rstrip()
+    # Marker is split in two words, so that the shell echoing the command line does not print the marker itself
+    first_word, second_word = status_marker.split(" ", 1)
+    return f'{command}; echo "{first_word}" "{second_word}" $?'
+
 
 class CommandExecutor(abc.ABC):
     @abc.abstractmethod
@@ -27,40 +73,103 @@ class LocalCommandExecutor(CommandExecutor):
             self.process.flush_output()
             yield self
 
-    def __init__(self, input_provider: InputProvider, process: InteractiveProcess | None = None):
+    def __init__(self, input_provider: InputProvider, process: InteractiveProcess | None = None,
+                 timeout_policy: IdleTimeoutPolicy | None = None, max_output_head=64 * 1024,
+                 max_output_tail=192 * 1024, output_stream: OutputStream | None = None, max_empty_reads=2):
         self.input_provider = input_provider
         self.process = process
-
-    def execute_command(self, command):
+        self.timeout_policy = timeout_policy or default_local_timeout_policy
+        # Reads that time out without any output before the command is considered stuck
+        self.max_empty_reads = max_empty_reads
+        # Characters of output kept in memory from the beginning and from the end, the rest goes to a temporary file
+        self.max_output_head = max_output_head
+        self.max_output_tail = max_output_tail
+        # When provided, output is written to the stream as it arrives
+        self.output_stream = output_stream
+        # Location of the output of the last executed command in the output stream
+        self.output_ref: OutputRef | None = None
+        # Exit status and resources of the last executed command, exit status is None when it did not finish
+        self.exit_code: int | None = None
+        self.resource_usage: ResourceUsage | None = None
+
+    def execute_command(self, command) -> str:
+        with self.run_command(command) as output:
+            return output.text()
+
+    def run_command(self, command) -> CommandOutput:
+        """
+        Execute the command and return a handle to its output. The caller is responsible for closing the handle.
+        """
         command_id = str(uuid.uuid4())
         command_end_marker = f"Completed {command_id}"
-        self.process.send_command(command, end_marker=command_end_marker)
-
-        command_output = ""
+        # Shell expands $? in the end marker to the exit status of the command
+        self.process.send_command(command, end_marker=f"{command_end_marker} $?")
+        end_marker_pattern = exit_status_pattern(command_end_marker)
+        # End marker along with the longest exit status and line ending
+        end_marker_length = len(command_end_marker) + 6
+        self.exit_code = None
+        started = time.monotonic()
+        output_bytes = 0
+        if self.output_stream:
+            self.output_stream.begin()
+
+        timeout = self.timeout_policy.idle_timeout(command)
+        longest_silence = 0.0
+        last_output_at = time.monotonic()
+        # Tail has room for the end marker on top of the output, so that the marker can be removed from it
+        command_output = CommandOutput(self.max_output_head, self.max_output_tail + end_marker_length)
+        # End of the previous output, so that a marker split across reads is still found
+        window = ""
+        # Output that may be the beginning of the end marker is held back from the output stream
+        unwritten = ""
         new_output = ""
+        empty_reads = 0
         while True:
             try:
-                new_output = self.process.read_nonblocking(timeout=2)
-                command_output += new_output
-                if command_end_marker in new_output:
-                    command_output = command_output.replace(f"{command_end_marker}\n", "")
+                new_output = self.process.read_nonblocking(timeout=timeout)
+                empty_reads = 0
+                longest_silence = max(longest_silence, time.monotonic() - last_output_at)
+                last_output_at = time.monotonic()
+                command_output.append(new_output)
+                output_bytes += len(new_output.encode("utf-8"))
+                unwritten = self._write_output(unwritten + new_output, end_marker_length)
+                window = window[-(end_marker_length - 1):] + new_output
+                end_marker_match = end_marker_pattern.search(window)
+                if end_marker_match:
+                    end_marker = end_marker_match.group(0)
+                    command_output.remove(end_marker)
+                    self._finish_output(unwritten.replace(end_marker, ""))
+                    self.exit_code = int(end_marker_match.group(1))
+                    self.resource_usage = ResourceUsage(wall_time=time.monotonic() - started,
+                                                        output_bytes=output_bytes - len(end_marker))
                     print("Breaking on end marker")
+                    self.timeout_policy.observe(command, longest_silence)
                     return command_output
             except TimeoutError:
                 print("Breaking due to timeout. Need to check if waiting for input.")
                 if new_output:
+                    # Command is waiting, so what was held back is not the beginning of the end marker
+                    unwritten = self._write_output(unwritten, 0)
                     input_text = self.input_provider.get_input(new_output)
                     new_output = ""  # reset new_output so that if timeout happens twice in a row, we don't get stuck
 
                     # TODO: this does an implicit retry, when no input text is provided by get_input_text.
                     #  maybe should have an explicit retry. The else clause is a continue, but should it be?
                     if input_text:
-                        command_output += input_text
+                        command_output.append(input_text)
+                        self._write_output(input_text, 0)
+                        window = ""
                         self.process.send_input(input_text)
+                        # Time spent waiting for input is not a silence of the command
+                        last_output_at = time.monotonic()
 
                 else:
-                    print("Timed out, but no new output")
-                    break
+                    # Quiet commands like sleep or a download without progress are not stuck yet
+                    empty_reads += 1
+                    if empty_reads >= self.max_empty_reads:
+                        print("Timed out, but no new output")
+                        break
+                    print(f"No new output in {timeout} seconds (attempt {empty_reads}/{self.max_empty_reads})")
             except (TerminatedProcessError, ReadWriteError) as exc:
                 print(f"End of process output: {exc}")
                 break
@@ -68,15 +177,52 @@ class LocalCommandExecutor(CommandExecutor):
                 print(exc)
                 break
 
+        self._finish_output(unwritten)
+        self.resource_usage = ResourceUsage(wall_time=time.monotonic() - started, output_bytes=output_bytes)
         return command_output
 
+    def _write_output(self, output: str, hold_back: int) -> str:
+        """Write the output to the output stream, except for the last hold_back characters, which are returned"""
+        if not self.output_stream:
+            return ""
+        split_at = max(len(output) - hold_back, 0)
+        self.output_stream.write(output[:split_at])
+        return output[split_at:]
+
+    def _finish_output(self, unwritten: str):
+        if self.output_stream:
+            self.output_stream.write(unwritten)
+            self.output_ref = self.output_stream.end()
+
 
 class ContainerCommandExecutor(CommandExecutor):
-    def __init__(self, input_provider: InputProvider, pty_client: AsyncPtyClient | None = None):
+    def __init__(self, input_provider: InputProvider, pty_client: AsyncPtyClient | None = None, uri: str | None = None,
+                 container: Container | None = None, timeout_policy: IdleTimeoutPolicy | None = None,
+                 output_stream: OutputStream | None = None, max_output_head=64 * 1024,
+                 max_output_tail=192 * 1024):
         self.input_provider = input_provider
         self.pty_client : AsyncPtyClient | None = pty_client
-        # Used for async bridging
-        self.loop = asyncio.new_event_loop()
+        # Characters of output kept in memory from the beginning and from the end, the rest goes to a temporary file
+        self.max_output_head = max_output_head
+        self.max_output_tail = max_output_tail
+        # pty-server uri to connect to, default client uri is used when not provided
+        self.uri = uri
+        # When the container is known, CPU and memory used by each command are measured
+        self.container = container
+        self.stats: ContainerStats | None = None
+        # Resources used by the last executed command
+        self.resource_usage: ResourceUsage | None = None
+        self.timeout_policy = timeout_policy or default_timeout_policy
+        # When provided, output is written to the stream as it arrives
+        self.output_stream = output_stream
+        # Location of the output of the last executed command in the output stream
+        self.output_ref: OutputRef | None = None
+        # Exit status of the last executed command, None when it did not finish or could not be captured
+        self.exit_code: int | None = None
+        # Bytes of output of the last executed command that were not kept in memory
+        self.omitted_bytes = 0
+        # Used for bridging the sync API, async API runs on the loop of the caller
+        self.loop: asyncio.AbstractEventLoop | None = None
 
     def _run_in_own_loop(self, fut: asyncio.Future | Coroutine):
         """
@@ -84,23 +230,25 @@ class ContainerCommandExecutor(CommandExecutor):
         in the current thread. This is crucial if the code ends up running
         in a different thread than where it was created.
         """
+        if not self.loop:
+            self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
         return self.loop.run_until_complete(fut)
 
     def create_provide_input(self):
-        response_length = 0
+        chunks_seen = 0
 
-        def maybe_get_input(response: list[str]) -> str | None:
-            nonlocal response_length
+        async def maybe_get_input(last_chunk: str, chunk_count: int) -> str | None:
+            nonlocal chunks_seen
             # Only try to get input if new data was received
-            if response and len(response) != response_length:
-                response_length = len(response)
-                return self.input_provider.get_input(response[-1])
+            if chunk_count and chunk_count != chunks_seen:
+                chunks_seen = chunk_count
+                return await self.input_provider.get_input_async(last_chunk)
 
             return None
 
-        async def provide_input(response: list[str]) -> str | None:
-            input_message = maybe_get_input(response)
+        async def provide_input(last_chunk: str, chunk_count: int) -> str | None:
+            input_message = await maybe_get_input(last_chunk, chunk_count)
 
             if input_message:
                 return await self.pty_client.send_input(input_message)
@@ -109,41 +257,128 @@ class ContainerCommandExecutor(CommandExecutor):
 
         return provide_input
 
-    async def read_response(self, response: PtyServerResponse, timeout=0.5, max_retries=2):
-        """Read data from the server with custom retry logic."""
+    async def _cpu_seconds(self) -> float | None:
+        if not self.stats:
+            return None
+        try:
+            return (await asyncio.to_thread(self.stats.sample)).cpu_seconds
+        except Exception as e:
+            print(f"Could not sample container stats: {e}")
+            return None
+
+    async def read_response(self, response: PtyServerResponse, timeout: float | None = None, max_retries=2,
+                            command: str = ""):
+        """
+        Read data from the server with custom retry logic.
+
+        When no timeout is given, the timeout policy decides how long the command may stay quiet. A quiet command
+        that keeps the container CPU busy is still working, so it is not asked for input and does not use up retries.
+        """
+        timeout = timeout or self.timeout_policy.idle_timeout(command)
+        with CommandOutput(self.max_output_head, self.max_output_tail) as command_output:
+            received_bytes = await self._read_output(response, command_output, timeout, max_retries, command)
+            text = command_output.text()
+            self.omitted_bytes = max(received_bytes - len(text.encode("utf-8")), 0)
+            return text
+
+    async def _read_output(self, response: PtyServerResponse, command_output: CommandOutput, timeout: float,
+                           max_retries: int, command: str) -> int:
+        """Read the output of the command into command_output, returns the number of bytes received"""
         retries = 0
-        data_received = []
+        chunk_count = 0
+        received_bytes = 0
+        last_chunk = ""
         provide_input = self.create_provide_input()
+        longest_silence = 0.0
+        last_data_at = time.monotonic()
+        cpu_seconds = await self._cpu_seconds()
         while True:
             async for data in response.stream(timeout):
                 print(f"Data from Socket Client: {data}")
-                data_received.append(data)
+                longest_silence = max(longest_silence, time.monotonic() - last_data_at)
+                last_data_at = time.monotonic()
+                command_output.append(data)
+                chunk_count += 1
+                received_bytes += len(data.encode("utf-8"))
+                last_chunk = data
+                if self.output_stream:
+                    self.output_stream.write(data)
                 retries = 0  # Every time we have a successful read, we want to reset retries
 
             if response.completed():
-                return ''.join(data_received)
+                self.timeout_policy.observe(command, longest_silence)
+                return received_bytes
             if response.timedout():
+                previous_cpu_seconds, cpu_seconds = cpu_seconds, await self._cpu_seconds()
+                quiet_time = time.monotonic() - last_data_at
+                if (previous_cpu_seconds is not None and cpu_seconds is not None
+                        and cpu_seconds - previous_cpu_seconds > BUSY_CPU_SHARE * timeout
+                        and quiet_time < self.timeout_policy.max_quiet_time):
+                    print(f"No new Data received in {quiet_time:.1f} seconds, but the container is busy")
+                    continue
+
                 print(f"No new Data received in {timeout} seconds (attempt {retries}/{max_retries})")
                 # TODO: integration test should be able to catch when provide_input always returns None
                 #  because it is missing a return statement.
-                if await provide_input(data_received):
+                if await provide_input(last_chunk, chunk_count):
                     print(f"Provided input, restarting retries")
                     retries = 0
+                    # Time spent waiting for input is not a silence of the command
+                    last_data_at = time.monotonic()
                 else:
                     retries += 1
 
                 if retries >= max_retries:
                     print("Max retries reached.")
-                    return ''.join(data_received)
+                    return received_bytes
+
+    async def _begin_measure(self) -> StatsSample | None:
+        if not self.stats:
+            return None
+        try:
+            return await asyncio.to_thread(self.stats.begin)
+        except Exception as e:
+            print(f"Could not sample container stats: {e}")
+            return None
+
+    async def _end_measure(self, start: StatsSample | None, wall_time: float, output_bytes: int) -> ResourceUsage:
+        if start:
+            try:
+                return await asyncio.to_thread(self.stats.end, start, wall_time, output_bytes)
+            except Exception as e:
+                print(f"Could not sample container stats: {e}")
+        return ResourceUsage(wall_time=wall_time, output_bytes=output_bytes)
 
     async def do_execute(self, command: str):
-        response = await self.pty_client.send_command(command)
+        stats_start = await self._begin_measure()
+        if self.output_stream:
+            self.output_stream.begin()
+        started = time.monotonic()
+        status_marker = f"Exit-status {uuid.uuid4()}"
+        status_command = with_exit_status(command, status_marker)
+        response = await self.pty_client.send_command(status_command or command)
+        self.exit_code = None
+        self.omitted_bytes = 0
         if response:
-            response_text = await self.read_response(response)
+            response_text = await self.read_response(response, command=command)
+            if status_command:
+                response_text = self._extract_exit_status(response_text, status_command, command, status_marker)
         else:
             response_text = "Error occurred due to socket error. See log for details"
+        output_bytes = len(response_text.encode("utf-8")) + self.omitted_bytes
+        self.resource_usage = await self._end_measure(stats_start, time.monotonic() - started, output_bytes)
+        if self.output_stream:
+            self.output_ref = self.output_stream.end()
         return response_text
 
+    def _extract_exit_status(self, response_text: str, status_command: str, command: str, status_marker: str) -> str:
+        """Take the exit status out of the output, and the command that printed it out of the echoed command line"""
+        status_match = exit_status_pattern(status_marker).search(response_text)
+        if status_match:
+            self.exit_code = int(status_match.group(1))
+            response_text = response_text.replace(status_match.group(0), "")
+        return response_text.replace(status_command, command)
+
     def execute_command(self, command: str) -> str:
         # If not yet part of a session, execute command inside a session
         if not self.pty_client:
@@ -154,16 +389,19 @@ class ContainerCommandExecutor(CommandExecutor):
             return self._run_in_own_loop(self.do_execute(command))
 
     async def execute_command_async(self, command: str) -> str:
-        # If not yet part of a session, execute command in using session
+        # If not yet part of a session, execute command inside an async session on the caller's loop
         if not self.pty_client:
-            with self.session() as session:
-                return session.execute_command(command)
+            async with self.async_session() as session:
+                return await session.do_execute(command)
         else:
             return await self.do_execute(command)
 
+    def _new_client(self) -> AsyncPtyClient:
+        return AsyncPtyClient(self.uri) if self.uri else AsyncPtyClient()
+
     def _connect(self):
         if not self.pty_client:
-            self.pty_client = AsyncPtyClient()
+            self.pty_client = self._new_client()
             self._run_in_own_loop(self.pty_client.connect(max_wait_time=15))
         else:
             raise Exception("Already connected")
@@ -172,22 +410,45 @@ class ContainerCommandExecutor(CommandExecutor):
         if self.pty_client:
             self._run_in_own_loop(self.pty_client.disconnect())
             self.pty_client = None
+            self.loop.close()
+            self.loop = None
         else:
             raise Exception("Not connected")
 
+    def _start_stats(self):
+        if self.container:
+            self.stats = ContainerStats(self.container).start()
+
+    def _stop_stats(self):
+        if self.stats:
+            self.stats.stop()
+            self.stats = None
+
     @contextlib.contextmanager
     def session(self):
         self._connect()
+        self._start_stats()
         try:
             yield self
         finally:
+            self._stop_stats()
             self._disconnect()
 
     @contextlib.asynccontextmanager
     async def async_session(self):
-        """Using the with executor.session will run all commands in the same session"""
-        self.pty_client = AsyncPtyClient()
+        """
+        Using the async with executor.async_session will run all commands in the same session.
+
+        The session runs on the loop of the caller, so that many sessions can be driven concurrently from one thread.
+        """
+        if self.pty_client:
+            raise Exception("Already connected")
+        self.pty_client = self._new_client()
         await self.pty_client.connect(max_wait_time=15)
-        yield self
-        await self.pty_client.disconnect()
-        self.pty_client = None
+        self._start_stats()
+        try:
+            yield self
+        finally:
+            self._stop_stats()
+            await self.pty_client.disconnect()
+            self.pty_client = None
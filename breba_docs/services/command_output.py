@@ -0,0 +1,103 @@
+import tempfile
+from collections import deque
+
+
+class CommandOutput:
+    """
+    Output of a command that keeps only its beginning and its end in memory.
+
+    Output beyond max_head characters goes to the tail, and once the tail grows above max_tail characters, its
+    oldest part is spilled to a temporary file. text() gives the bounded view that is used for analysis, while
+    full_text() reads back the complete output.
+    """
+
+    def __init__(self, max_head=64 * 1024, max_tail=192 * 1024):
+        self.max_head = max_head
+        self.max_tail = max_tail
+        self.size = 0
+
+        self._head: list[str] = []
+        self._head_size = 0
+        self._tail: deque[str] = deque()
+        self._tail_size = 0
+        self._spill = None
+        self.spilled_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return self.text()
+
+    def append(self, text: str) -> None:
+        self.size += len(text)
+
+        if self._head_size < self.max_head:
+            head_part = text[:self.max_head - self._head_size]
+            self._head.append(head_part)
+            self._head_size += len(head_part)
+            text = text[len(head_part):]
+
+        if not text:
+            return
+
+        self._tail.append(text)
+        self._tail_size += len(text)
+        while self._tail_size > self.max_tail:
+            oldest = self._tail.popleft()
+            excess = self._tail_size - self.max_tail
+            if len(oldest) > excess:
+                # Spill only the part of the chunk that does not fit
+                self._tail.appendleft(oldest[excess:])
+                oldest = oldest[:excess]
+            self._tail_size -= len(oldest)
+            self._spill_text(oldest)
+
+    def _spill_text(self, text: str) -> None:
+        if not self._spill:
+            self._spill = tempfile.TemporaryFile(mode="w+", encoding="utf-8", prefix="breba-output-")
+        self._spill.write(text)
+        self.spilled_size += len(text)
+
+    def remove(self, text: str) -> None:
+        """Remove the text from the output, as long as it is not in the spilled part"""
+        if self.spilled_size:
+            tail = "".join(self._tail).replace(text, "")
+            self._tail = deque([tail])
+            self.size -= self._tail_size - len(tail)
+            self._tail_size = len(tail)
+            return
+
+        # Everything is in memory, so the text can also straddle the head and the tail
+        whole = "".join(self._head) + "".join(self._tail)
+        self._head, self._head_size, self._tail, self._tail_size, self.size = [], 0, deque(), 0, 0
+        self.append(whole.replace(text, ""))
+
+    def head(self) -> str:
+        return "".join(self._head)
+
+    def tail(self) -> str:
+        return "".join(self._tail)
+
+    def text(self) -> str:
+        if self.spilled_size:
+            return f"{self.head()}\n[... {self.spilled_size} characters omitted ...]\n{self.tail()}"
+        return self.head() + self.tail()
+
+    def full_text(self) -> str:
+        spilled = ""
+        if self._spill:
+            self._spill.seek(0)
+            spilled = self._spill.read()
+        return self.head() + spilled + self.tail()
+
+    def close(self) -> None:
+        if self._spill:
+            self._spill.close()
+            self._spill = None
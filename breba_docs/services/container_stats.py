@@ -0,0 +1,81 @@
+import threading
+from dataclasses import dataclass
+
+from docker.models.containers import Container
+
+from breba_docs.services.reports import ResourceUsage
+
+
+@dataclass
+class StatsSample:
+    cpu_seconds: float
+    memory_bytes: int
+
+
+def parse_stats(stats: dict) -> StatsSample:
+    cpu_usage = stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage", 0)
+    memory_usage = stats.get("memory_stats", {}).get("usage", 0)
+    return StatsSample(cpu_seconds=cpu_usage / 1e9, memory_bytes=memory_usage)
+
+
+class ContainerStats:
+    """
+    Measures CPU and memory that a container uses while a command runs.
+
+    CPU time is the difference of the container cgroup CPU counter before and after the command. Peak memory is
+    the highest memory usage that docker reported while following the stats stream, which docker updates about
+    once a second, so memory spikes shorter than that can be missed.
+    """
+
+    def __init__(self, container: Container):
+        self.container = container
+        self._lock = threading.Lock()
+        self._peak_memory = 0
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+    def start(self) -> "ContainerStats":
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # Following thread exits with the next sample, or when the container stops
+        self._stopped = True
+
+    def _follow(self):
+        try:
+            for stats in self.container.stats(stream=True, decode=True):
+                if self._stopped:
+                    break
+                self._record_memory(parse_stats(stats).memory_bytes)
+        except Exception as e:
+            print(f"Stopped following container stats: {e}")
+
+    def _record_memory(self, memory_bytes: int):
+        with self._lock:
+            self._peak_memory = max(self._peak_memory, memory_bytes)
+
+    def sample(self) -> StatsSample:
+        sample = parse_stats(self.container.stats(stream=False, one_shot=True))
+        self._record_memory(sample.memory_bytes)
+        return sample
+
+    def begin(self) -> StatsSample:
+        """Start measuring a command"""
+        sample = parse_stats(self.container.stats(stream=False, one_shot=True))
+        with self._lock:
+            self._peak_memory = sample.memory_bytes
+        return sample
+
+    def end(self, start: StatsSample, wall_time: float, output_bytes: int) -> ResourceUsage:
+        """Resources used since begin returned start"""
+        sample = self.sample()
+        with self._lock:
+            peak_memory = self._peak_memory
+        return ResourceUsage(
+            wall_time=wall_time,
+            cpu_seconds=max(sample.cpu_seconds - start.cpu_seconds, 0.0),
+            peak_memory_bytes=peak_memory,
+            output_bytes=output_bytes,
+        )
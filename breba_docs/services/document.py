@@ -1,3 +1,4 @@
+import threading
 from pathlib import Path
 
 
@@ -8,6 +9,8 @@ class Document:
     def __init__(self, contents: str, filepath: Path):
         self.filepath = filepath
         self.content = contents
+        # Guards modifications of the file when goals are processed in parallel
+        self.lock = threading.Lock()
 
     def persist(self):
         # Ensure the parent directory exists
@@ -1,6 +1,10 @@
 import abc
+import asyncio
 
 from breba_docs.agent.agent import Agent
+from breba_docs.services.output_compaction import compact_output
+from breba_docs.services.prompt_cache import PromptAnswerCache
+from breba_docs.services.prompt_detector import detect_prompt
 
 
 class InputProvider(abc.ABC):
@@ -8,14 +12,41 @@ class InputProvider(abc.ABC):
     def get_input(self, console_output: str) -> str:
         pass
 
+    async def get_input_async(self, console_output: str) -> str | None:
+        """Same as get_input, without blocking the event loop that drives command execution"""
+        return await asyncio.to_thread(self.get_input, console_output)
+
 
 class AgentInputProvider(InputProvider):
-    def __init__(self, agent: Agent):
+    def __init__(self, agent: Agent, confidence_threshold=0.8, answer_cache: PromptAnswerCache | None = None):
         self.agent = agent
+        # Prompt detections at least this confident are trusted, less confident ones are left to the agent
+        self.confidence_threshold = confidence_threshold
+        # When provided, prompts that were answered before are answered the same way without the agent
+        self.answer_cache = answer_cache
 
     def get_input(self, console_output: str) -> str | None:
-        instruction = self.agent.provide_input(console_output)
+        detection = detect_prompt(console_output)
+        if detection.confidence >= self.confidence_threshold and not detection.waiting:
+            return None
+        elif detection.answer:
+            return detection.answer
+
+        # Passwords and tokens are not written to the cache file, nor given to the next command that asks for one
+        answer_cache = None if detection.secret else self.answer_cache
+        if answer_cache is not None:
+            cached_answer = answer_cache.get(console_output)
+            if cached_answer is not None:
+                return cached_answer
+
+        if detection.confidence < self.confidence_threshold:
+            instruction = self.agent.provide_input(compact_output(console_output))
+        else:
+            instruction = self.agent.answer_prompt(compact_output(console_output))
+
         if instruction == "breba-noop":
             return None
         elif instruction:
+            if answer_cache is not None:
+                answer_cache.put(console_output, instruction)
             return instruction
@@ -0,0 +1,85 @@
+import re
+
+# Escape sequences: CSI (colors, cursor movement), OSC (window titles, links), and other two character sequences
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+# Control characters other than tab, newline and carriage return
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+# Lines that may explain why a command failed, these are never collapsed
+ERROR_LINE = re.compile(
+    r"error|exception|traceback|fail|fatal|panic|denied|not found|no such|cannot|can't|unable|invalid|warn",
+    re.IGNORECASE,
+)
+# Numbers, versions, hashes and sizes that change from one line of a progress output to the next
+VOLATILE_TOKEN = re.compile(r"\d+(?:[.,:]\d+)*|\b[0-9a-f]{7,}\b")
+
+
+def strip_escape_sequences(text: str) -> str:
+    return CONTROL_CHARACTERS.sub("", ANSI_ESCAPE.sub("", text))
+
+
+def render_carriage_returns(line: str) -> str:
+    """Show a line the way the terminal displays it, where text after a carriage return overwrites the line"""
+    if "\r" not in line:
+        return line
+    rendered = ""
+    for segment in line.split("\r"):
+        rendered = segment + rendered[len(segment):]
+    return rendered
+
+
+def line_signature(line: str) -> str:
+    """Lines with the same signature differ only in numbers, like progress output"""
+    return " ".join(VOLATILE_TOKEN.sub("#", line).split())
+
+
+def _protected_lines(lines: list[str], context: int) -> set[int]:
+    protected = set()
+    in_traceback = False
+    for index, line in enumerate(lines):
+        if line.startswith("Traceback"):
+            in_traceback = True
+        elif in_traceback and line and not line[0].isspace():
+            # Last line of a traceback is the exception itself
+            in_traceback = False
+            protected.add(index)
+        if in_traceback:
+            protected.add(index)
+        if ERROR_LINE.search(line):
+            protected.update(range(max(index - context, 0), min(index + context + 1, len(lines))))
+    return protected
+
+
+def compact_output(text: str, min_repeats=4, context=2) -> str:
+    """
+    Make terminal output cheaper to analyze, without losing what matters for the analysis.
+
+    Escape sequences are stripped, carriage returns are rendered, and runs of at least min_repeats lines that
+    differ only in numbers are collapsed to their first and last line. Lines that look like errors, along with
+    context lines around them, are kept intact. The last line is kept as is, because it may be a prompt.
+    """
+    text = strip_escape_sequences(text).replace("\r\n", "\n")
+    lines = [render_carriage_returns(line) for line in text.split("\n")]
+    lines = [line.rstrip() for line in lines[:-1]] + [lines[-1]]
+    protected = _protected_lines(lines, context)
+
+    compacted = []
+    index = 0
+    while index < len(lines):
+        run_end = index + 1
+        if index not in protected:
+            signature = line_signature(lines[index])
+            while (run_end < len(lines) - 1 and run_end not in protected
+                   and line_signature(lines[run_end]) == signature):
+                run_end += 1
+
+        run_length = run_end - index
+        # A run is replaced by three lines, so shorter runs are kept as they are
+        if run_length >= max(min_repeats, 4):
+            compacted.append(lines[index])
+            compacted.append(f"[... {run_length - 2} similar lines omitted ...]")
+            compacted.append(lines[run_end - 1])
+        else:
+            compacted.extend(lines[index:run_end])
+        index = run_end
+
+    return "\n".join(compacted)
@@ -0,0 +1,99 @@
+import itertools
+import mmap
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class OutputRef:
+    """Location of the output of a command in an output store"""
+    path: str
+    offset: int
+    length: int
+
+
+class OutputStream:
+    """
+    Append-only file that the output of commands executed in one session is written to as it arrives.
+
+    Commands of a session execute one after the other, so the output of every command is a contiguous range of
+    the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "ab")
+        self._offset = self._file.tell()
+        self._start: int | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def begin(self) -> None:
+        self._start = self._offset
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._offset += len(data)
+
+    def end(self) -> OutputRef:
+        """Output written since begin, the file is flushed so that it can be read right away"""
+        self._file.flush()
+        start = self._offset if self._start is None else self._start
+        self._start = None
+        return OutputRef(str(self.path), start, self._offset - start)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class OutputStore:
+    """
+    Keeps the raw output of every command of a run on disk, so that it can be inspected after the run.
+
+    Every run gets its own directory, and every session writes to its own file in it. Only the keep_runs most
+    recent runs are kept, older runs are removed when a new run starts.
+    """
+
+    def __init__(self, directory: Path | str = ".breba/outputs", run_id: str | None = None, use_mmap=False,
+                 keep_runs: int | None = 10):
+        self.path = Path(directory) / (run_id or time.strftime("%Y%m%d-%H%M%S"))
+        self.path.mkdir(parents=True, exist_ok=True)
+        if keep_runs is not None:
+            self._remove_old_runs(keep_runs)
+        # Large outputs are read without copying the file into memory first
+        self.use_mmap = use_mmap
+        self._lock = threading.Lock()
+        self._stream_ids = itertools.count()
+
+    def _remove_old_runs(self, keep_runs: int) -> None:
+        runs = sorted((path for path in self.path.parent.iterdir() if path.is_dir() and path != self.path),
+                      key=lambda path: path.stat().st_mtime)
+        # This run counts as one of the runs that are kept
+        for run in runs[:max(len(runs) - keep_runs + 1, 0)]:
+            shutil.rmtree(run, ignore_errors=True)
+
+    def open_stream(self) -> OutputStream:
+        with self._lock:
+            stream_id = next(self._stream_ids)
+        return OutputStream(self.path / f"session-{stream_id}.log")
+
+    def read(self, ref: OutputRef) -> str:
+        with open(ref.path, "rb") as f:
+            if self.use_mmap and ref.length:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[ref.offset:ref.offset + ref.length]
+            else:
+                f.seek(ref.offset)
+                data = f.read(ref.length)
+        return data.decode("utf-8", errors="replace")
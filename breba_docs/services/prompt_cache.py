@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from breba_docs.services.output_compaction import strip_escape_sequences, render_carriage_returns, VOLATILE_TOKEN
+
+# Temporary paths and user names change between runs, but the prompt stays the same
+VOLATILE_PATH = re.compile(r"/tmp/\S+|/home/[^/\s]+|/Users/[^/\s]+")
+
+
+def prompt_signature(console_output: str) -> str:
+    """Last line of the output, with the parts that change from one run to another taken out"""
+    lines = strip_escape_sequences(console_output).replace("\r\n", "\n").split("\n")
+    last_line = next((line for line in reversed(lines) if line.strip()), "")
+    last_line = render_carriage_returns(last_line)
+    last_line = VOLATILE_TOKEN.sub("#", VOLATILE_PATH.sub("<path>", last_line))
+    return " ".join(last_line.lower().split())
+
+
+class PromptAnswerCache:
+    """
+    Answers that were given to prompts, so that the same prompt can be answered again without the agent.
+
+    Keeps at most max_entries answers, evicting the least recently used. When a path is given, the answers are
+    loaded from it and saved to it after every change, so that they carry over to the next run.
+    """
+
+    def __init__(self, path: Path | str | None = None, max_entries=256):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._answers: OrderedDict[str, str] = OrderedDict()
+        self._load()
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "r") as f:
+                answers = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load prompt answers from {self.path}: {e}")
+            return
+        for signature, answer in answers.items():
+            self._answers[signature] = answer
+        while len(self._answers) > self.max_entries:
+            self._answers.popitem(last=False)
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(self._answers, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # The cache is only an optimization, answers are still used for this run
+            print(f"Could not save prompt answers to {self.path}: {e}")
+
+    def get(self, console_output: str) -> str | None:
+        signature = prompt_signature(console_output)
+        with self._lock:
+            answer = self._answers.get(signature) if signature else None
+            if answer is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._answers.move_to_end(signature)
+            return answer
+
+    def put(self, console_output: str, answer: str) -> None:
+        signature = prompt_signature(console_output)
+        if not signature:
+            return
+        with self._lock:
+            self._answers[signature] = answer
+            self._answers.move_to_end(signature)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+            self._save()
+
+    def __len__(self):
+        return len(self._answers)
+
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses, {len(self)} answers"
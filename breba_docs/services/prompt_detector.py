@@ -0,0 +1,48 @@
+import re
+from dataclasses import dataclass
+
+from breba_docs.services.output_compaction import strip_escape_sequences
+
+YES_NO_PROMPT = re.compile(
+    r"(\[\s*(y|yes)\s*/\s*(n|no)\s*\]|\(\s*(y|yes)\s*/\s*(n|no)\s*\)|\b(y|yes)\s*/\s*(n|no)\b)\s*[?:]?\s*$",
+    re.IGNORECASE,
+)
+SECRET_PROMPT = re.compile(r"\b(password|passphrase|passcode|token)\b[^:\n]*:\s*$", re.IGNORECASE)
+QUESTION_PROMPT = re.compile(r"[?:>]\s*$")
+# Prompts often show a default value in parentheses, but so do many progress messages
+DEFAULT_VALUE_PROMPT = re.compile(r"\([^()]*\)\s*$")
+# Progress bars and percentages are redrawn by running commands, they don't wait for anything
+PROGRESS_LINE = re.compile(r"(\d+(\.\d+)?\s*%|[#=\-.>█▏▎▍▌▋▊▉]{5,}\]?|\.\.\.)\s*$")
+
+
+@dataclass
+class PromptDetection:
+    waiting: bool
+    # How sure the detector is, from 0 (no idea) to 1 (certain)
+    confidence: float
+    # Answer to the prompt, when it can be given without the agent
+    answer: str | None = None
+    # Prompt asks for a password or a token, which must not be kept once given
+    secret: bool = False
+
+
+def detect_prompt(console_output: str) -> PromptDetection:
+    """Guess whether the console output ends with a prompt that is waiting for input, without asking the agent"""
+    output = strip_escape_sequences(console_output).replace("\r\n", "\n")
+    last_line = output.rsplit("\r", 1)[-1].rsplit("\n", 1)[-1]
+
+    if not last_line.strip():
+        # Most prompts don't end with a newline, but some print the question on its own line before reading
+        return PromptDetection(waiting=False, confidence=0.5)
+    if YES_NO_PROMPT.search(last_line):
+        return PromptDetection(waiting=True, confidence=0.95, answer="y")
+    if SECRET_PROMPT.search(last_line):
+        return PromptDetection(waiting=True, confidence=0.9, secret=True)
+    if PROGRESS_LINE.search(last_line):
+        return PromptDetection(waiting=False, confidence=0.85)
+    if QUESTION_PROMPT.search(last_line):
+        # Also ends progress messages like "Building:" and log lines, so the agent decides whether it is a prompt
+        return PromptDetection(waiting=True, confidence=0.6)
+    if DEFAULT_VALUE_PROMPT.search(last_line):
+        return PromptDetection(waiting=True, confidence=0.6)
+    return PromptDetection(waiting=False, confidence=0.3)
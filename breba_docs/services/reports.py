@@ -1,22 +1,62 @@
 import json
 from dataclasses import dataclass, field
 
+from breba_docs.services.output_store import OutputRef
+
 
 @dataclass
 class Goal:
     name: str
     description: str
 
+@dataclass
+class ResourceUsage:
+    wall_time: float = 0.0
+    # CPU and memory are only known for commands that ran in a container
+    cpu_seconds: float | None = None
+    peak_memory_bytes: int | None = None
+    output_bytes: int = 0
+
+    def __add__(self, other: "ResourceUsage") -> "ResourceUsage":
+        """Usage of running both, one after the other"""
+        return ResourceUsage(
+            wall_time=self.wall_time + other.wall_time,
+            cpu_seconds=_combine(self.cpu_seconds, other.cpu_seconds, lambda a, b: a + b),
+            peak_memory_bytes=_combine(self.peak_memory_bytes, other.peak_memory_bytes, max),
+            output_bytes=self.output_bytes + other.output_bytes,
+        )
+
+    @classmethod
+    def total(cls, usages: list["ResourceUsage | None"]) -> "ResourceUsage":
+        return sum((usage for usage in usages if usage), cls())
+
+
+def _combine(a, b, operation):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return operation(a, b)
+
+
 @dataclass
 class CommandReport:
     command: str
     improved_command: str | None
     success: bool | None
     insights: str | None
+    resource_usage: ResourceUsage | None = None
+    # Where the raw output of the command was stored, when an output store is used
+    output: OutputRef | None = None
+    # Exit status of the command, None when it did not finish or could not be captured
+    exit_code: int | None = None
 
     @classmethod
     def from_string(cls, message: str) -> "CommandReport":
-        data = json.loads(message)
+        return cls.from_dict(json.loads(message))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CommandReport":
         return cls(data["command"], data["improved_command"], data["success"], data["insights"])
 
     @classmethod
@@ -34,6 +74,11 @@ class GoalReport:
     goal: Goal
     command_reports: list[CommandReport]
     modify_command_reports: list[CommandReport] = field(default_factory=list)
+    # Tail of the container logs when the container stopped while executing the goal
+    container_logs: str | None = None
+
+    def resource_usage(self) -> ResourceUsage:
+        return ResourceUsage.total([report.resource_usage for report in self.command_reports])
 
 
 @dataclass
@@ -41,6 +86,9 @@ class DocumentReport:
     file: str
     goal_reports: list[GoalReport]
 
+    def resource_usage(self) -> ResourceUsage:
+        return ResourceUsage.total([goal_report.resource_usage() for goal_report in self.goal_reports])
+
 
 @dataclass
 class ProjectReport:
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """
+    Responses of the model, stored by a hash of everything that determines them, so that identical requests of
+    later runs are answered without the model.
+
+    Responses are kept in a SQLite file, which is shared by every goal worker and by concurrent runs. Once the
+    stored responses exceed max_bytes the least recently used are evicted, and responses older than ttl seconds
+    are not reused.
+    """
+
+    def __init__(self, path: Path | str = ":memory:", max_bytes=64 * 2 ** 20, ttl: float | None = 7 * 24 * 60 * 60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Goal workers are threads, access is serialized with the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT, size INTEGER, created REAL, last_used REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @staticmethod
+    def key(model: str, temperature: float, instructions: str, messages: list) -> str:
+        """Hash of a request, messages are the conversation so far including the new message"""
+        request = json.dumps([model, temperature, instructions, messages], ensure_ascii=False)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?",
+                                           (key,)).fetchone()
+            if row and self.ttl is not None and row[1] + self.ttl < now:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._connection:
+                self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, response: str | None) -> None:
+        # Failed runs have no response, and should be retried next time
+        if response is None:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                     (key, response, size, now, now))
+            self._evict()
+
+    def _evict(self) -> None:
+        total_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total_size -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate():.0%} hit rate), {len(self)} responses"
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
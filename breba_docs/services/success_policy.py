@@ -0,0 +1,23 @@
+import re
+
+from breba_docs.services.output_compaction import strip_escape_sequences
+from breba_docs.services.reports import CommandReport
+
+# Output that suggests a problem even when the command exited with status 0
+ERROR_SIGNATURE = re.compile(
+    r"\b(error|errors|exception|traceback|fatal|failed|failure|panic|denied|segmentation fault|no such file"
+    r"|command not found|not found|cannot|unable to|deprecated)\b",
+    re.IGNORECASE,
+)
+
+
+def succeeded_report(command: str, output: str, exit_code: int | None) -> CommandReport | None:
+    """
+    Report for a command that clearly succeeded, so that its output does not need to be analyzed by the agent.
+
+    A command clearly succeeded when it exited with status 0 and its output has nothing that looks like an error.
+    Returns None for every other command.
+    """
+    if exit_code != 0 or ERROR_SIGNATURE.search(strip_escape_sequences(output)):
+        return None
+    return CommandReport(command, None, True, "Command exited with status 0 and reported no errors.")
@@ -0,0 +1,85 @@
+import shlex
+import threading
+
+# How long commands of a kind are known to stay quiet between outputs, in seconds
+DEFAULT_IDLE_TIMEOUTS = {
+    "pip install": 5.0,
+    "pip3 install": 5.0,
+    "python -m pip": 5.0,
+    "poetry install": 5.0,
+    "npm install": 5.0,
+    "npm ci": 5.0,
+    "yarn install": 5.0,
+    "apt-get install": 5.0,
+    "apt install": 5.0,
+    "git clone": 3.0,
+    "docker build": 10.0,
+    "docker pull": 5.0,
+    "cargo build": 10.0,
+    "cargo install": 10.0,
+    "go build": 5.0,
+    "make": 5.0,
+}
+
+
+def command_key(command: str) -> str:
+    """Program and subcommand of the command, for example 'pip install' for 'pip install -r requirements.txt'"""
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        words = command.split()
+    # Skip environment assignments and sudo, they don't tell what the command does
+    words = [word for word in words if "=" not in word and word != "sudo"]
+    if not words:
+        return ""
+    program = words[0].rsplit("/", 1)[-1]
+    subcommand = next((word for word in words[1:] if not word.startswith("-")), None)
+    return f"{program} {subcommand}" if subcommand else program
+
+
+class IdleTimeoutPolicy:
+    """
+    Decides how long a command may stay quiet before checking whether it is waiting for input.
+
+    Starts from known defaults for slow kinds of commands, and learns from the longest silence observed in earlier
+    runs of the same kind of command. Learned silences decay, so that one slow run does not slow down every
+    following run.
+    """
+
+    def __init__(self, base_timeout=0.5, max_timeout=30.0, margin=1.5, decay=0.8, max_quiet_time=600.0):
+        self.base_timeout = base_timeout
+        self.max_timeout = max_timeout
+        # Multiplier applied on top of the longest expected silence
+        self.margin = margin
+        self.decay = decay
+        # Longest silence to wait for a command that keeps the container busy without printing anything
+        self.max_quiet_time = max_quiet_time
+        self._lock = threading.Lock()
+        self._expected_silence: dict[str, float] = {}
+
+    def idle_timeout(self, command: str) -> float:
+        key = command_key(command)
+        with self._lock:
+            expected = self._expected_silence.get(key)
+        if expected is None:
+            expected = self._default_silence(key)
+        return min(max(expected * self.margin, self.base_timeout), self.max_timeout)
+
+    def _default_silence(self, key: str) -> float:
+        if key in DEFAULT_IDLE_TIMEOUTS:
+            return DEFAULT_IDLE_TIMEOUTS[key]
+        program = key.split(" ", 1)[0]
+        return DEFAULT_IDLE_TIMEOUTS.get(program, 0.0)
+
+    def observe(self, command: str, longest_silence: float) -> None:
+        """Record the longest silence of a command that ran to completion"""
+        key = command_key(command)
+        with self._lock:
+            previous = self._expected_silence.get(key, self._default_silence(key))
+            self._expected_silence[key] = max(longest_silence, previous * self.decay)
+
+
+# Shared by executors, so that what was learned while validating one goal applies to the following goals
+default_timeout_policy = IdleTimeoutPolicy()
+# Local shell has no container stats to tell a busy command from a waiting one, so it waits longer before asking
+default_local_timeout_policy = IdleTimeoutPolicy(base_timeout=2.0)
@@ -0,0 +1,197 @@
+import contextlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from breba_docs.services.command_executor import CommandExecutor
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.output_store import OutputRef, OutputStream
+from breba_docs.services.reports import ResourceUsage
+
+
+class MissingRecordingError(KeyError):
+    """Command being replayed has no recorded execution left in the transcript"""
+
+    def __init__(self, command: str):
+        super().__init__(command)
+        self.command = command
+
+    def __str__(self):
+        return f"No recorded execution of command: {self.command}"
+
+
+class Transcript:
+    """
+    Recorded command executions, one JSON record per line.
+
+    A record has the command, its final output, exit status and wall time, along with the events of the
+    execution: output chunks and inputs, each with the number of seconds since the command started.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Records that were not replayed yet, by command, in the order they were recorded
+        self._records: dict[str, deque[dict]] = defaultdict(deque)
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record["command"]].append(record)
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def next_record(self, command: str) -> dict | None:
+        """Next recorded execution of the command, executions of the same command are replayed in order"""
+        with self._lock:
+            records = self._records.get(command)
+            return records.popleft() if records else None
+
+
+class TranscriptRecorder:
+    """Output stream that records the time of every chunk, and passes the chunks on to another output stream"""
+
+    def __init__(self, stream: OutputStream | None = None):
+        self.stream = stream
+        self.events: list[tuple[float, str, str]] = []
+        self._started = time.monotonic()
+
+    def now(self) -> float:
+        return round(time.monotonic() - self._started, 4)
+
+    def begin(self) -> None:
+        self.events = []
+        self._started = time.monotonic()
+        if self.stream:
+            self.stream.begin()
+
+    def write(self, text: str) -> None:
+        if text:
+            self.events.append((self.now(), "output", text))
+        if self.stream:
+            self.stream.write(text)
+
+    def end(self) -> OutputRef | None:
+        return self.stream.end() if self.stream else None
+
+    def record_input(self, text: str) -> None:
+        self.events.append((self.now(), "input", text))
+
+
+class RecordingInputProvider(InputProvider):
+    def __init__(self, input_provider: InputProvider, recorder: TranscriptRecorder):
+        self.input_provider = input_provider
+        self.recorder = recorder
+
+    def get_input(self, console_output: str) -> str | None:
+        input_text = self.input_provider.get_input(console_output)
+        if input_text:
+            self.recorder.record_input(input_text)
+        return input_text
+
+
+class RecordingCommandExecutor(CommandExecutor):
+    """Executes commands with another executor, and appends every execution to a transcript"""
+
+    def __init__(self, executor: CommandExecutor, transcript: Transcript):
+        self.executor = executor
+        self.transcript = transcript
+        self.recorder = TranscriptRecorder(executor.output_stream)
+        executor.output_stream = self.recorder
+        executor.input_provider = RecordingInputProvider(executor.input_provider, self.recorder)
+
+    @property
+    def resource_usage(self) -> ResourceUsage | None:
+        return self.executor.resource_usage
+
+    @property
+    def output_ref(self) -> OutputRef | None:
+        return self.executor.output_ref
+
+    @property
+    def exit_code(self) -> int | None:
+        return self.executor.exit_code
+
+    @contextlib.contextmanager
+    def session(self):
+        with self.executor.session():
+            yield self
+
+    def execute_command(self, command: str) -> str:
+        output = self.executor.execute_command(command)
+        wall_time = self.resource_usage.wall_time if self.resource_usage else self.recorder.now()
+        self.transcript.append({
+            "command": command,
+            "output": output,
+            "exit_code": self.exit_code,
+            "wall_time": wall_time,
+            "events": self.recorder.events,
+        })
+        return output
+
+
+class ReplayCommandExecutor(CommandExecutor):
+    """
+    Serves command executions back from a transcript, without a shell or a container.
+
+    Time between recorded events is multiplied by time_scale, so 1.0 replays at recorded speed and 0.0 replays
+    as fast as possible. Recorded inputs are asked from the input provider at the same points of the output, so
+    that prompt handling is exercised as well.
+
+    Only command executions are replayed. A replayed run is offline only when the agent is too, that is when its
+    responses come from the response cache of the recorded run or the agent is a stub.
+    """
+
+    def __init__(self, transcript: Transcript, input_provider: InputProvider | None = None, time_scale=0.0,
+                 output_stream: OutputStream | None = None):
+        self.transcript = transcript
+        self.input_provider = input_provider
+        self.time_scale = time_scale
+        self.output_stream = output_stream
+        self.output_ref: OutputRef | None = None
+        self.exit_code: int | None = None
+        self.resource_usage: ResourceUsage | None = None
+
+    @contextlib.contextmanager
+    def session(self):
+        yield self
+
+    def _wait(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def execute_command(self, command: str) -> str:
+        record = self.transcript.next_record(command)
+        if record is None:
+            raise MissingRecordingError(command)
+
+        if self.output_stream:
+            self.output_stream.begin()
+        elapsed = 0.0
+        last_output = ""
+        for at, kind, text in record["events"]:
+            self._wait(at - elapsed)
+            elapsed = max(elapsed, at)
+            if kind == "output":
+                last_output = text
+                if self.output_stream:
+                    self.output_stream.write(text)
+            elif kind == "input" and self.input_provider:
+                input_text = self.input_provider.get_input(last_output)
+                if input_text != text:
+                    print(f"Input differs from the recording, recorded: {text}, provided: {input_text}")
+        self._wait(record["wall_time"] - elapsed)
+
+        if self.output_stream:
+            self.output_ref = self.output_stream.end()
+        self.exit_code = record["exit_code"]
+        self.resource_usage = ResourceUsage(wall_time=record["wall_time"],
+                                            output_bytes=len(record["output"].encode("utf-8")))
+        return record["output"]
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tarfile
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+from docker.models.containers import Container
+
+# Size of the reads when hashing and streaming files
+CHUNK_SIZE = 64 * 1024
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tar_stream(root: Path, paths: list[str]) -> Iterator[bytes]:
+    """
+    Generates a tar archive of the files one chunk at a time, so that large workspaces are never held in memory.
+    """
+    for relative_path in paths:
+        path = root / relative_path
+        stat = path.stat()
+        tarinfo = tarfile.TarInfo(name=relative_path)
+        tarinfo.size = stat.st_size
+        tarinfo.mode = stat.st_mode & 0o7777
+        tarinfo.mtime = int(stat.st_mtime)
+        yield tarinfo.tobuf(format=tarfile.PAX_FORMAT)
+
+        remaining = tarinfo.size
+        with open(path, "rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    # File shrunk since stat, pad it to the size in the header to keep the archive valid
+                    chunk = b"\0" * remaining
+                remaining -= len(chunk)
+                yield chunk
+
+        # File data is padded to full tar blocks
+        yield b"\0" * (-tarinfo.size % tarfile.BLOCKSIZE)
+
+    # End of archive is marked by two empty blocks
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+class WorkspaceSync:
+    """
+    Copies a project directory into containers.
+
+    For every container, a manifest of the content hashes that were sent is kept, so that syncing the same
+    container again only sends the files that changed and removes files that were deleted.
+    """
+
+    def __init__(self, root: Path, target="/usr/src", exclude: tuple[str, ...] = (".git",)):
+        self.root = Path(root)
+        self.target = target
+        self.exclude = set(exclude)
+
+        self._lock = threading.Lock()
+        # Hash of every file by its path, along with the stat it was computed for, to avoid re-reading unchanged files
+        self._hashes: dict[str, tuple[tuple[int, int], str]] = {}
+        # Manifests of what was sent to each container by container id
+        self._manifests: dict[str, dict[str, str]] = {}
+
+    def _files(self) -> Iterator[str]:
+        for directory, directories, filenames in os.walk(self.root):
+            directories[:] = [name for name in directories if name not in self.exclude]
+            for filename in filenames:
+                if filename in self.exclude:
+                    continue
+                path = Path(directory) / filename
+                if path.is_file():
+                    yield path.relative_to(self.root).as_posix()
+
+    def manifest(self) -> dict[str, str]:
+        """Content hash of every file in the workspace by its relative path"""
+        manifest = {}
+        with self._lock:
+            for relative_path in self._files():
+                stat = (self.root / relative_path).stat()
+                stat_key = (stat.st_size, stat.st_mtime_ns)
+                cached = self._hashes.get(relative_path)
+                if not cached or cached[0] != stat_key:
+                    cached = (stat_key, file_hash(self.root / relative_path))
+                    self._hashes[relative_path] = cached
+                manifest[relative_path] = cached[1]
+        return manifest
+
+    def sync(self, container: Container) -> list[str]:
+        """
+        Bring the workspace in the container up to date.
+
+        Returns:
+            list[str]: paths of the files that were sent to the container
+        """
+        manifest = self.manifest()
+        with self._lock:
+            synced = self._manifests.get(container.id, {})
+
+        changed = [path for path, digest in manifest.items() if synced.get(path) != digest]
+        deleted = [path for path in synced if path not in manifest]
+
+        if changed:
+            container.put_archive(path=self.target, data=tar_stream(self.root, changed))
+        if deleted:
+            container.exec_run(["rm", "-f", "--", *deleted], workdir=self.target)
+
+        with self._lock:
+            self._manifests[container.id] = manifest
+        return changed
+
+    def forget(self, container: Container) -> None:
+        """Drop the manifest of a container that no longer exists"""
+        with self._lock:
+            self._manifests.pop(container.id, None)
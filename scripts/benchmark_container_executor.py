@@ -0,0 +1,40 @@
+# Run from the repository root: python -m scripts.benchmark_container_executor
+import asyncio
+import contextlib
+import os
+import time
+
+from breba_docs.services.command_executor import ContainerCommandExecutor
+from breba_docs.services.input_provider import InputProvider
+from tests.fake_pty_server import FakePtyServer, bursty, huge, prompt_waiting, slow_drip
+
+
+class YesInputProvider(InputProvider):
+    def get_input(self, console_output: str) -> str:
+        return "y"
+
+
+SCRIPTS = {
+    # Pauses shorter than the idle timeout, so that the executor does not answer them as prompts
+    "bursty": bursty(pause=0.2),
+    "slow-drip": slow_drip(),
+    "huge": huge(),
+    "prompt-waiting": prompt_waiting(),
+}
+
+
+async def benchmark(latency: float):
+    async with FakePtyServer(SCRIPTS, latency=latency) as server:
+        async with ContainerCommandExecutor(YesInputProvider(), uri=server.uri).async_session() as session:
+            for command in SCRIPTS:
+                started = time.monotonic()
+                # Executor prints every chunk it receives, which would dominate the measurement
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    output = await session.execute_command_async(command)
+                elapsed = time.monotonic() - started
+                print(f"{command:>15} latency={latency:.3f}s: {elapsed:6.2f}s, "
+                      f"{len(output)} characters, {len(output) / 2 ** 20 / elapsed:.2f} MiB/s")
+
+
+for latency in (0.0, 0.01):
+    asyncio.run(benchmark(latency))
@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+import json
+import random
+import re
+import threading
+from collections.abc import AsyncIterator, Callable
+
+from websockets.asyncio.server import serve, ServerConnection
+from websockets.exceptions import ConnectionClosed
+
+# Exit status echo that ContainerCommandExecutor appends to commands
+EXIT_STATUS_SUFFIX = re.compile(r'; echo "(\S+)" "(\S+)" \$\?$')
+
+
+class ScriptContext:
+    """What a script knows about the command it is producing output for"""
+
+    def __init__(self, command: str, inputs: asyncio.Queue):
+        self.command = command
+        self.exit_code = 0
+        self._inputs = inputs
+
+    async def read_input(self) -> str:
+        """Wait for the client to send input, like a prompt does"""
+        return await self._inputs.get()
+
+
+# Produces the output of a command one chunk at a time
+Script = Callable[[ScriptContext], AsyncIterator[str]]
+
+
+async def echo(context: ScriptContext) -> AsyncIterator[str]:
+    yield f"{context.command}\n"
+
+
+def bursty(bursts=5, lines_per_burst=50, pause=0.5) -> Script:
+    async def script(context: ScriptContext) -> AsyncIterator[str]:
+        for burst in range(bursts):
+            for line in range(lines_per_burst):
+                yield f"burst {burst} line {line}\n"
+            await asyncio.sleep(pause)
+    return script
+
+
+def slow_drip(lines=10, interval=0.2) -> Script:
+    async def script(context: ScriptContext) -> AsyncIterator[str]:
+        for line in range(lines):
+            yield f"drip {line}\n"
+            await asyncio.sleep(interval)
+    return script
+
+
+def huge(total_bytes=64 * 2 ** 20, chunk_size=64 * 1024) -> Script:
+    async def script(context: ScriptContext) -> AsyncIterator[str]:
+        line = "x" * 79 + "\n"
+        chunk = (line * (chunk_size // len(line) + 1))[:chunk_size]
+        sent = 0
+        while sent < total_bytes:
+            data = chunk[:total_bytes - sent]
+            sent += len(data)
+            yield data
+    return script
+
+
+def prompt_waiting(prompt="Do you want to continue? [Y/n] ", exit_code_by_answer: dict[str, int] | None = None) -> Script:
+    async def script(context: ScriptContext) -> AsyncIterator[str]:
+        yield prompt
+        answer = await context.read_input()
+        yield f"{answer}\nAnswered {answer}\n"
+        context.exit_code = (exit_code_by_answer or {}).get(answer, 0)
+    return script
+
+
+class FakePtyServer:
+    """
+    Stand-in for pty-server that speaks the same websocket protocol as AsyncPtyClient, without a shell or docker.
+
+    Like the shell behind pty-server, the command line is echoed after the shell prompt before the command runs.
+    Output of every command comes from a script chosen by the command, falling back to the default script. Every
+    message is delayed by latency seconds plus up to jitter seconds, to simulate a slow connection.
+    """
+
+    def __init__(self, scripts: dict[str, Script] | None = None, default_script: Script = echo, latency=0.0,
+                 jitter=0.0, host="127.0.0.1", port=0, shell_prompt="root@breba:/usr/src# "):
+        self.scripts = scripts or {}
+        self.shell_prompt = shell_prompt
+        self.default_script = default_script
+        self.latency = latency
+        self.jitter = jitter
+        self.host = host
+        self.port = port
+        self._server = None
+        self._stopped: asyncio.Event | None = None
+
+    @property
+    def uri(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self) -> str:
+        self._stopped = asyncio.Event()
+        self._server = await serve(self._handle_connection, self.host, self.port, ping_timeout=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.uri
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def wait_stopped(self) -> None:
+        await self._stopped.wait()
+
+    @contextlib.contextmanager
+    def in_thread(self):
+        """Run the server on its own loop in a background thread, for clients that use the sync API"""
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=run, name="fake-pty-server", daemon=True)
+        thread.start()
+        started.wait()
+        try:
+            yield self.uri
+        finally:
+            asyncio.run_coroutine_threadsafe(self.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def _script(self, command: str) -> Script:
+        return self.scripts.get(command, self.default_script)
+
+    async def _send(self, connection: ServerConnection, data: str) -> None:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await connection.send(data)
+
+    async def _run_command(self, connection: ServerConnection, data: dict, inputs: asyncio.Queue) -> None:
+        command = data["command"]
+        command_id = data.get("command_id", "unknown")
+        # Terminal echoes the command line as typed, including the exit status echo
+        await self._send(connection, f"{self.shell_prompt}{command}\r\n")
+        status_match = EXIT_STATUS_SUFFIX.search(command)
+        if status_match:
+            command = command[:status_match.start()]
+
+        context = ScriptContext(command, inputs)
+        async for chunk in self._script(command)(context):
+            await self._send(connection, chunk)
+        if status_match:
+            await self._send(connection, f"{status_match.group(1)} {status_match.group(2)} {context.exit_code}\n")
+        await self._send(connection, f"Completed {command_id}\n")
+
+    async def _run_commands(self, connection: ServerConnection, commands: asyncio.Queue, inputs: asyncio.Queue):
+        # Commands of a connection run one after the other, like in a shell
+        while True:
+            data = await commands.get()
+            await self._run_command(connection, data, inputs)
+
+    async def _handle_connection(self, connection: ServerConnection) -> None:
+        commands = asyncio.Queue()
+        inputs = asyncio.Queue()
+        command_task = asyncio.create_task(self._run_commands(connection, commands, inputs))
+        try:
+            async for message in connection:
+                try:
+                    data = json.loads(message)
+                except json.JSONDecodeError:
+                    await connection.send("Error: Invalid JSON data received.")
+                    continue
+
+                if data.get("command") == "quit":
+                    await connection.send("Server will shut down now.")
+                    self._stopped.set()
+                    break
+                elif data.get("command"):
+                    await commands.put(data)
+
+                if data.get("input"):
+                    await inputs.put(data["input"])
+        except ConnectionClosed:
+            pass
+        finally:
+            command_task.cancel()
@@ -3,7 +3,7 @@ from dotenv import load_dotenv
 
 from breba_docs.agent.command_exec_agent import CommandAgent
 from breba_docs.agent.openai_agent import OpenAIAgent
-from breba_docs.container import new_container
+from breba_docs.container import new_container, pty_server_uri
 from breba_docs.services.command_executor import ContainerCommandExecutor
 from breba_docs.services.input_provider import AgentInputProvider
 from breba_docs.services.reports import CommandReport
@@ -19,8 +19,8 @@ def openai_agent():
 @pytest.fixture
 def agent(openai_agent):
     input_provider = AgentInputProvider(openai_agent)
-    with new_container(dev=True):
-        with ContainerCommandExecutor(input_provider).session() as session:
+    with new_container(dev=True) as container:
+        with ContainerCommandExecutor(input_provider, uri=pty_server_uri(container)).session() as session:
             yield CommandAgent(session)
 
 
@@ -2,7 +2,7 @@ import json
 
 import pytest
 
-from breba_docs.container import container_setup
+from breba_docs.container import container_setup, pty_server_uri
 
 from pty_server import AsyncPtyClient
 from pty_server.async_client import STATUS_TIMEOUT, STATUS_COMPLETED, PtyServerResponse
@@ -14,7 +14,7 @@ def container():
     # docker run -d -it \
     #   -v $(pwd)../pty-server:/usr/src/pty-server \
     #   -w /usr/src \
-    #   -p 44440:44440 \
+    #   -p 127.0.0.1::44440 \
     #   python:3 \
     #   /bin/bash
     started_container = container_setup(dev=True)
@@ -26,7 +26,7 @@ def container():
 @pytest.mark.integration
 @pytest.mark.asyncio
 async def test_execute_command(container):
-    async with AsyncPtyClient() as client:
+    async with AsyncPtyClient(pty_server_uri(container)) as client:
         response_install = await client.send_command('pip install pexpect')
         response_text = await response_install.text(2)
         
@@ -48,7 +48,7 @@ async def test_execute_command(container):
 @pytest.mark.integration
 @pytest.mark.asyncio
 async def test_execute_ampersand_command(container):
-    async with AsyncPtyClient() as client:
+    async with AsyncPtyClient(pty_server_uri(container)) as client:
         command = 'mkdir test && cd test && pwd && echo "more testing is needed"'
         response = await client.send_command(command)
         response_text = await response.text(0.01)
@@ -59,7 +59,7 @@ async def test_execute_ampersand_command(container):
 @pytest.mark.integration
 @pytest.mark.asyncio
 async def test_multiple_connections(container):
-    async with AsyncPtyClient() as client:
+    async with AsyncPtyClient(pty_server_uri(container)) as client:
         command = 'mkdir test2 && cd test2 && pwd && echo "more testing is needed"'
         response = await client.send_command(command)
         response_text = await response.text(0.01)
@@ -67,7 +67,7 @@ async def test_multiple_connections(container):
     assert "/usr/src/test" in response_text
     assert "No such file or directory" not in response_text
 
-    async with AsyncPtyClient() as client:
+    async with AsyncPtyClient(pty_server_uri(container)) as client:
         command = 'mkdir test3 && cd test3 && pwd && echo "more testing is needed"'
         response = await client.send_command(command)
         response_text = await response.text(0.01)
@@ -1,6 +1,6 @@
 import pytest
 
-from breba_docs.container import container_setup
+from breba_docs.container import container_setup, pty_server_uri
 from pty_server import AsyncPtyClient
 
 @pytest.fixture
@@ -9,7 +9,7 @@ def container():
     # docker run -d -it \
     #   -v $(pwd)../pty-server:/usr/src/pty-server \
     #   -w /usr/src \
-    #   -p 44440:44440 \
+    #   -p 127.0.0.1::44440 \
     #   python:3 \
     #   /bin/bash
     started_container = container_setup(dev=True)
@@ -22,7 +22,7 @@ def container():
 @pytest.mark.asyncio
 async def test_execute_quit_command(container):
     """ This test needs own module because it starts a new container in order to quit it. """
-    async with AsyncPtyClient() as client:
+    async with AsyncPtyClient(pty_server_uri(container)) as client:
         response = await client.send_command('pip install pexpect')
         response_text = await response.text(1)
         assert response.completed()
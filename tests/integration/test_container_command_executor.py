@@ -4,7 +4,7 @@ import pytest
 from dotenv import load_dotenv
 
 from breba_docs.agent.openai_agent import OpenAIAgent
-from breba_docs.container import new_container
+from breba_docs.container import new_container, pty_server_uri
 from breba_docs.services.command_executor import ContainerCommandExecutor
 from breba_docs.services.input_provider import InputProvider, AgentInputProvider
 
@@ -17,15 +17,14 @@ def input_provider() -> Generator[InputProvider, None, None]:
 
 
 @pytest.fixture(scope="module")
-def container_executor():
-    with new_container(dev=False) as executor:
-        yield executor
+def container():
+    with new_container(dev=False) as container:
+        yield container
 
 
 @pytest.fixture
-def session(container_executor, input_provider):
-    # TODO: I wish there was not an implicit dependency on container. Maybe it is time to create a container class and factory
-    with ContainerCommandExecutor(input_provider).session() as session:
+def session(container, input_provider):
+    with ContainerCommandExecutor(input_provider, uri=pty_server_uri(container)).session() as session:
         yield session
 
 
@@ -0,0 +1,118 @@
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import NotFoundError
+
+from breba_docs.agent.assistant_registry import AssistantRegistry, ASSISTANT_NAME, assistant_key
+from breba_docs.agent.openai_agent import OpenAIAgent
+
+
+def _assistant(assistant_id, name=ASSISTANT_NAME, created_at=None, metadata=None):
+    return SimpleNamespace(id=assistant_id, name=name, created_at=created_at or time.time(), metadata=metadata or {})
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.MagicMock()
+    ids = iter(f"asst_{number}" for number in range(100))
+    client.beta.assistants.create.side_effect = lambda **kwargs: _assistant(next(ids))
+    return client
+
+
+def test_assistant_key_depends_on_model_and_instructions():
+    assert assistant_key("gpt-4o-mini", "Be helpful") == assistant_key("gpt-4o-mini", "Be helpful")
+    assert assistant_key("gpt-4o-mini", "Be helpful") != assistant_key("gpt-4o", "Be helpful")
+    assert assistant_key("gpt-4o-mini", "Be helpful") != assistant_key("gpt-4o-mini", "Be brief")
+
+
+def test_assistant_is_reused_across_registries(tmp_path, client):
+    path = tmp_path / "assistants.json"
+
+    first = AssistantRegistry(path).assistant_id(client, "gpt-4o-mini", "Be helpful")
+    # New registry on the same file, like a later run
+    second = AssistantRegistry(path).assistant_id(client, "gpt-4o-mini", "Be helpful")
+    other = AssistantRegistry(path).assistant_id(client, "gpt-4o-mini", "Be brief")
+
+    assert first == second == "asst_0"
+    assert other == "asst_1"
+    assert client.beta.assistants.create.call_count == 2
+    assert json.loads(path.read_text())[assistant_key("gpt-4o-mini", "Be helpful")]["id"] == "asst_0"
+
+
+def test_forgotten_assistant_is_created_again(tmp_path, client):
+    registry = AssistantRegistry(tmp_path / "assistants.json")
+    registry.assistant_id(client, "gpt-4o-mini", "Be helpful")
+
+    registry.forget("asst_0")
+
+    assert registry.assistant_id(client, "gpt-4o-mini", "Be helpful") == "asst_1"
+
+
+def test_collect_garbage(tmp_path, client):
+    registry = AssistantRegistry(tmp_path / "assistants.json")
+    registry.assistant_id(client, "gpt-4o-mini", "Be helpful")
+    registry.assistant_id(client, "gpt-4o-mini", "Be brief")
+    # Second assistant was last used long ago
+    entries = json.loads(registry.path.read_text())
+    entries[assistant_key("gpt-4o-mini", "Be brief")]["last_used"] = time.time() - 60 * 24 * 60 * 60
+    registry.path.write_text(json.dumps(entries))
+
+    client.beta.assistants.list.return_value = [
+        _assistant("asst_0"),
+        _assistant("asst_1"),
+        _assistant("asst_leaked", created_at=time.time() - 60 * 24 * 60 * 60),
+        _assistant("asst_new_elsewhere"),
+        # Registered by another project, which may still be using it
+        _assistant("asst_elsewhere", created_at=time.time() - 60 * 24 * 60 * 60, metadata={"breba_key": "key"}),
+        _assistant("asst_other", name="Someone else", created_at=0),
+    ]
+
+    deleted = registry.collect_garbage(client, max_age_days=30)
+
+    assert deleted == ["asst_1", "asst_leaked"]
+    assert [entry["id"] for entry in json.loads(registry.path.read_text()).values()] == ["asst_0"]
+
+
+def test_agent_with_registry_keeps_assistant(tmp_path, mocker):
+    openai_client = mocker.patch('breba_docs.agent.openai_agent.OpenAI').return_value
+    openai_client.beta.assistants.create.return_value = _assistant("asst_0")
+    registry = AssistantRegistry(tmp_path / "assistants.json")
+
+    with OpenAIAgent(registry):
+        pass
+    with OpenAIAgent(registry) as agent:
+        assert agent.assistant_id == "asst_0"
+
+    openai_client.beta.assistants.create.assert_called_once()
+    openai_client.beta.assistants.delete.assert_not_called()
+
+
+def test_agent_without_registry_deletes_assistant(mocker):
+    openai_client = mocker.patch('breba_docs.agent.openai_agent.OpenAI').return_value
+    openai_client.beta.assistants.create.return_value = _assistant("asst_0")
+
+    with OpenAIAgent():
+        pass
+
+    openai_client.beta.assistants.delete.assert_called_once_with("asst_0")
+
+
+def test_agent_recreates_deleted_assistant(tmp_path, mocker):
+    openai_client = mocker.patch('breba_docs.agent.openai_agent.OpenAI').return_value
+    openai_client.beta.assistants.create.side_effect = [_assistant("asst_0"), _assistant("asst_1")]
+    not_found = NotFoundError("No assistant found", response=httpx.Response(
+        404, request=httpx.Request("POST", "https://api.openai.com")), body=None)
+    openai_client.beta.threads.runs.create_and_poll.side_effect = [not_found, SimpleNamespace(status="completed")]
+    openai_client.beta.threads.messages.list.return_value.data[0].content[0].text.value = "Yes"
+    registry = AssistantRegistry(tmp_path / "assistants.json")
+
+    agent = OpenAIAgent(registry)
+    assert agent.do_run("message", "instructions") == "Yes"
+
+    assert agent.assistant_id == "asst_1"
+    assert openai_client.beta.threads.runs.create_and_poll.call_args.kwargs["assistant_id"] == "asst_1"
+    assert AssistantRegistry(tmp_path / "assistants.json").assistant_id(openai_client, "gpt-4o-mini",
+                                                                         OpenAIAgent.INSTRUCTIONS_GENERAL) == "asst_1"
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from breba_docs.agent.openai_agent import OpenAIAgent, batch_command_outputs
+from breba_docs.services.reports import CommandReport
+
+
+@pytest.fixture
+def agent(mocker):
+    mocker.patch('breba_docs.agent.openai_agent.OpenAI')
+    return OpenAIAgent()
+
+
+def _report(command, success=True):
+    return {"command": command, "improved_command": None, "success": success, "insights": f"{command} ran"}
+
+
+def test_batch_command_outputs():
+    command_outputs = [("a", "1" * 4), ("b", "2" * 4), ("c", "3" * 12), ("d", "4" * 2)]
+
+    assert batch_command_outputs(command_outputs, 10) == [
+        [("a", "1" * 4), ("b", "2" * 4)],
+        [("c", "3" * 10)],
+        [("d", "4" * 2)],
+    ]
+
+
+def test_analyze_outputs_in_one_run(agent, mocker):
+    do_run = mocker.patch.object(agent, "do_run", return_value=json.dumps({
+        "reports": [_report("ls"), _report("cat missing.txt", success=False)]
+    }))
+
+    command_reports = agent.analyze_outputs([("ls", "README.md"), ("cat missing.txt", "No such file or directory")])
+
+    assert command_reports == [
+        CommandReport("ls", None, True, "ls ran"),
+        CommandReport("cat missing.txt", None, False, "cat missing.txt ran"),
+    ]
+    do_run.assert_called_once()
+    assert "Command 2: cat missing.txt" in do_run.call_args.args[0]
+
+
+def test_analyze_outputs_falls_back_when_reports_do_not_match(agent, mocker):
+    mocker.patch.object(agent, "do_run", return_value=json.dumps({"reports": [_report("ls")]}))
+    analyze_output = mocker.patch.object(agent, "analyze_output",
+                                         side_effect=lambda output: CommandReport(output, None, True, None))
+
+    command_reports = agent.analyze_outputs([("ls", "README.md"), ("pwd", "/usr/src")])
+
+    assert [report.command for report in command_reports] == ["README.md", "/usr/src"]
+    assert analyze_output.call_count == 2
@@ -0,0 +1,50 @@
+from unittest.mock import Mock
+
+import pytest
+
+from breba_docs.agent.chat_agent import ChatCompletionsAgent
+
+
+def _completion(content):
+    return Mock(choices=[Mock(message=Mock(content=content))])
+
+
+def _chunk(content):
+    return Mock(choices=[Mock(delta=Mock(content=content))])
+
+
+@pytest.fixture
+def openai_client(mocker):
+    return mocker.patch('breba_docs.agent.chat_agent.OpenAI').return_value
+
+
+def test_provide_input_keeps_conversation(openai_client):
+    create = openai_client.chat.completions.create
+    create.side_effect = [_completion("Yes"), _completion("Yes"), _completion("y")]
+
+    assert ChatCompletionsAgent().provide_input("Do you want to continue? [Y/n] ") == "y"
+
+    assert create.call_count == 3
+    # Follow-up questions see the earlier messages and answers
+    last_messages = create.call_args.kwargs["messages"]
+    assert [message["role"] for message in last_messages] == ["system", "user", "assistant", "user", "assistant",
+                                                              "user"]
+    assert "Do you want to continue?" in last_messages[1]["content"]
+
+
+def test_new_run_starts_new_conversation(openai_client):
+    create = openai_client.chat.completions.create
+    create.return_value = _completion('{"commands": ["ls"]}')
+    agent = ChatCompletionsAgent()
+
+    agent.do_run("first", "instructions")
+    agent.do_run("second", "instructions")
+
+    assert [message["content"] for message in create.call_args.kwargs["messages"][1:]] == ["second"]
+
+
+def test_streamed_response(openai_client):
+    openai_client.chat.completions.create.return_value = iter([_chunk("N"), _chunk(None), _chunk("o")])
+
+    assert ChatCompletionsAgent(stream=True).do_run("message", "instructions") == "No"
+    assert openai_client.chat.completions.create.call_args.kwargs["stream"]
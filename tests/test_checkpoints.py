@@ -0,0 +1,77 @@
+import pytest
+
+from breba_docs.checkpoints import CheckpointStore, is_shell_state_only, changes_shell_state, environment_key
+from breba_docs.services.reports import CommandReport
+
+
+@pytest.fixture
+def container(mocker):
+    container = mocker.MagicMock()
+    container.commit.side_effect = [mocker.Mock(id=f"sha256:image{i}") for i in range(10)]
+    return container
+
+
+def report(command):
+    return CommandReport(command, None, True, None)
+
+
+@pytest.mark.parametrize("command, state_only, changes_state", [
+    ("cd nodestream", True, True),
+    ("export MY_VAR=Testing", True, True),
+    ("source .venv/bin/activate", True, True),
+    ("cd app && export DEBUG=1", True, True),
+    ("cd app && npm install", False, True),
+    ("pip install nodestream", False, False),
+    ("echo 'cd is not a command here'", False, False),
+])
+def test_shell_state_detection(command, state_only, changes_state):
+    assert is_shell_state_only(command) == state_only
+    assert changes_shell_state(command) == changes_state
+
+
+def test_restore_point_finds_longest_saved_prefix(container):
+    store = CheckpointStore()
+    commands = ["git clone https://github.com/nodestream/nodestream.git", "cd nodestream", "pip install ."]
+
+    for index in range(len(commands)):
+        store.save(container, commands[:index + 1], [report(command) for command in commands[:index + 1]])
+
+    checkpoint = store.restore_point(commands[:2] + ["nodestream run sample"])
+    assert checkpoint.commands == commands[:2]
+    assert [r.command for r in checkpoint.reports] == commands[:2]
+    assert checkpoint.replay_commands() == ["cd nodestream"]
+    # cd does not change the filesystem, so it shares the image of the clone
+    assert container.commit.call_count == 2
+    assert checkpoint.image == "sha256:image0"
+
+
+def test_no_checkpoint_after_mixed_shell_state_command(container):
+    store = CheckpointStore()
+    commands = ["cd app && npm install"]
+
+    assert store.save(container, commands, [report(commands[0])]) is None
+    assert store.restore_point(commands + ["npm test"]) is None
+    container.commit.assert_not_called()
+
+
+def test_close_removes_images(mocker, container):
+    client = mocker.MagicMock()
+    store = CheckpointStore(client=client)
+    store.save(container, ["pip install nodestream"], [report("pip install nodestream")])
+
+    store.close()
+
+    client.images.remove.assert_called_once_with("sha256:image0", force=True)
+    assert store.restore_point(["pip install nodestream"]) is None
+
+
+def test_checkpoint_is_not_restored_in_another_environment(container):
+    store = CheckpointStore()
+    commands = ["pip install nodestream"]
+    environment = environment_key("sha256:base", {"README.md": "abc"})
+    store.save(container, commands, [report(commands[0])], environment)
+
+    assert store.restore_point(commands, environment) is not None
+    # README was modified, or the base image was rebuilt
+    assert store.restore_point(commands, environment_key("sha256:base", {"README.md": "def"})) is None
+    assert store.restore_point(commands, environment_key("sha256:rebuilt", {"README.md": "abc"})) is None
@@ -5,6 +5,8 @@ import pytest
 import yaml
 from cleo.testers.command_tester import CommandTester
 
+from breba_docs import config as app_config
+from breba_docs.cli.commands.gc_command import GcCommand
 from breba_docs.cli.commands.new_command import NewCommand
 from breba_docs.cli.commands.run_command import RunCommand
 
@@ -107,3 +109,39 @@ def test_run_command_in_current_directory(mocker, new_project_path):
     assert "Project Name: TestProject" in output
     assert "openai-gpt-4-1" in output
     assert "dummy_api_key" in output
+
+
+def test_gc_command(mocker, new_project_path):
+    openai_client = mocker.patch("breba_docs.cli.commands.gc_command.OpenAI").return_value
+    collect_garbage = mocker.patch("breba_docs.cli.commands.gc_command.AssistantRegistry.collect_garbage",
+                                   return_value=["asst_1"])
+
+    tester = CommandTester(GcCommand())
+    exit_code = tester.execute(args=f"{new_project_path} --max-age-days=7", interactive=False)
+    assert exit_code == 0
+
+    collect_garbage.assert_called_once_with(openai_client, 7.0)
+    output = tester.io.fetch_output()
+    assert "Deleted assistant: asst_1" in output
+    assert "Deleted 1 assistants." in output
+
+
+def test_run_command_reads_options_from_config(mocker, monkeypatch, new_project_path):
+    mocker.patch("breba_docs.cli.commands.run_command.get_document", return_value=None)
+    mocker.patch("breba_docs.cli.commands.run_command.run_analyzer", return_value=None)
+    for option in ("container_pool_size", "container_log_dir", "container_ready_marker", "prompt_cache_path",
+                   "prompt_cache_size"):
+        monkeypatch.setattr(app_config, option, getattr(app_config, option))
+    config_file = new_project_path / "config.yaml"
+    config = yaml.safe_load(config_file.read_text())
+    config.update({"container_pool_size": 4, "container_log_dir": "logs", "container_ready_marker": None,
+                   "prompt_cache_path": "answers.json", "prompt_cache_size": 16})
+    config_file.write_text(yaml.dump(config))
+
+    assert CommandTester(RunCommand()).execute(args=str(new_project_path), interactive=False) == 0
+
+    assert app_config.container_pool_size == 4
+    assert app_config.container_log_dir == "logs"
+    assert app_config.container_ready_marker is None
+    assert app_config.prompt_cache_path == "answers.json"
+    assert app_config.prompt_cache_size == 16
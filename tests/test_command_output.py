@@ -0,0 +1,81 @@
+from breba_docs.services.command_executor import LocalCommandExecutor
+from breba_docs.services.command_output import CommandOutput
+from breba_docs.services.input_provider import InputProvider
+
+
+def test_output_kept_in_memory_when_small():
+    with CommandOutput(max_head=10, max_tail=10) as output:
+        output.append("hello ")
+        output.append("world")
+
+        assert output.text() == "hello world"
+        assert output.full_text() == "hello world"
+        assert len(output) == 11
+        assert output.spilled_size == 0
+
+
+def test_output_spills_middle():
+    with CommandOutput(max_head=5, max_tail=5) as output:
+        output.append("0123456789")
+        output.append("abcdefghij")
+
+        assert output.head() == "01234"
+        assert output.tail() == "fghij"
+        assert output.spilled_size == 10
+        assert output.text() == "01234\n[... 10 characters omitted ...]\nfghij"
+        assert output.full_text() == "0123456789abcdefghij"
+
+
+def test_remove_text_across_head_and_tail():
+    with CommandOutput(max_head=4, max_tail=20) as output:
+        output.append("ab")
+        output.append("cMAR")
+        output.append("KERd")
+
+        output.remove("MARKER")
+
+        assert output.text() == "abcd"
+        assert len(output) == 4
+
+
+class ChunkedProcess:
+    """Echoes the end marker split across reads"""
+
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.end_marker = None
+
+    def send_command(self, command, end_marker):
+        # Shell expands the exit status in the end marker
+        self.end_marker = end_marker.replace("$?", "0")
+
+    def read_nonblocking(self, timeout):
+        if not self.chunks:
+            raise TimeoutError()
+        chunk = self.chunks.pop(0)
+        return chunk.replace("{marker}", self.end_marker)
+
+
+def test_local_executor_finds_split_marker(mocker):
+    # Marker is split in the middle, neither chunk contains it on its own
+    process = ChunkedProcess(["line 1\n" * 5, "line 2\n" * 5 + "{marker}\n"])
+    original_read = process.read_nonblocking
+
+    def split_read(timeout):
+        chunk = original_read(timeout)
+        if process.end_marker in chunk:
+            index = chunk.index(process.end_marker) + 5
+            process.chunks.insert(0, chunk[index:])
+            return chunk[:index]
+        return chunk
+
+    process.read_nonblocking = split_read
+    input_provider = mocker.Mock(spec=InputProvider)
+    executor = LocalCommandExecutor(input_provider, process, max_output_head=10, max_output_tail=20)
+
+    with executor.run_command("some command") as output:
+        assert output.full_text() == "line 1\n" * 5 + "line 2\n" * 5
+        assert output.spilled_size > 0
+        assert output.text().endswith("line 2\n" * 2)
+
+    input_provider.get_input.assert_not_called()
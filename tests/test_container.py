@@ -0,0 +1,102 @@
+import socket
+
+import pytest
+
+from breba_docs import config
+from breba_docs.container import container_setup, pty_server_uri, container_startup_timings
+
+
+@pytest.fixture
+def docker_client(mocker):
+    client = mocker.MagicMock()
+    client.containers.run.return_value.logs.return_value = [
+        b"2025-03-01 10:00:00 - INFO - Starting WebSocket server on 0.0.0.0:44440\n",
+        b"2025-03-01 10:00:00 - INFO - Server sta",
+        b"rted, serving until stopped...\n",
+    ]
+    mocker.patch("breba_docs.container.docker.from_env", return_value=client)
+    return client
+
+
+def test_container_setup_publishes_ephemeral_loopback_port(docker_client):
+    container_setup()
+
+    ports = docker_client.containers.run.call_args.kwargs["ports"]
+    assert ports == {"44440/tcp": ("127.0.0.1", None)}
+
+
+def test_container_setup_waits_for_pty_server(docker_client):
+    container = container_setup()
+
+    timings = container_startup_timings(container)
+    assert timings.start >= 0
+    assert timings.ready >= 0
+
+
+def test_container_setup_fails_when_container_stops(docker_client):
+    docker_client.containers.run.return_value.logs.return_value = [b"bash: pty-server: command not found\n"]
+
+    with pytest.raises(Exception, match="Container failed to start"):
+        container_setup()
+
+
+@pytest.fixture
+def listening_port():
+    server = socket.create_server(("127.0.0.1", 0))
+    yield server.getsockname()[1]
+    server.close()
+
+
+def _publish(docker_client, port):
+    docker_client.containers.run.return_value.ports = {"44440/tcp": [{"HostIp": "127.0.0.1", "HostPort": str(port)}]}
+
+
+def test_container_setup_probes_port_when_not_ready_in_time(mocker, docker_client, listening_port):
+    # Image that never logs the ready marker, and keeps running
+    mocker.patch("breba_docs.container.ContainerLogs.pump")
+    _publish(docker_client, listening_port)
+
+    container = container_setup(ready_timeout=0.1)
+
+    assert container_startup_timings(container).ready >= 0.1
+
+
+def test_container_setup_fails_when_port_is_not_accepting(mocker, docker_client):
+    mocker.patch("breba_docs.container.ContainerLogs.pump")
+    mocker.patch("breba_docs.container.PORT_PROBE_TIMEOUT", 0.2)
+    # Nothing listens on a port that was free a moment ago
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        closed_port = server.getsockname()[1]
+    _publish(docker_client, closed_port)
+
+    with pytest.raises(Exception, match="Container failed to start"):
+        container_setup(ready_timeout=0.1)
+
+
+def test_container_setup_without_ready_marker_waits_for_port(mocker, monkeypatch, docker_client, listening_port):
+    monkeypatch.setattr(config, "container_ready_marker", None)
+    docker_client.containers.run.return_value.logs.return_value = [b"custom image started\n"]
+    _publish(docker_client, listening_port)
+
+    container = container_setup(ready_timeout=5)
+
+    assert container_startup_timings(container).ready < 5
+
+
+def test_containers_get_own_uri(mocker):
+    first = mocker.MagicMock(ports={"44440/tcp": [{"HostIp": "127.0.0.1", "HostPort": "32768"}]})
+    second = mocker.MagicMock(ports={"44440/tcp": [{"HostIp": "127.0.0.1", "HostPort": "32769"}]})
+
+    assert pty_server_uri(first) == "ws://127.0.0.1:32768"
+    assert pty_server_uri(second) == "ws://127.0.0.1:32769"
+
+
+def test_pty_server_uri_reloads_until_port_is_known(mocker):
+    container = mocker.MagicMock(ports={})
+
+    def reload():
+        container.ports = {"44440/tcp": [{"HostIp": "127.0.0.1", "HostPort": "32768"}]}
+
+    container.reload.side_effect = reload
+
+    assert pty_server_uri(container) == "ws://127.0.0.1:32768"
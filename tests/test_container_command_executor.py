@@ -1,3 +1,6 @@
+import asyncio
+import time
+
 import pytest
 from pty_server import AsyncPtyClient
 
@@ -15,30 +18,60 @@ def mock_pty_client(mocker):
 
 @pytest.mark.asyncio
 async def test_should_return_none_when_input_message_is_none(mocker, mock_input_provider, mock_pty_client):
-    mock_input_provider.get_input = mocker.MagicMock(return_value=None)
+    mock_input_provider.get_input_async = mocker.AsyncMock(return_value=None)
 
     executor = ContainerCommandExecutor(mock_input_provider, mock_pty_client)
     provide_input = executor.create_provide_input()
 
-    assert await provide_input(["Hello World"]) is None
+    assert await provide_input("Hello World", 1) is None
 
 @pytest.mark.asyncio
 async def test_should_return_true_when_input_message_is_string(mocker, mock_input_provider, mock_pty_client):
-    mock_input_provider.get_input = mocker.MagicMock(return_value="Hello World")
+    mock_input_provider.get_input_async = mocker.AsyncMock(return_value="Hello World")
     mock_pty_client.send_input = mocker.AsyncMock(return_value=True)
 
     executor = ContainerCommandExecutor(mock_input_provider, mock_pty_client)
     provide_input = executor.create_provide_input()
 
-    input_text = await provide_input(["Hello World"])
+    input_text = await provide_input("Hello World", 1)
     assert input_text is True
 
 @pytest.mark.asyncio
 async def test_should_return_false_when_send_message_fails(mocker, mock_input_provider, mock_pty_client):
-    mock_input_provider.get_input = mocker.MagicMock(return_value="Hello World")
+    mock_input_provider.get_input_async = mocker.AsyncMock(return_value="Hello World")
     mock_pty_client.send_input = mocker.AsyncMock(return_value=False)
 
     executor = ContainerCommandExecutor(mock_input_provider, mock_pty_client)
     provide_input = executor.create_provide_input()
 
-    assert await provide_input(["Hello World"]) is False
\ No newline at end of file
+    assert await provide_input("Hello World", 1) is False
+
+@pytest.mark.asyncio
+async def test_sessions_run_concurrently_on_callers_loop(mocker, mock_input_provider):
+    clients = []
+
+    def new_client():
+        client = mocker.MagicMock(spec=AsyncPtyClient)
+        client.connect = mocker.AsyncMock()
+        client.disconnect = mocker.AsyncMock()
+        client.send_command = mocker.AsyncMock(return_value=mocker.MagicMock())
+        clients.append(client)
+        return client
+
+    async def slow_response(response, command):
+        await asyncio.sleep(0.2)
+        return "done"
+
+    executors = [ContainerCommandExecutor(mock_input_provider, uri=f"ws://127.0.0.1:{port}") for port in (1, 2, 3)]
+    for executor in executors:
+        mocker.patch.object(executor, "_new_client", side_effect=new_client)
+        mocker.patch.object(executor, "read_response", side_effect=slow_response)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(executor.execute_command_async("sleep 1") for executor in executors))
+
+    assert results == ["done", "done", "done"]
+    # Sessions overlap instead of running one after the other
+    assert time.monotonic() - started < 0.5
+    assert all(executor.loop is None for executor in executors)
+    assert all(client.disconnect.await_count == 1 for client in clients)
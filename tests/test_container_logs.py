@@ -0,0 +1,36 @@
+from breba_docs.container import ContainerLogs
+
+
+def test_tail_keeps_most_recent_output(mocker):
+    container = mocker.MagicMock()
+    container.logs.return_value = [f"line {i}\n".encode() for i in range(1000)]
+    container_logs = ContainerLogs(container, max_buffer_size=100)
+
+    container_logs.pump()
+
+    assert container_logs.tail(13) == "998\nline 999\n"
+    assert container_logs._buffer_size <= 100
+
+
+def test_echo_decodes_characters_split_across_chunks(mocker, capsys):
+    encoded = "Downloading ━━━━ 100%\n".encode()
+    container = mocker.MagicMock()
+    # Split in the middle of a multibyte character
+    container.logs.return_value = [encoded[:13], encoded[13:]]
+    container_logs = ContainerLogs(container, echo=True)
+
+    container_logs.pump()
+
+    assert capsys.readouterr().out == "Downloading ━━━━ 100%\n"
+
+
+def test_log_file_is_rotated(mocker, tmp_path):
+    container = mocker.MagicMock()
+    container.logs.return_value = [b"x" * 60, b"y" * 60]
+    log_file = tmp_path / "container.log"
+    container_logs = ContainerLogs(container, log_file=log_file, max_file_size=100)
+
+    container_logs.pump()
+
+    assert log_file.read_bytes() == b"y" * 60
+    assert (tmp_path / "container.log.1").read_bytes() == b"x" * 60
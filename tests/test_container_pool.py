@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from breba_docs.container import ContainerPool
+
+
+@pytest.fixture
+def started_containers(mocker):
+    containers = []
+
+    def setup(**kwargs):
+        container = mocker.MagicMock(name=f"container-{len(containers)}")
+        containers.append(container)
+        return container
+
+    mocker.patch("breba_docs.container.container_setup", side_effect=setup)
+    return containers
+
+
+@pytest.fixture
+def destroy_container(mocker):
+    return mocker.patch("breba_docs.container.destroy_container")
+
+
+def test_lease_destroys_container_and_refills(started_containers, destroy_container):
+    with ContainerPool(size=2) as pool:
+        with pool.lease(timeout=5) as container:
+            assert container in started_containers
+
+        destroy_container.assert_called_once_with(container)
+        # Leasing a container starts a replacement
+        pool._refill_executor.shutdown(wait=True)
+        assert len(started_containers) == 3
+
+    # Closing the pool destroys remaining ready containers
+    assert destroy_container.call_count == 3
+
+
+def test_release_recycles_container(mocker, started_containers, destroy_container):
+    with ContainerPool(size=1) as pool:
+        # Don't start replacements, so that the pool has room for the recycled container
+        mocker.patch.object(pool, "_refill")
+        with pool.lease(recycle=True, timeout=5) as container:
+            pass
+
+        destroy_container.assert_not_called()
+        assert pool.acquire(timeout=5) is container
+
+
+def test_lease_raises_when_container_fails_to_start(mocker, destroy_container):
+    mocker.patch("breba_docs.container.container_setup", side_effect=Exception("docker is not running"))
+
+    with ContainerPool(size=1) as pool:
+        with pytest.raises(Exception, match="Pooled container failed to start"):
+            with pool.lease(timeout=5):
+                pass
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ContainerPool(size=0)
+
+
+def test_close_does_not_wait_for_starting_containers(mocker, destroy_container):
+    replacement_starting = threading.Event()
+    release_startup = threading.Event()
+    containers = []
+
+    def setup(**kwargs):
+        if containers:
+            # Replacement started by the lease takes a while to get ready
+            replacement_starting.set()
+            release_startup.wait(5)
+        container = mocker.MagicMock(name=f"container-{len(containers)}")
+        containers.append(container)
+        return container
+
+    mocker.patch("breba_docs.container.container_setup", side_effect=setup)
+    pool = ContainerPool(size=1)
+    pool.start()
+    with pool.lease(timeout=5):
+        pass
+    assert replacement_starting.wait(5)
+
+    started = time.monotonic()
+    pool.close()
+    assert time.monotonic() - started < 1
+
+    release_startup.set()
+    pool._refill_executor.shutdown(wait=True)
+    # Replacement was destroyed as soon as it started, since the pool was closed
+    assert destroy_container.call_args_list[-1] == mocker.call(containers[-1])
+    assert len(containers) == 2
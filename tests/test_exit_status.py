@@ -0,0 +1,85 @@
+from unittest.mock import Mock
+
+import pytest
+
+from breba_docs.agent.graph_agent import GraphAgent
+from breba_docs.services.command_executor import ContainerCommandExecutor, LocalCommandExecutor, with_exit_status
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.success_policy import succeeded_report
+
+
+@pytest.fixture(autouse=True)
+def mock_models(mocker):
+    mocker.patch('breba_docs.agent.graph_agent.ChatOpenAI')
+    mocker.patch('breba_docs.agent.graph_agent.OpenAIAgent')
+
+
+@pytest.mark.parametrize("command, status_command", [
+    ("pip install -r requirements.txt", 'pip install -r requirements.txt; echo "Exit-status" "1234" $?'),
+    ("cd app && npm install", 'cd app && npm install; echo "Exit-status" "1234" $?'),
+    ("echo '# not a comment'", 'echo \'# not a comment\'; echo "Exit-status" "1234" $?'),
+    ("pip install nodestream  # install the cli", None),
+    ("python -m http.server &", None),
+    ("cat <<EOF\nhello\nEOF", None),
+    ("cd foo;", 'cd foo; echo "Exit-status" "1234" $?'),
+    ("cd foo ; ", 'cd foo; echo "Exit-status" "1234" $?'),
+    ("find . -name '*.pyc' -exec rm {} \\;", 'find . -name \'*.pyc\' -exec rm {} \\;; echo "Exit-status" "1234" $?'),
+    ("cat requirements.txt |", None),
+    ("make &&", None),
+    ("make ||", None),
+])
+def test_with_exit_status(command, status_command):
+    assert with_exit_status(command, "Exit-status 1234") == status_command
+
+
+def test_container_executor_extracts_exit_status(mocker):
+    executor = ContainerCommandExecutor(mocker.Mock(spec=InputProvider))
+    status_command = with_exit_status("ls missing", "Exit-status 1234")
+    response = f"user-abc$ {status_command}\nls: cannot access 'missing'\nExit-status 1234 2\r\n"
+
+    output = executor._extract_exit_status(response, status_command, "ls missing", "Exit-status 1234")
+
+    assert output == "user-abc$ ls missing\nls: cannot access 'missing'\n"
+    assert executor.exit_code == 2
+
+
+class StatusProcess:
+    def __init__(self, output: str, exit_code: int):
+        self.output = output
+        self.exit_code = exit_code
+
+    def send_command(self, command, end_marker):
+        self.output += end_marker.replace("$?", str(self.exit_code)) + "\r\n"
+
+    def read_nonblocking(self, timeout):
+        if not self.output:
+            raise TimeoutError()
+        output, self.output = self.output, ""
+        return output
+
+
+def test_local_executor_captures_exit_status(mocker):
+    executor = LocalCommandExecutor(mocker.Mock(spec=InputProvider), StatusProcess("No such file\n", 127))
+
+    assert executor.execute_command("missing-command") == "No such file\n"
+    assert executor.exit_code == 127
+    assert executor.resource_usage.output_bytes == len("No such file\n")
+
+
+def test_succeeded_report():
+    assert succeeded_report("ls", "README.md\n", 0).success
+    assert succeeded_report("ls", "README.md\n", 1) is None
+    assert succeeded_report("ls", "README.md\n", None) is None
+    assert succeeded_report("pytest", "1 failed, 2 passed\n", 0) is None
+
+
+def test_clean_success_skips_agent():
+    graph_agent = GraphAgent(doc=Mock(content="Sample document content"))
+    session = Mock(resource_usage=None, output_ref=None, exit_code=0)
+    session.execute_command.return_value = "Successfully installed nodestream\n"
+
+    command_reports = graph_agent._execute_batched(session, ["pip install nodestream"])
+
+    assert command_reports[0].success
+    assert command_reports[0].exit_code == 0
+    graph_agent.agent.analyze_outputs.assert_not_called()
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from breba_docs.services.command_executor import ContainerCommandExecutor
+from breba_docs.services.input_provider import InputProvider
+from tests.fake_pty_server import FakePtyServer, huge, prompt_waiting, slow_drip
+
+
+# Shell prompt that the fake server echoes command lines after
+PROMPT = "root@breba:/usr/src# "
+
+
+@pytest.fixture
+def input_provider(mocker):
+    input_provider = mocker.MagicMock(spec=InputProvider)
+    input_provider.get_input_async = mocker.AsyncMock(return_value="y")
+    return input_provider
+
+
+@pytest.mark.asyncio
+async def test_executes_commands_in_order(input_provider):
+    async with FakePtyServer(latency=0.01) as server:
+        async with ContainerCommandExecutor(input_provider, uri=server.uri).async_session() as session:
+            # Exit status echo is taken out of the echoed command line
+            assert await session.execute_command_async("echo one") == f"{PROMPT}echo one\r\necho one\n"
+            assert await session.execute_command_async("echo two") == f"{PROMPT}echo two\r\necho two\n"
+            assert session.exit_code == 0
+
+
+@pytest.mark.asyncio
+async def test_answers_prompt(input_provider):
+    script = prompt_waiting(exit_code_by_answer={"y": 3})
+    async with FakePtyServer({"./install.sh": script}) as server:
+        async with ContainerCommandExecutor(input_provider, uri=server.uri).async_session() as session:
+            output = await session.execute_command_async("./install.sh")
+
+    assert output == f"{PROMPT}./install.sh\r\nDo you want to continue? [Y/n] y\nAnswered y\n"
+    assert session.exit_code == 3
+    input_provider.get_input_async.assert_awaited_once_with("Do you want to continue? [Y/n] ")
+
+
+@pytest.mark.asyncio
+async def test_streams_huge_output(input_provider):
+    async with FakePtyServer({"cat big.log": huge(total_bytes=2 * 2 ** 20)}) as server:
+        async with ContainerCommandExecutor(input_provider, uri=server.uri).async_session() as session:
+            output = await session.execute_command_async("cat big.log")
+
+    # Only the beginning and the end of the output are kept in memory
+    assert len(output) < 2 * 2 ** 20
+    assert "characters omitted" in output
+    assert session.resource_usage.output_bytes == len(f"{PROMPT}cat big.log\r\n") + 2 * 2 ** 20
+
+
+def test_sync_executor_against_server_in_thread(input_provider):
+    server = FakePtyServer({"make": slow_drip(lines=3, interval=0.05)})
+    with server.in_thread() as uri:
+        started = time.monotonic()
+        output = ContainerCommandExecutor(input_provider, uri=uri).execute_command("make")
+
+    assert output == f"{PROMPT}make\r\ndrip 0\ndrip 1\ndrip 2\n"
+    assert time.monotonic() - started >= 0.15
@@ -1,11 +1,16 @@
 import json
+import time
 from unittest.mock import Mock, patch, MagicMock
 
 import pytest
 from langgraph.constants import END
 
 from breba_docs.agent.graph_agent import GraphAgent, AgentState
+from breba_docs.checkpoints import CheckpointStore
+from breba_docs.services.document import Document
 from breba_docs.services.reports import CommandReport, GoalReport, Goal
+from breba_docs.services.transcript import Transcript
+from breba_docs.workspace import WorkspaceSync
 
 
 @pytest.fixture(autouse=True)
@@ -78,3 +83,163 @@ def test_commands_failed():
     graph_agent = GraphAgent(doc=mock_doc)
 
     assert not graph_agent.commands_succeeded(state)
+
+
+def test_parallel_goals_are_reported_in_goal_order(mocker):
+    goals = [{"name": f"Goal {i}", "description": f"Desc {i}"} for i in range(4)]
+    mock_doc = Mock(content="Sample document content")
+
+    graph_agent = GraphAgent(doc=mock_doc, max_parallel_goals=4)
+    graph_agent.model.invoke.return_value = Mock(content=json.dumps({"goals": goals}))
+
+    def run_goals(worker, worker_goals):
+        # Finish goals in reverse order
+        goal = worker_goals[0]
+        time.sleep(0.05 * (4 - int(goal.name.split()[-1])))
+        return [GoalReport(goal, [])]
+
+    mocker.patch.object(GraphAgent, "run_goals", autospec=True, side_effect=run_goals)
+
+    state = graph_agent.invoke()
+
+    assert [report.goal.name for report in state["goal_reports"]] == [goal["name"] for goal in goals]
+
+
+def test_goal_worker_has_every_option_and_its_own_agent(mocker):
+    mocker.patch('breba_docs.agent.graph_agent.OpenAIAgent', side_effect=lambda *args, **kwargs: Mock())
+    graph_agent = GraphAgent(doc=Mock(content="Sample document content"), max_parallel_goals=2,
+                             pipeline_analysis=True, output_store=Mock(), replay_transcript=Mock(),
+                             response_cache=Mock(), agent_backend="assistants")
+    workers = []
+
+    def run_goals(worker, goals):
+        workers.append(worker)
+        return [GoalReport(goals[0], [])]
+
+    mocker.patch.object(GraphAgent, "run_goals", autospec=True, side_effect=run_goals)
+
+    graph_agent.process_goal({"goal": Goal("Sample Goal", "Test goal"), "goal_index": 0})
+
+    worker = workers[0]
+    options = {name: value for name, value in vars(graph_agent).items() if name not in ("agent", "goal_graph")}
+    assert {name: value for name, value in vars(worker).items() if name in options} == options
+    assert worker.agent is not graph_agent.agent
+    worker.agent.close.assert_called_once()
+
+
+def _pipelined_agent(mocker, cancel_after_failure=False):
+    graph_agent = GraphAgent(doc=Mock(content="Sample document content"), pipeline_analysis=True,
+                             cancel_after_failure=cancel_after_failure)
+    mocker.patch('breba_docs.agent.graph_agent.compact_output', side_effect=lambda output: output)
+    return graph_agent
+
+
+def test_pipelined_analysis_overlaps_execution(mocker):
+    graph_agent = _pipelined_agent(mocker)
+    session = Mock(resource_usage=None)
+
+    def execute_command(command):
+        time.sleep(0.1)
+        return f"output of {command}"
+
+    def analyze_output(output):
+        time.sleep(0.1)
+        return CommandReport(output.removeprefix("output of "), None, True, None)
+
+    session.execute_command.side_effect = execute_command
+    graph_agent.agent.analyze_output.side_effect = analyze_output
+    commands = [f"command {i}" for i in range(4)]
+
+    started = time.monotonic()
+    command_reports = graph_agent._execute_pipelined(session, commands)
+
+    # Sequential execution and analysis would take 0.8 seconds
+    assert time.monotonic() - started < 0.7
+    assert [report.command for report in command_reports] == commands
+
+
+def test_pipelined_analysis_cancels_after_failure(mocker):
+    graph_agent = _pipelined_agent(mocker, cancel_after_failure=True)
+    session = Mock(resource_usage=None)
+
+    def execute_command(command):
+        time.sleep(0.05)
+        return command
+
+    session.execute_command.side_effect = execute_command
+    graph_agent.agent.analyze_output.side_effect = lambda output: CommandReport(output, None, output != "fail", None)
+
+    command_reports = graph_agent._execute_pipelined(session, ["ok", "fail", "next", "last"])
+
+    # Analysis of the failed command may still be running when the next command starts, but not after that
+    assert [report.success for report in command_reports][:2] == [True, False]
+    assert command_reports[-1].success is None
+    assert command_reports[-1].command == "last"
+    assert session.execute_command.call_count <= 3
+
+
+def test_batched_analysis(mocker):
+    graph_agent = GraphAgent(doc=Mock(content="Sample document content"), batch_analysis=True)
+    session = Mock(resource_usage=None)
+    session.execute_command.side_effect = lambda command: f"output of {command}"
+    graph_agent.agent.analyze_outputs.side_effect = lambda command_outputs: [
+        CommandReport(command, None, True, output) for command, output in command_outputs
+    ]
+
+    command_reports = graph_agent._execute_batched(session, ["ls", "pwd"])
+
+    graph_agent.agent.analyze_outputs.assert_called_once_with([("ls", "output of ls"), ("pwd", "output of pwd")])
+    assert [report.insights for report in command_reports] == ["output of ls", "output of pwd"]
+
+
+def _checkpointed_agent(tmp_path):
+    """Graph agent with a checkpoint saved after the first command of the goal"""
+    (tmp_path / "README.md").write_text("pip install -r requirements.txt")
+    (tmp_path / "requirements.txt").write_text("requests")
+    client = Mock()
+    client.images.get.return_value.id = "sha256:base"
+    checkpoints = CheckpointStore(client)
+    graph_agent = GraphAgent(doc=Document("pip install -r requirements.txt", tmp_path / "README.md"),
+                             checkpoints=checkpoints, workspace=WorkspaceSync(tmp_path))
+    checkpoints.save(Mock(), ["pip install -r requirements.txt"],
+                     [CommandReport("pip install -r requirements.txt", None, True, None)],
+                     graph_agent._checkpoint_environment())
+    return graph_agent
+
+
+def test_reevaluation_after_document_fix_resumes_from_checkpoint(tmp_path):
+    graph_agent = _checkpointed_agent(tmp_path)
+
+    # Document was fixed by a modify command, which is what triggers the re-evaluation
+    (tmp_path / "README.md").write_text("pip install -r requirements.txt\npython app.py")
+
+    checkpoint = graph_agent.checkpoints.restore_point(["pip install -r requirements.txt", "python app.py"],
+                                                       graph_agent._checkpoint_environment())
+    assert checkpoint.commands == ["pip install -r requirements.txt"]
+
+
+def test_change_of_project_file_does_not_resume_from_checkpoint(tmp_path):
+    graph_agent = _checkpointed_agent(tmp_path)
+
+    (tmp_path / "requirements.txt").write_text("requests\nflask")
+
+    assert graph_agent.checkpoints.restore_point(["pip install -r requirements.txt", "python app.py"],
+                                                 graph_agent._checkpoint_environment()) is None
+
+
+def test_commands_missing_from_replayed_transcript_are_reported(tmp_path):
+    transcript = Transcript(tmp_path / "transcript.jsonl")
+    transcript.append({"command": "ls", "output": "README.md\n", "exit_code": 0, "wall_time": 0.1, "events": []})
+    graph_agent = GraphAgent(doc=Mock(content="Sample document content"),
+                             replay_transcript=Transcript(tmp_path / "transcript.jsonl"))
+    goal_report = GoalReport(Goal("Sample Goal", "Test goal"), [CommandReport(command, None, None, None)
+                                                               for command in ("ls", "make", "make test")])
+
+    result = graph_agent.execute_commands(AgentState(messages=[], goals=[], goal_reports=[goal_report],
+                                                     current_goal=None))
+
+    command_reports = result["goal_reports"][0].command_reports
+    assert [report.command for report in command_reports] == ["ls", "make", "make test"]
+    assert command_reports[0].success is True
+    assert [report.success for report in command_reports[1:]] == [None, None]
+    assert command_reports[1].insights == "Not replayed. No recorded execution of command: make"
@@ -0,0 +1,43 @@
+import pytest
+
+from breba_docs.image_builder import ImageSpec, build_image, DIGEST_LABEL
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.MagicMock()
+    client.images.list.return_value = []
+    client.images.build.return_value = (mocker.MagicMock(), [{"stream": "Step 1/4 : FROM python:3\n"}])
+    return client
+
+
+def test_digest_ignores_package_order():
+    assert ImageSpec(extra_packages=("requests", "pexpect")).digest() == \
+           ImageSpec(extra_packages=("pexpect", "requests")).digest()
+    assert ImageSpec().digest() != ImageSpec(extra_packages=("requests",)).digest()
+    assert ImageSpec().digest() != ImageSpec(base_image="python:3.12").digest()
+
+
+def test_builds_labeled_image(client):
+    spec = ImageSpec(extra_packages=("requests",))
+
+    build_image("breba-image", spec, client, log=lambda message: None)
+
+    kwargs = client.images.build.call_args.kwargs
+    assert kwargs["tag"] == "breba-image:latest"
+    assert kwargs["labels"] == {DIGEST_LABEL: spec.digest()}
+    dockerfile = kwargs["fileobj"].read().decode()
+    assert "pip install --no-cache-dir 'pty-server>=0.3.0,<0.4.0'" in dockerfile
+    assert "pip install --no-cache-dir 'requests'" in dockerfile
+
+
+def test_reuses_image_with_same_digest(mocker, client):
+    existing = mocker.MagicMock()
+    client.images.list.return_value = [existing]
+
+    image = build_image("another-project-image", ImageSpec(), client, log=lambda message: None)
+
+    assert image is existing
+    existing.tag.assert_called_once_with("another-project-image", "latest")
+    client.images.build.assert_not_called()
+    client.images.list.assert_called_once_with(filters={"label": f"{DIGEST_LABEL}={ImageSpec().digest()}"})
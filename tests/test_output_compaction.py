@@ -0,0 +1,46 @@
+from breba_docs.services.output_compaction import compact_output, render_carriage_returns, strip_escape_sequences
+
+
+def test_strip_escape_sequences():
+    assert strip_escape_sequences("\x1b[1;31mred\x1b[0m \x1b]0;title\x07text\x07") == "red text"
+
+
+def test_render_carriage_returns():
+    assert render_carriage_returns("progress 10%\rprogress 50%\rdone") == "doneress 50%"
+    assert render_carriage_returns("[###   ]\r[######]") == "[######]"
+
+
+def test_collapse_progress_lines():
+    downloads = "".join(f"Downloading chunk {i} of 100 ({i * 10} kB)\n" for i in range(1, 101))
+    output = "Collecting nodestream\n" + downloads + "Successfully installed nodestream-0.13.0\n"
+
+    assert compact_output(output) == (
+        "Collecting nodestream\n"
+        "Downloading chunk 1 of 100 (10 kB)\n"
+        "[... 98 similar lines omitted ...]\n"
+        "Downloading chunk 100 of 100 (1000 kB)\n"
+        "Successfully installed nodestream-0.13.0\n"
+    )
+
+
+def test_error_regions_kept():
+    lines = [f"Processing item {i}" for i in range(10)]
+    lines[5] = "ERROR: could not process item 5"
+    output = "\n".join(lines) + "\nTraceback (most recent call last):\n  File \"x.py\", line 1\nValueError: bad\n$ "
+
+    compacted = compact_output(output, context=1)
+
+    assert compacted.startswith("Processing item 0\n[... 2 similar lines omitted ...]\nProcessing item 3\n"
+                                "Processing item 4\nERROR: could not process item 5\nProcessing item 6\n")
+    assert compacted.endswith("Traceback (most recent call last):\n  File \"x.py\", line 1\nValueError: bad\n$ ")
+
+
+def test_prompt_line_kept():
+    output = "Step 1\nStep 2\nStep 3\nStep 4\nStep 5"
+    assert compact_output(output) == "Step 1\n[... 2 similar lines omitted ...]\nStep 4\nStep 5"
+
+
+def test_short_runs_kept():
+    output = "Step 1\nStep 2\nStep 3\nDone"
+    assert compact_output(output) == output
+    assert compact_output(output, min_repeats=2) == output
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from breba_docs.services.command_executor import LocalCommandExecutor
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.output_store import OutputStore
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_outputs_are_read_back(tmp_path, use_mmap):
+    store = OutputStore(tmp_path, run_id="run", use_mmap=use_mmap)
+    with store.open_stream() as stream:
+        stream.begin()
+        stream.write("first ")
+        stream.write("command ✓\n")
+        first = stream.end()
+        stream.begin()
+        second = stream.end()
+        stream.begin()
+        stream.write("third command\n")
+        third = stream.end()
+
+    assert store.read(first) == "first command ✓\n"
+    assert store.read(second) == ""
+    assert store.read(third) == "third command\n"
+    assert first.path == third.path
+    assert third.offset == first.offset + first.length
+
+
+def test_sessions_write_to_own_files(tmp_path):
+    store = OutputStore(tmp_path, run_id="run")
+    with store.open_stream() as first, store.open_stream() as second:
+        assert first.path != second.path
+        assert first.path.parent == tmp_path / "run"
+
+
+class MarkerProcess:
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.end_marker = None
+
+    def send_command(self, command, end_marker):
+        # Shell expands the exit status in the end marker
+        self.end_marker = end_marker.replace("$?", "0")
+
+    def read_nonblocking(self, timeout):
+        if not self.chunks:
+            raise TimeoutError()
+        return self.chunks.pop(0).replace("{marker}", self.end_marker)
+
+
+def test_local_executor_streams_output_without_marker(tmp_path, mocker):
+    store = OutputStore(tmp_path, run_id="run")
+    process = MarkerProcess(["Hello", " world\nCompl", "eted? no\n{marker}\n"])
+    with store.open_stream() as stream:
+        executor = LocalCommandExecutor(mocker.Mock(spec=InputProvider), process, output_stream=stream)
+
+        output = executor.execute_command("echo hello")
+
+    assert output == "Hello world\nCompleted? no\n"
+    assert store.read(executor.output_ref) == output
+
+
+def test_old_runs_are_removed(tmp_path):
+    for run in range(4):
+        OutputStore(tmp_path, run_id=f"run-{run}", keep_runs=None)
+        # Runs are ordered by modification time
+        os.utime(tmp_path / f"run-{run}", (run, run))
+
+    store = OutputStore(tmp_path, run_id="run-4", keep_runs=3)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["run-2", "run-3", "run-4"]
+    assert store.path.exists()
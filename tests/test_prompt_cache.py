@@ -0,0 +1,56 @@
+from breba_docs.agent.agent import Agent
+from breba_docs.services.input_provider import AgentInputProvider
+from breba_docs.services.prompt_cache import PromptAnswerCache, prompt_signature
+
+
+def test_prompt_signature_ignores_volatile_tokens():
+    first = prompt_signature("Downloading...\nSave to /tmp/abc123/out.txt as version 1.2.3? ")
+    second = prompt_signature("\x1b[1mSave to /tmp/xyz789/out.txt as version 2.0.0?\x1b[0m\n")
+
+    assert first == second == "save to <path> as version #?"
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PromptAnswerCache(max_entries=2)
+    cache.put("Name: ", "breba")
+    cache.put("Email: ", "breba@example.com")
+
+    assert cache.get("Name: ") == "breba"
+    cache.put("License: ", "MIT")
+
+    assert cache.get("Email: ") is None
+    assert cache.get("Name: ") == "breba"
+    assert cache.get("License: ") == "MIT"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cache_persists_answers(tmp_path):
+    path = tmp_path / ".breba" / "prompt_answers.json"
+    PromptAnswerCache(path).put("package name: (my-app) ", "my-app")
+
+    assert PromptAnswerCache(path).get("package name: (my-app) ") == "my-app"
+
+
+def test_input_provider_reuses_answers(mocker):
+    agent = mocker.Mock(spec=Agent)
+    agent.provide_input.return_value = "2024-01-01"
+    input_provider = AgentInputProvider(agent, answer_cache=PromptAnswerCache())
+
+    assert input_provider.get_input("Please enter today's date (YYYY-MM-DD): ") == "2024-01-01"
+    assert input_provider.get_input("$ read date\nPlease enter today's date (YYYY-MM-DD): ") == "2024-01-01"
+
+    agent.provide_input.assert_called_once()
+
+
+def test_input_provider_does_not_keep_secrets(tmp_path, mocker):
+    path = tmp_path / ".breba" / "prompt_answers.json"
+    agent = mocker.Mock(spec=Agent)
+    agent.answer_prompt.side_effect = ["hunter2", "correct horse"]
+    input_provider = AgentInputProvider(agent, answer_cache=PromptAnswerCache(path))
+
+    assert input_provider.get_input("$ sudo apt install git\nPassword: ") == "hunter2"
+    assert input_provider.get_input("$ ssh-add\nPassword: ") == "correct horse"
+
+    assert agent.answer_prompt.call_count == 2
+    assert len(input_provider.answer_cache) == 0
+    assert not path.exists()
@@ -0,0 +1,57 @@
+import pytest
+
+from breba_docs.agent.agent import Agent
+from breba_docs.services.input_provider import AgentInputProvider
+from breba_docs.services.prompt_detector import detect_prompt
+
+
+@pytest.mark.parametrize("output, waiting, answer", [
+    ("After this operation, 10 MB will be used.\nDo you want to continue? [Y/n] ", True, "y"),
+    ("Proceed (y/n)? ", True, "y"),
+    ("\x1b[1mOverwrite existing file? yes/no:\x1b[0m ", True, "y"),
+    ("[sudo] password for user: ", True, None),
+    ("Downloading nodestream.whl  45%", False, None),
+    ("Building wheel [#######     ", False, None),
+])
+def test_detect_prompt(output, waiting, answer):
+    detection = detect_prompt(output)
+
+    assert detection.waiting == waiting
+    assert detection.answer == answer
+    assert detection.confidence >= 0.8
+
+
+def test_ambiguous_output_is_not_confident():
+    assert detect_prompt("package name: (my-app) ").confidence < 0.8
+    assert detect_prompt("Please enter today's date (YYYY-MM-DD): ").confidence < 0.8
+    assert detect_prompt("Building:").confidence < 0.8
+    assert detect_prompt("Enter name:\n").confidence < 0.8
+    assert detect_prompt("Collecting nodestream\n").confidence < 0.8
+    assert detect_prompt("Resolving dependencies").confidence < 0.8
+
+
+def test_input_provider_answers_locally(mocker):
+    agent = mocker.Mock(spec=Agent)
+    input_provider = AgentInputProvider(agent)
+
+    assert input_provider.get_input("Do you want to continue? [Y/n] ") == "y"
+    assert input_provider.get_input("Downloading nodestream.whl  45%") is None
+
+    agent.provide_input.assert_not_called()
+    agent.answer_prompt.assert_not_called()
+
+
+def test_input_provider_falls_back_to_agent(mocker):
+    agent = mocker.Mock(spec=Agent)
+    agent.answer_prompt.return_value = "secret"
+    agent.provide_input.return_value = "breba-noop"
+    input_provider = AgentInputProvider(agent)
+
+    # Known to be a prompt, only the answer comes from the agent
+    assert input_provider.get_input("[sudo] password for user: ") == "secret"
+    agent.provide_input.assert_not_called()
+
+    # Ambiguous, the agent decides whether there is a prompt, and may decide there is none
+    assert input_provider.get_input("Building:") is None
+    agent.provide_input.assert_called_once_with("Building:")
+    agent.answer_prompt.assert_called_once()
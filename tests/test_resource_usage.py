@@ -0,0 +1,47 @@
+import pytest
+
+from breba_docs.services.command_executor import ContainerCommandExecutor
+from breba_docs.services.container_stats import ContainerStats
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.reports import ResourceUsage, CommandReport, GoalReport, Goal, DocumentReport
+
+
+def stats(cpu_ns, memory):
+    return {"cpu_stats": {"cpu_usage": {"total_usage": cpu_ns}}, "memory_stats": {"usage": memory}}
+
+
+def test_usage_is_aggregated_through_reports():
+    first = CommandReport("pip install .", None, True, None, ResourceUsage(2.0, 1.5, 300, 1000))
+    second = CommandReport("pytest", None, True, None, ResourceUsage(1.0, 0.5, 500, 200))
+    local = CommandReport("echo done", None, True, None, ResourceUsage(0.1, None, None, 5))
+    goal_report = GoalReport(Goal("test", "run tests"), [first, second, local])
+
+    assert goal_report.resource_usage() == ResourceUsage(3.1, 2.0, 500, 1205)
+
+    document_report = DocumentReport("README.md", [goal_report, GoalReport(Goal("empty", ""), [])])
+    assert document_report.resource_usage() == ResourceUsage(3.1, 2.0, 500, 1205)
+
+
+def test_container_stats_measures_cpu_and_peak_memory(mocker):
+    container = mocker.MagicMock()
+    container.stats.side_effect = [stats(1_000_000_000, 100), stats(3_500_000_000, 150)]
+    container_stats = ContainerStats(container)
+
+    start = container_stats.begin()
+    container_stats._record_memory(400)  # sample from the stats stream while the command runs
+    usage = container_stats.end(start, wall_time=4.0, output_bytes=10)
+
+    assert usage == ResourceUsage(wall_time=4.0, cpu_seconds=2.5, peak_memory_bytes=400, output_bytes=10)
+
+
+@pytest.mark.asyncio
+async def test_executor_records_usage_of_last_command(mocker):
+    pty_client = mocker.MagicMock()
+    pty_client.send_command = mocker.AsyncMock(return_value=mocker.MagicMock())
+    executor = ContainerCommandExecutor(mocker.MagicMock(spec=InputProvider), pty_client)
+    mocker.patch.object(executor, "read_response", mocker.AsyncMock(return_value="Hello ✓"))
+
+    assert await executor.do_execute("echo Hello ✓") == "Hello ✓"
+
+    assert executor.resource_usage.output_bytes == len("Hello ✓".encode())
+    assert executor.resource_usage.cpu_seconds is None
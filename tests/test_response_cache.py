@@ -0,0 +1,117 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from breba_docs.agent.chat_agent import ChatCompletionsAgent
+from breba_docs.agent.graph_agent import GraphAgent, AgentState
+from breba_docs.agent.openai_agent import OpenAIAgent
+from breba_docs.services.reports import Goal
+from breba_docs.services.response_cache import ResponseCache
+
+
+def test_key_depends_on_every_part_of_the_request():
+    key = ResponseCache.key("gpt-4o-mini", 0.0, "instructions", [{"role": "user", "content": "message"}])
+
+    assert key == ResponseCache.key("gpt-4o-mini", 0.0, "instructions", [{"role": "user", "content": "message"}])
+    assert key != ResponseCache.key("gpt-4o", 0.0, "instructions", [{"role": "user", "content": "message"}])
+    assert key != ResponseCache.key("gpt-4o-mini", 0.5, "instructions", [{"role": "user", "content": "message"}])
+    assert key != ResponseCache.key("gpt-4o-mini", 0.0, "other", [{"role": "user", "content": "message"}])
+    assert key != ResponseCache.key("gpt-4o-mini", 0.0, "instructions", [{"role": "user", "content": "other"}])
+
+
+def test_cache_persists_responses(tmp_path):
+    path = tmp_path / ".breba" / "responses.sqlite"
+    with ResponseCache(path) as cache:
+        cache.put("key", "response")
+
+    with ResponseCache(path) as cache:
+        assert cache.get("key") == "response"
+        assert cache.get("missing") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.stats() == "1 hits, 1 misses (50% hit rate), 1 responses"
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=20)
+    cache.put("first", "x" * 8)
+    cache.put("second", "y" * 8)
+    assert cache.get("first") == "x" * 8
+
+    cache.put("third", "z" * 8)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == "x" * 8
+    assert cache.get("third") == "z" * 8
+
+
+def test_cache_expires_responses(mocker):
+    cache = ResponseCache(ttl=60)
+    now = mocker.patch("breba_docs.services.response_cache.time.time", return_value=1000.0)
+    cache.put("key", "response")
+
+    now.return_value = 1059.0
+    assert cache.get("key") == "response"
+    now.return_value = 1061.0
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_failed_runs_are_not_cached():
+    cache = ResponseCache()
+    cache.put("key", None)
+
+    assert len(cache) == 0
+
+
+def test_chat_agent_reuses_responses(mocker):
+    create = mocker.patch('breba_docs.agent.chat_agent.OpenAI').return_value.chat.completions.create
+    create.side_effect = [Mock(choices=[Mock(message=Mock(content=content))]) for content in ("Yes", "Yes", "y")]
+    cache = ResponseCache()
+
+    assert ChatCompletionsAgent(response_cache=cache).provide_input("Continue? [Y/n] ") == "y"
+    assert ChatCompletionsAgent(response_cache=cache).provide_input("Continue? [Y/n] ") == "y"
+
+    assert create.call_count == 3
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_assistant_agent_replays_cached_conversation_into_new_thread(mocker):
+    openai_client = mocker.patch('breba_docs.agent.openai_agent.OpenAI').return_value
+    openai_client.beta.threads.runs.create_and_poll.return_value = SimpleNamespace(status="completed")
+    openai_client.beta.threads.messages.list.return_value.data[0].content[0].text.value = "Yes"
+    cache = ResponseCache()
+    agent = OpenAIAgent(response_cache=cache)
+    agent.do_run("first", "instructions")
+    openai_client.reset_mock()
+
+    # First run is answered from the cache, the follow-up is not, so it needs a thread with the first run
+    assert agent.do_run("first", "instructions") == "Yes"
+    openai_client.beta.threads.create.assert_not_called()
+    assert agent.do_run("second", "instructions", new_thread=False) == "Yes"
+
+    openai_client.beta.threads.create.assert_called_once_with(messages=[
+        {"role": "user", "content": "first"},
+        {"role": "assistant", "content": "Yes"},
+    ])
+    openai_client.beta.threads.runs.create_and_poll.assert_called_once()
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_graph_agent_reuses_model_responses(mocker, cached):
+    mocker.patch('breba_docs.agent.graph_agent.OpenAIAgent')
+    model = mocker.patch('breba_docs.agent.graph_agent.ChatOpenAI').return_value
+    model.model_name = "gpt-4o-mini"
+    model.temperature = 0
+    model.invoke.return_value = Mock(content=json.dumps({"goals": [{"name": "Goal 1", "description": "Desc 1"}]}))
+    cache = ResponseCache()
+    state = AgentState(messages=[], goals=[], goal_reports=[], current_goal=None)
+    if cached:
+        GraphAgent(doc=Mock(content="Sample document content"), response_cache=cache).identify_goals(state)
+        model.invoke.reset_mock()
+
+    result = GraphAgent(doc=Mock(content="Sample document content"), response_cache=cache).identify_goals(state)
+
+    assert result["goals"] == [Goal(name="Goal 1", description="Desc 1")]
+    assert model.invoke.call_count == (0 if cached else 1)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import openai
+import pytest
+
+from breba_docs.agent.async_chat_agent import AsyncChatAgent
+from breba_docs.agent.scheduler import Priority, RateLimitScheduler, retry_after
+
+
+def _error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers or {},
+                              request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return error_class("Request failed", response=response, body=None)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RateLimitScheduler(base_delay=0.01)
+    yield scheduler
+    scheduler.close()
+
+
+def test_retry_after():
+    assert retry_after(_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(_error(openai.RateLimitError, 429, {"retry-after": "2"})) == 2.0
+    assert retry_after(_error(openai.RateLimitError, 429)) is None
+
+
+@pytest.mark.asyncio
+async def test_requests_start_by_priority(scheduler):
+    scheduler.max_concurrency = 1
+    order = []
+
+    def call(name, duration=0.0):
+        async def run():
+            await asyncio.sleep(duration)
+            order.append(name)
+        return run
+
+    blocking = asyncio.create_task(scheduler.submit(call("blocking", 0.1), 10))
+    await asyncio.sleep(0.05)
+    # Both are queued while the blocking request runs, input goes first even though it arrived last
+    await asyncio.gather(
+        scheduler.submit(call("analysis"), 10, Priority.ANALYSIS),
+        scheduler.submit(call("planning"), 10, Priority.PLANNING),
+        scheduler.submit(call("input"), 10, Priority.INPUT),
+        blocking,
+    )
+
+    assert order == ["blocking", "input", "planning", "analysis"]
+
+
+def test_requests_per_minute_budget(scheduler):
+    scheduler.requests_per_minute = 2
+    scheduler.window_seconds = 0.2
+    call = AsyncMock(return_value="done")
+
+    started = time.monotonic()
+    results = [scheduler.run(call, 10) for _ in range(3)]
+
+    assert results == ["done"] * 3
+    # Third request waits for the first to leave the window
+    assert time.monotonic() - started >= 0.2
+
+
+def test_tokens_per_minute_budget(scheduler):
+    scheduler.tokens_per_minute = 100
+    scheduler.window_seconds = 0.2
+    call = AsyncMock(return_value="done")
+
+    started = time.monotonic()
+    scheduler.run(call, 60)
+    scheduler.run(call, 60)
+
+    assert time.monotonic() - started >= 0.2
+
+
+def test_rate_limited_request_is_retried_after_retry_after(scheduler):
+    call = AsyncMock(side_effect=[_error(openai.RateLimitError, 429, {"retry-after-ms": "200"}), "done"])
+
+    started = time.monotonic()
+    assert scheduler.run(call, 10) == "done"
+
+    assert call.await_count == 2
+    assert time.monotonic() - started >= 0.2
+
+
+def test_retries_give_up(scheduler):
+    scheduler.max_retries = 2
+    call = AsyncMock(side_effect=_error(openai.InternalServerError, 500))
+
+    with pytest.raises(openai.InternalServerError):
+        scheduler.run(call, 10)
+
+    assert call.await_count == 3
+
+
+def test_errors_that_are_not_retryable(scheduler):
+    call = AsyncMock(side_effect=_error(openai.BadRequestError, 400))
+
+    with pytest.raises(openai.BadRequestError):
+        scheduler.run(call, 10)
+
+    assert call.await_count == 1
+
+
+def test_async_agent_schedules_requests_by_priority(mocker, scheduler):
+    create = mocker.patch('breba_docs.agent.async_chat_agent.AsyncOpenAI').return_value.chat.completions.create
+    create.side_effect = AsyncMock(side_effect=[Mock(choices=[Mock(message=Mock(content=content))])
+                                                for content in ("Yes", "Yes", "y")])
+    run = mocker.spy(scheduler, "run")
+
+    agent = AsyncChatAgent(scheduler=scheduler)
+    assert agent.provide_input("Do you want to continue? [Y/n] ") == "y"
+
+    assert [call.args[2] for call in run.call_args_list] == [Priority.INPUT] * 3
+    assert agent.priority == Priority.PLANNING
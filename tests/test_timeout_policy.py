@@ -0,0 +1,100 @@
+import pytest
+
+from breba_docs.services.command_executor import ContainerCommandExecutor, LocalCommandExecutor
+from breba_docs.services.container_stats import StatsSample
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.timeout_policy import IdleTimeoutPolicy, command_key
+from pty_server.async_client import STATUS_TIMEOUT, STATUS_COMPLETED
+
+
+@pytest.mark.parametrize("command, key", [
+    ("pip install -r requirements.txt", "pip install"),
+    ("sudo apt-get install -y git", "apt-get install"),
+    ("DEBUG=1 /usr/bin/make", "make"),
+    ("ls", "ls"),
+])
+def test_command_key(command, key):
+    assert command_key(command) == key
+
+
+def test_idle_timeout_uses_defaults_and_learns():
+    policy = IdleTimeoutPolicy(base_timeout=0.5, max_timeout=30, margin=1.5, decay=0.5)
+
+    assert policy.idle_timeout("echo hello") == 0.5
+    assert policy.idle_timeout("pip install nodestream") == 7.5
+
+    policy.observe("nodestream run sample -v", 4.0)
+    assert policy.idle_timeout("nodestream run other") == 6.0
+
+    # A quick run only lowers the expectation gradually
+    policy.observe("nodestream run sample -v", 0.1)
+    assert policy.idle_timeout("nodestream run sample -v") == 3.0
+
+    policy.observe("cargo build", 100)
+    assert policy.idle_timeout("cargo build") == 30
+
+
+class ScriptedResponse:
+    """Times out a number of times before completing"""
+
+    def __init__(self, timeouts: int):
+        self.timeouts = timeouts
+        self.status = None
+
+    async def stream(self, timeout):
+        if self.timeouts:
+            self.timeouts -= 1
+            self.status = STATUS_TIMEOUT
+            return
+        self.status = STATUS_COMPLETED
+        yield "Successfully built"
+
+    def completed(self):
+        return self.status == STATUS_COMPLETED
+
+    def timedout(self):
+        return self.status == STATUS_TIMEOUT
+
+
+@pytest.mark.asyncio
+async def test_busy_container_is_not_asked_for_input(mocker):
+    input_provider = mocker.MagicMock(spec=InputProvider)
+    executor = ContainerCommandExecutor(input_provider, mocker.MagicMock(), timeout_policy=IdleTimeoutPolicy())
+    executor.stats = mocker.MagicMock()
+    # CPU keeps increasing while the command is quiet
+    executor.stats.sample.side_effect = [StatsSample(cpu_seconds=i, memory_bytes=0) for i in range(0, 100, 10)]
+
+    output = await executor.read_response(ScriptedResponse(timeouts=5), command="cargo build")
+
+    assert output == "Successfully built"
+    input_provider.get_input_async.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_idle_container_gives_up_after_retries(mocker):
+    input_provider = mocker.MagicMock(spec=InputProvider)
+    input_provider.get_input_async = mocker.AsyncMock(return_value=None)
+    executor = ContainerCommandExecutor(input_provider, mocker.MagicMock(), timeout_policy=IdleTimeoutPolicy())
+    executor.stats = mocker.MagicMock()
+    executor.stats.sample.return_value = StatsSample(cpu_seconds=1.0, memory_bytes=0)
+
+    output = await executor.read_response(ScriptedResponse(timeouts=5), command="read answer")
+
+    assert output == ""
+
+
+def test_local_executor_waits_longer_than_base_timeout(mocker):
+    assert LocalCommandExecutor(mocker.Mock(spec=InputProvider)).timeout_policy.base_timeout >= 2.0
+
+    input_provider = mocker.Mock(spec=InputProvider)
+    input_provider.get_input.return_value = None
+    executor = LocalCommandExecutor(input_provider, timeout_policy=IdleTimeoutPolicy(base_timeout=0.3))
+    with executor.session():
+        # Quiet for longer than the idle timeout, it finishes instead of leaking into the next command
+        output = executor.execute_command("sleep 0.7; echo hi")
+        next_output = executor.execute_command("echo next")
+
+    assert output.endswith("hi\n")
+    assert executor.exit_code == 0
+    assert "Completed" not in next_output
+    assert next_output.endswith("next\n")
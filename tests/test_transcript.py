@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from breba_docs.services.command_executor import LocalCommandExecutor
+from breba_docs.services.input_provider import InputProvider
+from breba_docs.services.transcript import Transcript, RecordingCommandExecutor, ReplayCommandExecutor, \
+    MissingRecordingError
+
+
+class PromptingProcess:
+    """Asks for a name, then greets whoever answered"""
+
+    def __init__(self):
+        self.chunks = []
+        self.end_marker = None
+
+    def send_command(self, command, end_marker):
+        self.end_marker = end_marker.replace("$?", "0")
+        self.chunks = ["What is your name? "]
+
+    def send_input(self, input_text):
+        self.chunks = ["\n", f"Hello {input_text}\n", f"{self.end_marker}\n"]
+
+    def read_nonblocking(self, timeout):
+        if not self.chunks:
+            raise TimeoutError()
+        return self.chunks.pop(0)
+
+
+def _record(mocker, path):
+    input_provider = mocker.Mock(spec=InputProvider)
+    input_provider.get_input.return_value = "Breba"
+    executor = LocalCommandExecutor(input_provider, PromptingProcess())
+    recorder = RecordingCommandExecutor(executor, Transcript(path))
+    return recorder.execute_command("./greet.sh"), recorder
+
+
+def test_replay_recorded_execution(tmp_path, mocker):
+    path = tmp_path / "transcript.jsonl"
+    output, recorder = _record(mocker, path)
+    assert recorder.exit_code == 0
+
+    input_provider = mocker.Mock(spec=InputProvider)
+    input_provider.get_input.return_value = "Breba"
+    replay = ReplayCommandExecutor(Transcript(path), input_provider)
+
+    with replay.session() as session:
+        assert session.execute_command("./greet.sh") == output == "What is your name? Breba\nHello Breba\n"
+        assert session.exit_code == 0
+    # Input is asked for at the same point of the output as in the recording
+    input_provider.get_input.assert_called_once_with("What is your name? ")
+
+
+def test_replay_scales_time(tmp_path):
+    transcript = Transcript(tmp_path / "transcript.jsonl")
+    record = {"command": "sleep 1", "output": "", "exit_code": 0, "wall_time": 1.0, "events": []}
+    transcript.append(record)
+    transcript.append(record)
+    transcript = Transcript(tmp_path / "transcript.jsonl")
+
+    started = time.monotonic()
+    ReplayCommandExecutor(transcript, time_scale=0.1).execute_command("sleep 1")
+    assert 0.1 <= time.monotonic() - started < 0.5
+
+    started = time.monotonic()
+    ReplayCommandExecutor(transcript).execute_command("sleep 1")
+    assert time.monotonic() - started < 0.05
+
+
+def test_replay_of_command_that_was_not_recorded(tmp_path):
+    replay = ReplayCommandExecutor(Transcript(tmp_path / "transcript.jsonl"))
+
+    with pytest.raises(MissingRecordingError) as error:
+        replay.execute_command("ls")
+
+    assert error.value.command == "ls"
+    assert str(error.value) == "No recorded execution of command: ls"
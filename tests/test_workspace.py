@@ -0,0 +1,61 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from breba_docs.workspace import WorkspaceSync, tar_stream
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "README.md").write_text("# Sample\n")
+    (tmp_path / "scripts").mkdir()
+    (tmp_path / "scripts" / "setup.sh").write_text("echo setup\n")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    return tmp_path
+
+
+@pytest.fixture
+def container(mocker):
+    container = mocker.MagicMock(id="container-1")
+    container.archives = []
+
+    def put_archive(path, data):
+        container.archives.append(tarfile.open(fileobj=io.BytesIO(b"".join(data))))
+
+    container.put_archive.side_effect = put_archive
+    return container
+
+
+def test_tar_stream_is_a_valid_archive(workspace):
+    (workspace / "large.bin").write_bytes(os.urandom(200 * 1024 + 3))
+
+    archive = tarfile.open(fileobj=io.BytesIO(b"".join(tar_stream(workspace, ["README.md", "large.bin"]))))
+
+    assert archive.getnames() == ["README.md", "large.bin"]
+    assert archive.extractfile("large.bin").read() == (workspace / "large.bin").read_bytes()
+
+
+def test_sync_sends_only_changes(workspace, container):
+    sync = WorkspaceSync(workspace)
+
+    assert sorted(sync.sync(container)) == ["README.md", "scripts/setup.sh"]
+    assert sync.sync(container) == []
+    container.put_archive.assert_called_once()
+
+    (workspace / "README.md").write_text("# Sample with a fix\n")
+    (workspace / "scripts" / "setup.sh").unlink()
+
+    assert sync.sync(container) == ["README.md"]
+    assert container.archives[-1].extractfile("README.md").read() == b"# Sample with a fix\n"
+    container.exec_run.assert_called_once_with(["rm", "-f", "--", "scripts/setup.sh"], workdir="/usr/src")
+
+
+def test_new_container_gets_full_workspace(workspace, container, mocker):
+    sync = WorkspaceSync(workspace)
+    sync.sync(container)
+
+    other_container = mocker.MagicMock(id="container-2")
+    assert sorted(sync.sync(other_container)) == ["README.md", "scripts/setup.sh"]